@@ -1,6 +1,9 @@
+import warnings
 import pandas as pd
 import numpy as np
 from sqlalchemy import create_engine, inspect
+from alignHelpers import *
+from candleSeries import *
 
 def parse_table_name(table_name):
     parts = table_name.split('_')
@@ -36,111 +39,160 @@ def filter_best_bins(occurrences):
             filtered[count] = (numeric_pct_diff, data)
     return [(f"≥ {pct_diff:.1f}%", data) for count, (pct_diff, data) in sorted(filtered.items(), reverse=True)]
 
-def analyze_opportunities_vs_index(opportunity_database_uri, liquid_database_uris, opportunity_table_name, liquid_table_names, threshold=0.1, step=0.1, start_datetime=None, end_datetime=None):
-    import pandas as pd
-    opportunity_engine = create_engine(opportunity_database_uri)
-    opportunity_df = pd.read_sql_table(opportunity_table_name, con=opportunity_engine)
-    opportunity_df = opportunity_df[opportunity_df['volume'] > 0]
-    opportunity_df['timestamp'] = pd.to_datetime(opportunity_df['timestamp'], unit='ms')
-    opportunity_df.sort_values(by='timestamp', inplace=True)
-
-    if start_datetime and end_datetime:
-        opportunity_df = opportunity_df[(opportunity_df['timestamp'] >= start_datetime) & (opportunity_df['timestamp'] <= end_datetime)]
-
-    exchange, base_asset, quote_asset, _ = parse_table_name(opportunity_table_name)
-    opportunity_df[f'{quote_asset} Volume'] = opportunity_df['volume'] * opportunity_df['low']
-    timeframe = determine_timeframe(opportunity_df)
-
+# Load every matching liquid table once; engines and inspectors are created once per database
+def load_liquid_basket(liquid_database_uris, liquid_table_names, start_datetime=None, end_datetime=None):
+    basket = []
+    wanted = set(liquid_table_names)
     for liquid_uri in liquid_database_uris:
         liquid_engine = create_engine(liquid_uri)
-        inspector = inspect(liquid_engine)
-        liquid_tables = [tbl for tbl in inspector.get_table_names() if tbl in liquid_table_names]
-
-        for liquid_table in liquid_tables:
+        for liquid_table in inspect(liquid_engine).get_table_names():
+            if liquid_table not in wanted:
+                continue
             try:
-                liquid_df = pd.read_sql_table(liquid_table, con=liquid_engine)
-                liquid_df = liquid_df[liquid_df['volume'] > 0]
-                liquid_df['timestamp'] = pd.to_datetime(liquid_df['timestamp'], unit='ms')
-                liquid_df.sort_values(by='timestamp', inplace=True)
-
-                if start_datetime and end_datetime:
-                    liquid_df = liquid_df[(liquid_df['timestamp'] >= start_datetime) & (liquid_df['timestamp'] <= end_datetime)]
-
-                liquid_df[f'{quote_asset} Volume'] = liquid_df['volume'] * liquid_df['low']
-
-                merged_df = pd.merge(opportunity_df, liquid_df, on='timestamp', suffixes=('_opportunity', '_liquid'))
-                merged_df['Low Difference (%)'] = ((merged_df['low_opportunity'] - merged_df['low_liquid']) / merged_df['low_liquid']) * 100
-                merged_df['High Difference (%)'] = ((merged_df['high_opportunity'] - merged_df['high_liquid']) / merged_df['high_liquid']) * 100
-
-                valid_rows = merged_df.dropna(subset=['Low Difference (%)', 'High Difference (%)'])
-                total_days = (valid_rows['timestamp'].max() - valid_rows['timestamp'].min()).days + 1 if not valid_rows.empty else 0
-
-                buying_opportunities = valid_rows[valid_rows['Low Difference (%)'] <= -threshold]
-                buy_occurrences = {}
-                for t in np.arange(threshold, abs(buying_opportunities['Low Difference (%)'].min()), step):
-                    count = buying_opportunities[buying_opportunities['Low Difference (%)'] <= -t].shape[0]
-                    if count > 0:
-                        avg_volume = buying_opportunities[buying_opportunities['Low Difference (%)'] <= -t][f'{quote_asset} Volume_opportunity'].mean()
-                        median_volume = buying_opportunities[buying_opportunities['Low Difference (%)'] <= -t][f'{quote_asset} Volume_opportunity'].median()
-                        total_return = abs(t / 100 * count * avg_volume)
-                        monthly_return = total_return / 30 if total_days >= 30 else (total_return * (30 / total_days))
-                        monthly_return_percentage = (monthly_return / avg_volume) * 100 if avg_volume != 0 else 0
-                        buy_occurrences[f"{-t:.1f}%"] = (count, total_return, monthly_return, avg_volume, median_volume, monthly_return_percentage)
-
-                selling_opportunities = valid_rows[valid_rows['High Difference (%)'] >= threshold]
-                sell_occurrences = {}
-                for t in np.arange(threshold, selling_opportunities['High Difference (%)'].max() + step, step):
-                    count = selling_opportunities[selling_opportunities['High Difference (%)'] >= t].shape[0]
-                    if count > 0:
-                        avg_volume = selling_opportunities[selling_opportunities['High Difference (%)'] >= t]['volume_opportunity'].mean()
-                        median_volume = selling_opportunities[selling_opportunities['High Difference (%)'] >= t]['volume_opportunity'].median()
-                        total_return = abs(t / 100 * count * avg_volume)
-                        monthly_return = total_return / 30 if total_days >= 30 else (total_return * (30 / total_days))
-                        monthly_return_percentage = (monthly_return / avg_volume) * 100 if avg_volume != 0 else 0
-                        sell_occurrences[f"{t:.1f}%"] = (count, total_return, monthly_return, avg_volume, median_volume, monthly_return_percentage)
-
-                filtered_buy_occurrences = filter_best_bins(buy_occurrences)
-                filtered_sell_occurrences = filter_best_bins(sell_occurrences)
-
-                print(f"Market Pair: {base_asset}/{quote_asset}")
-                print(f"Opportunity Exchange: {exchange}")
-                print(f"Liquid Exchange: {liquid_table}")
-                print(f"Timeframe: {timeframe}")
-                print(f"Total Days Analyzed: {total_days}\n")
-
-                print("Buying Opportunities:")
-                print(f"- Number of buying opportunities: {buying_opportunities.shape[0]} over {total_days} days")
-                for pct_diff, data in filtered_buy_occurrences:
-                    print(f"  {pct_diff}: {data[0]} occurrences, Total Return: {data[1]:.2f} USD, Monthly Return: {data[2]:.2f} USD, "
-                          f"Average Volume: {data[3]:.2f} USD, Median Volume: {data[4]:.2f} USD, Monthly Return %: {data[5]:.2f}%")
-
-                print("\nSelling Opportunities:")
-                print(f"- Number of selling opportunities: {selling_opportunities.shape[0]} over {total_days} days")
-                for pct_diff, data in filtered_sell_occurrences:
-                    print(f"  {pct_diff}: {data[0]} occurrences, Total Return: {data[1]:.2f} {base_asset}, Monthly Return: {data[2]:.2f} {base_asset}, "
-                          f"Average Volume: {data[3]:.2f} {base_asset}, Median Volume: {data[4]:.2f} {base_asset}, Monthly Return %: {data[5]:.2f}%")
-
+                series = CandleSeries.load(liquid_engine, liquid_table, start_datetime, end_datetime, min_volume=0)
             except Exception as e:
-                print(f"Error analyzing liquid table {liquid_table}: {e}")
+                print(f"Error loading liquid table {liquid_table}: {e}")
+                continue
+            if not series.empty:
+                basket.append(series)
+    return basket
+
+# Align the opportunity candles against N liquid venues at once
+# Returns (rows x venues) float arrays of liquid low, high and quote volume; NaN where a venue has no candle
+def align_basket(opportunity, basket, tolerance_ms=ALIGN_TOLERANCE_MS):
+    shape = (len(opportunity), len(basket))
+    low, high, quote_volume = np.full(shape, np.nan), np.full(shape, np.nan), np.full(shape, np.nan)
+    for venue, liquid in enumerate(basket):
+        opportunity_idx, liquid_idx = asof_join_indices(opportunity.timestamp, liquid.timestamp, tolerance_ms)
+        low[opportunity_idx, venue] = liquid.low[liquid_idx]
+        high[opportunity_idx, venue] = liquid.high[liquid_idx]
+        quote_volume[opportunity_idx, venue] = liquid.volume[liquid_idx] * liquid.low[liquid_idx]
+    return low, high, quote_volume
+
+# Per-minute Low/High Difference (%) against composite indices of the basket, all computed in one pass
+# worst_case: the venue least favourable to the trade, best_case: the most favourable one,
+# median: median venue difference, volume_weighted: difference to the quote-volume-weighted index price
+def index_differences(opportunity, low, high, quote_volume):
+    opportunity_low = opportunity.low.astype(np.float64)[:, None]
+    opportunity_high = opportunity.high.astype(np.float64)[:, None]
+    low_diff = (opportunity_low - low) / low * 100
+    high_diff = (opportunity_high - high) / high * 100
+
+    weights = np.where(np.isnan(low) | np.isnan(quote_volume), 0.0, quote_volume)
+    weight_sum = weights.sum(axis=1)
+    # Minutes where no venue has a candle stay NaN and are dropped before the sweep
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        index_low = np.nansum(low * weights, axis=1) / weight_sum
+        index_high = np.nansum(high * weights, axis=1) / weight_sum
+        composites = {
+            'worst_case': (np.nanmax(low_diff, axis=1), np.nanmin(high_diff, axis=1)),
+            'best_case': (np.nanmin(low_diff, axis=1), np.nanmax(high_diff, axis=1)),
+            'median': (np.nanmedian(low_diff, axis=1), np.nanmedian(high_diff, axis=1)),
+            'volume_weighted': ((opportunity_low[:, 0] - index_low) / index_low * 100,
+                                (opportunity_high[:, 0] - index_high) / index_high * 100),
+        }
+    return composites
+
+# "≥ t%" occurrences for every threshold from one sort instead of one filter per bin
+# magnitude is -Low Difference (%) for buys and High Difference (%) for sells
+def sweep_occurrences(magnitude, volume, thresholds, total_days, label_sign):
+    order = np.argsort(-magnitude, kind='stable')
+    descending = magnitude[order]
+    sorted_volume = volume[order]
+    cumulative_volume = np.cumsum(sorted_volume)
+    counts = np.searchsorted(-descending, -thresholds, side='right')
+
+    occurrences = {}
+    for t, count in zip(thresholds, counts):
+        if count > 0:
+            avg_volume = cumulative_volume[count - 1] / count
+            median_volume = np.median(sorted_volume[:count])
+            total_return = abs(t / 100 * count * avg_volume)
+            monthly_return = total_return / 30 if total_days >= 30 else (total_return * (30 / total_days))
+            monthly_return_percentage = (monthly_return / avg_volume) * 100 if avg_volume != 0 else 0
+            occurrences[f"{label_sign * t:.1f}%"] = (int(count), total_return, monthly_return, avg_volume, median_volume, monthly_return_percentage)
+    return occurrences
+
+def analyze_opportunities_vs_index(opportunity_database_uri, liquid_database_uris, opportunity_table_name, liquid_table_names, threshold=0.1, step=0.1, start_datetime=None, end_datetime=None, basket=None):
+    opportunity_engine = create_engine(opportunity_database_uri)
+    opportunity = CandleSeries.load(opportunity_engine, opportunity_table_name, start_datetime, end_datetime, min_volume=0)
+    if opportunity.empty:
+        print(f"No opportunity data for {opportunity_table_name}")
+        return
+
+    if basket is None:
+        basket = load_liquid_basket(liquid_database_uris, liquid_table_names, start_datetime, end_datetime)
+    if not basket:
+        print(f"No liquid venues to compare {opportunity_table_name} against")
+        return
+
+    exchange, base_asset, quote_asset, _ = parse_table_name(opportunity_table_name)
+    timeframe = determine_timeframe(pd.DataFrame({'timestamp': opportunity.datetimes()}))
+    opportunity_quote_volume = opportunity.volume.astype(np.float64) * opportunity.low
+    opportunity_base_volume = opportunity.volume.astype(np.float64)
+
+    low, high, quote_volume = align_basket(opportunity, basket)
+    composites = index_differences(opportunity, low, high, quote_volume)
+    venue_names = ', '.join(series.name for series in basket)
+
+    for index_name, (low_diff, high_diff) in composites.items():
+        valid = ~(np.isnan(low_diff) | np.isnan(high_diff))
+        if not valid.any():
+            continue
+        valid_ts = opportunity.timestamp[valid]
+        total_days = int((valid_ts.max() - valid_ts.min()) // 86_400_000) + 1
+
+        buy_mask = valid & (low_diff <= -threshold)
+        sell_mask = valid & (high_diff >= threshold)
+        buy_thresholds = np.arange(threshold, abs(low_diff[buy_mask].min()), step) if buy_mask.any() else np.empty(0)
+        sell_thresholds = np.arange(threshold, high_diff[sell_mask].max() + step, step) if sell_mask.any() else np.empty(0)
+
+        buy_occurrences = sweep_occurrences(-low_diff[buy_mask], opportunity_quote_volume[buy_mask], buy_thresholds, total_days, -1)
+        sell_occurrences = sweep_occurrences(high_diff[sell_mask], opportunity_base_volume[sell_mask], sell_thresholds, total_days, 1)
+
+        filtered_buy_occurrences = filter_best_bins(buy_occurrences)
+        filtered_sell_occurrences = filter_best_bins(sell_occurrences)
+
+        print(f"Market Pair: {base_asset}/{quote_asset}")
+        print(f"Opportunity Exchange: {exchange}")
+        print(f"Liquid Index: {index_name} of {len(basket)} venues ({venue_names})")
+        print(f"Timeframe: {timeframe}")
+        print(f"Total Days Analyzed: {total_days}\n")
+
+        print("Buying Opportunities:")
+        print(f"- Number of buying opportunities: {int(buy_mask.sum())} over {total_days} days")
+        for pct_diff, data in filtered_buy_occurrences:
+            print(f"  {pct_diff}: {data[0]} occurrences, Total Return: {data[1]:.2f} USD, Monthly Return: {data[2]:.2f} USD, "
+                  f"Average Volume: {data[3]:.2f} USD, Median Volume: {data[4]:.2f} USD, Monthly Return %: {data[5]:.2f}%")
+
+        print("\nSelling Opportunities:")
+        print(f"- Number of selling opportunities: {int(sell_mask.sum())} over {total_days} days")
+        for pct_diff, data in filtered_sell_occurrences:
+            print(f"  {pct_diff}: {data[0]} occurrences, Total Return: {data[1]:.2f} {base_asset}, Monthly Return: {data[2]:.2f} {base_asset}, "
+                  f"Average Volume: {data[3]:.2f} {base_asset}, Median Volume: {data[4]:.2f} {base_asset}, Monthly Return %: {data[5]:.2f}%")
+        print()
 
 def run_batch_analysis_filtered(opportunity_database_uri, liquid_database_uris, base_asset, opportunity_quote_asset, liquid_quote_asset, start_datetime=None, end_datetime=None):
     opportunity_engine = create_engine(opportunity_database_uri)
     inspector = inspect(opportunity_engine)
     opportunity_tables = inspector.get_table_names()
 
+    # The liquid basket is the same for every opportunity table, so it is listed and loaded once
+    liquid_tables = []
+    for liquid_uri in liquid_database_uris:
+        liquid_engine = create_engine(liquid_uri)
+        liquid_inspector = inspect(liquid_engine)
+        matching_tables = [tbl for tbl in liquid_inspector.get_table_names()
+                           if f"_{base_asset.lower()}_{liquid_quote_asset.lower()}_" in tbl]
+        liquid_tables.extend(matching_tables)
+    basket = load_liquid_basket(liquid_database_uris, liquid_tables, start_datetime, end_datetime)
+
     for opportunity_table in opportunity_tables:
         try:
             if f"_{base_asset.lower()}_{opportunity_quote_asset.lower()}_" not in opportunity_table:
                 continue
 
-            liquid_tables = []
-            for liquid_uri in liquid_database_uris:
-                liquid_engine = create_engine(liquid_uri)
-                liquid_inspector = inspect(liquid_engine)
-                matching_tables = [tbl for tbl in liquid_inspector.get_table_names()
-                                   if f"_{base_asset.lower()}_{liquid_quote_asset.lower()}_" in tbl]
-                liquid_tables.extend(matching_tables)
-
             analyze_opportunities_vs_index(
                 opportunity_database_uri,
                 liquid_database_uris,
@@ -149,7 +201,8 @@ def run_batch_analysis_filtered(opportunity_database_uri, liquid_database_uris,
                 threshold=0.1,
                 step=0.1,
                 start_datetime=start_datetime,
-                end_datetime=end_datetime
+                end_datetime=end_datetime,
+                basket=basket
             )
         except Exception as e:
             print(f"Error analyzing {opportunity_table}: {e}")
@@ -2,6 +2,12 @@ import pandas as pd
 import numpy as np
 import xlsxwriter
 from sqlalchemy import create_engine, inspect
+from alignHelpers import *
+from candleSeries import *
+from resultSink import *
+from jobLedger import *
+from resultCache import *
+from syntheticRates import *
 
 # Optional date filters; if both are None, the entire dataset will be analyzed
 START_DATE = None
@@ -18,80 +24,40 @@ def parse_table_name(table_name):
         return exchange.upper(), base_asset.upper(), quote_asset.upper(), timeframe
     raise ValueError(f"Table name format is incorrect: '{table_name}' - Expected format: 'exchange_baseAsset_quoteAsset_timeframe'")
 
-# Fetch data from a table
-def fetch_market_data(engine, table_name, is_liquid=False):
+# Load a table as a compact CandleSeries, date-filtered in SQL
+def fetch_candle_series(engine, table_name, min_volume=0):
     try:
         print(f"Fetching market data from table: {table_name}")
-        with engine.connect() as connection:
-            df = pd.read_sql_table(table_name, con=connection)
-        if 'timestamp' in df.columns:
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', errors='coerce')
-            df = df.dropna(subset=['timestamp'])
-            if START_DATE and END_DATE:
-                df = df[(df['timestamp'] >= START_DATE) & (df['timestamp'] <= END_DATE)]
-        print(f"Fetched {len(df)} rows from {table_name}")
-        if is_liquid:
-            df.rename(columns={'low': 'low_liquid', 'high': 'high_liquid', 'volume': 'volume_liquid'}, inplace=True)
-        return df
+        series = CandleSeries.load(engine, table_name, START_DATE, END_DATE, min_volume=min_volume)
+        print(f"Fetched {len(series)} rows from {table_name}")
+        return series
     except ValueError as e:
         print(f"Error: {e}")
-        return pd.DataFrame()
+        return CandleSeries.empty_series(table_name)
 
 # Calculate synthetic price for base/quote asset
-def calculate_synthetic_price(opportunity_engine, liquid_engine, base_asset, quote_asset, timeframe, exchange_name):
+# compare_exchanges passes one SyntheticRateEngine per sweep so every USD/fiat leg is read only once
+def calculate_synthetic_price(opportunity_engine, liquid_engine, base_asset, quote_asset, timeframe, exchange_name, rates=None):
     print(f"Calculating synthetic price for {base_asset}/{quote_asset} on {exchange_name}")
-
-    base_to_usdt_table = f"{exchange_name.lower()}_{base_asset.lower()}_usdt_{timeframe.lower()}"
-    quote_to_usdt_table = f"{exchange_name.lower()}_{quote_asset.lower()}_usdt_{timeframe.lower()}"
-
-    base_df = fetch_market_data(liquid_engine, base_to_usdt_table)
-    quote_df = fetch_market_data(liquid_engine, quote_to_usdt_table)
-    
-    if base_df.empty or quote_df.empty:
-        print(f"Error: Could not fetch synthetic price data for {base_asset}/{quote_asset}. Missing base or quote table.")
-        return None
-
-    synthetic_df = pd.merge(base_df[['timestamp', 'close']],
-                            quote_df[['timestamp', 'close']],
-                            on='timestamp',
-                            suffixes=('_base', '_quote')).copy()
-    synthetic_df['synthetic_price'] = synthetic_df['close_base'] / synthetic_df['close_quote']
-    synthetic_df['low_liquid'] = synthetic_df['synthetic_price']
-    synthetic_df['high_liquid'] = synthetic_df['synthetic_price']
-    
-    return synthetic_df[['timestamp', 'low_liquid', 'high_liquid']].copy()
+    if rates is None:
+        rates = SyntheticRateEngine(timeframe=timeframe, start=START_DATE, end=END_DATE)
+    rates.register(exchange_name, liquid_engine)
+    return rates.cross_rate(base_asset, quote_asset, exchange_name)
 
 # Calculate price differences between opportunity and liquid markets
-def calculate_differences(opportunity_df, liquid_df):
+# Only the columns the bin sweep needs are aligned, so no full-width frame is ever merged or copied
+def calculate_differences(opportunity, liquid, tolerance_ms=ALIGN_TOLERANCE_MS):
     print(f"Calculating price differences...")
-    merged_df = opportunity_df.merge(liquid_df, on='timestamp', suffixes=('_opportunity', '_liquid')).copy()
-    merged_df['Low Difference (%)'] = ((merged_df['low_opportunity'] - merged_df['low_liquid']) / merged_df['low_liquid']) * 100
-    merged_df['High Difference (%)'] = ((merged_df['high_opportunity'] - merged_df['high_liquid']) / merged_df['high_liquid']) * 100
-    return merged_df.copy()
-
-# Fetch and rename market data with .loc to avoid SettingWithCopyWarning
-def fetch_and_rename_market_data(engine, table_name, rename_columns):
-    try:
-        print(f"Fetching market data from table: {table_name}")
-        with engine.connect() as connection:
-            df = pd.read_sql_table(table_name, con=connection)
-        
-        if 'timestamp' in df.columns:
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', errors='coerce')
-            df = df.dropna(subset=['timestamp'])
-
-            # Date‐range filtering if both START_DATE and END_DATE are not None
-            if START_DATE and END_DATE:
-                df = df[(df['timestamp'] >= START_DATE) & (df['timestamp'] <= END_DATE)]
-
-        df = df[df['volume'] > 0]  # Filter out rows where volume is zero
-        df.rename(columns=rename_columns, inplace=True)
-        
-        print(f"Fetched {len(df)} rows from {table_name}")
-        return df
-    except ValueError as e:
-        print(f"Error: {e}")
-        return pd.DataFrame()
+    aligned = align_columns(opportunity.timestamp,
+                            {'low_opportunity': opportunity.low, 'high_opportunity': opportunity.high,
+                             'close_opportunity': opportunity.close, 'volume_opportunity': opportunity.volume},
+                            liquid.timestamp,
+                            {'low_liquid': liquid.low, 'high_liquid': liquid.high},
+                            tolerance_ms)
+    aligned['timestamp'] = aligned['timestamp'].view('datetime64[ms]')
+    aligned['Low Difference (%)'] = ((aligned['low_opportunity'] - aligned['low_liquid']) / aligned['low_liquid']) * 100
+    aligned['High Difference (%)'] = ((aligned['high_opportunity'] - aligned['high_liquid']) / aligned['high_liquid']) * 100
+    return pd.DataFrame(aligned, copy=False)
 
 # Filter the best bins
 def filter_best_bins(occurrences):
@@ -124,38 +90,54 @@ def analyze_opportunities_fixed_bins(opportunity_engine, liquid_engine,
                                      opportunity_table_name, liquid_table_name,
                                      base_asset, quote_asset,
                                      opportunity_exchange_name, liquid_exchange_name,
-                                     synthetic_df=None, threshold=0.5, step=0.1,
-                                     total_tables=1, current_table=1):
+                                     synthetic_series=None, threshold=0.5, step=0.1,
+                                     total_tables=1, current_table=1, opportunity_series=None, result_cache=None,
+                                     opportunity_fingerprint=None):
+    # Pair-level memo: the same tables, window and bins over unchanged data return the stored result
+    # Synthetic comparisons depend on several legs and are always recomputed
+    if result_cache is not None and synthetic_series is None:
+        return result_cache.get_or_compute(
+            {'analyzer': 'MarketsAnalyzer', 'threshold': threshold, 'step': step, 'start': START_DATE, 'end': END_DATE},
+            [(opportunity_engine, opportunity_table_name, opportunity_fingerprint) if opportunity_fingerprint is not None
+             else (opportunity_engine, opportunity_table_name), (liquid_engine, liquid_table_name)],
+            lambda: analyze_opportunities_fixed_bins(
+                opportunity_engine, liquid_engine,
+                opportunity_table_name, liquid_table_name,
+                base_asset, quote_asset,
+                opportunity_exchange_name, liquid_exchange_name,
+                threshold=threshold, step=step, opportunity_series=opportunity_series
+            ),
+            START_DATE, END_DATE)
+
     print(f"Analyzing opportunities between {opportunity_table_name} and {liquid_table_name or 'synthetic price'}")
 
-    # Fetch opportunity data
-    rename_opportunity_columns = {'low': 'low_opportunity', 'high': 'high_opportunity', 'close': 'close_opportunity', 'volume': 'volume_opportunity'}
-    opportunity_df = fetch_and_rename_market_data(opportunity_engine, opportunity_table_name, rename_opportunity_columns)
+    # Fetch opportunity data (compare_exchanges loads it once and reuses it across liquid exchanges)
+    if opportunity_series is None:
+        opportunity_series = fetch_candle_series(opportunity_engine, opportunity_table_name)
 
-    if opportunity_df.empty:
+    if opportunity_series.empty:
         print(f"Skipping {opportunity_table_name} due to empty opportunity data.")
         return None
 
     # Fetch liquid data
-    if synthetic_df is not None:
-        liquid_df = synthetic_df
+    if synthetic_series is not None:
+        liquid_series = synthetic_series
     else:
-        liquid_df = fetch_and_rename_market_data(liquid_engine, liquid_table_name,
-                                                 {'low': 'low_liquid', 'high': 'high_liquid'})
+        liquid_series = fetch_candle_series(liquid_engine, liquid_table_name)
 
-    if liquid_df.empty:
+    if liquid_series.empty:
         print(f"Skipping {opportunity_table_name} due to empty liquid data.")
         return None
 
     # Calculate price differences
-    merged_df = calculate_differences(opportunity_df, liquid_df)
-    merged_df[f'{quote_asset} Volume_opportunity'] = merged_df['volume_opportunity'] * merged_df['low_opportunity']
+    merged_df = calculate_differences(opportunity_series, liquid_series)
+    merged_df[f'{quote_asset} Volume_opportunity'] = merged_df['volume_opportunity'] * merged_df['close_opportunity']
 
     # Filter valid rows
     valid_rows = merged_df.loc[
         (merged_df['Low Difference (%)'] <= -threshold) |
         (merged_df['High Difference (%)'] >= threshold)
-    ].copy()
+    ]
 
     if valid_rows.empty:
         print(f"No valid rows found for {opportunity_table_name}")
@@ -165,10 +147,7 @@ def analyze_opportunities_fixed_bins(opportunity_engine, liquid_engine,
     days_in_dataset = calculate_days_in_dataset(valid_rows)
 
     # Calculate buy opportunities
-    buying_opportunities = valid_rows[valid_rows['Low Difference (%)'] <= -threshold].copy()
-    buying_opportunities[f'{quote_asset} Volume_opportunity'] = (
-        buying_opportunities['volume_opportunity'] * buying_opportunities['close_opportunity']
-    )
+    buying_opportunities = valid_rows[valid_rows['Low Difference (%)'] <= -threshold]
     buy_occurrences = {}
     min_low_diff = abs(buying_opportunities['Low Difference (%)'].min()) if not buying_opportunities.empty else 0
 
@@ -186,16 +165,11 @@ def analyze_opportunities_fixed_bins(opportunity_engine, liquid_engine,
                     buy_occurrences[f"≥ {t:.1f}%"] = (count, total_return, monthly_return_percentage, avg_volume_usd, median_volume_usd)
 
     # Calculate sell opportunities
-    selling_opportunities = valid_rows[valid_rows['High Difference (%)'] >= threshold].copy()
+    selling_opportunities = valid_rows[valid_rows['High Difference (%)'] >= threshold]
     sell_occurrences = {}
     max_high_diff = selling_opportunities['High Difference (%)'].max() if not selling_opportunities.empty else 0
 
     if max_high_diff > threshold:
-        # Calculate both base asset and USD-denominated volumes
-        selling_opportunities[f'{quote_asset} Volume_opportunity'] = (
-            selling_opportunities['volume_opportunity'] * selling_opportunities['close_opportunity']
-        )
-
         for t in np.arange(threshold, max_high_diff + step, step):
             filtered = selling_opportunities[selling_opportunities['High Difference (%)'] >= t]
             count = filtered.shape[0]
@@ -235,11 +209,19 @@ def analyze_opportunities_fixed_bins(opportunity_engine, liquid_engine,
         'exchange_quote_asset': quote_asset
     }
 
-# Compare exchanges and find arbitrage opportunities (with batch saving in increments of 4)
-def compare_exchanges(opportunity_exchanges, liquid_exchanges, timeframe, batch_size=2000):
+# Compare exchanges and find arbitrage opportunities, streaming every result to a CSV log
+def compare_exchanges(opportunity_exchanges, liquid_exchanges, timeframe, results_log="arbitrage_analysis_results.csv", ledger_path="arbitrage_analysis_ledger.sqlite",
+                      result_cache_path="arbitrage_analysis_cache.sqlite"):
     excluded_quote_assets = []
-    results = []
-    batch_counter = 0
+    # Rewritten every run: units the ledger skips re-log their stored result, so the log holds exactly this sweep
+    sink = ResultSink(results_log)
+    # Finished units are keyed by these params; changing any of them starts a fresh set of units
+    ledger = JobLedger(ledger_path, {
+        'analyzer': 'MarketsAnalyzer', 'timeframe': timeframe,
+        'start': START_DATE, 'end': END_DATE, 'liquid_exchanges': liquid_exchanges
+    }, end=END_DATE)
+    result_cache = PairResultCache(result_cache_path)
+    rates = SyntheticRateEngine(timeframe=timeframe, start=START_DATE, end=END_DATE)
 
     for opportunity_db_uri in opportunity_exchanges:
         print(f"Connecting to opportunity exchange database: {opportunity_db_uri}")
@@ -272,7 +254,28 @@ def compare_exchanges(opportunity_exchanges, liquid_exchanges, timeframe, batch_
                 print(f"Skipping table {opportunity_table} due to base asset being excluded.")
                 continue         
 
+            # Reuse the ledger result when neither side's data moved since the last completed run
+            opportunity_max_ts = table_max_timestamp(opportunity_engine, opportunity_table, END_DATE)
+            reusable, previous_result = ledger.reusable_result(opportunity_db_uri, opportunity_table, opportunity_max_ts)
+            if reusable:
+                if previous_result:
+                    sink.append(previous_result)
+                print(f"Skipping {opportunity_table}: unchanged since the last completed run.")
+                continue
+            ledger.start(opportunity_db_uri, opportunity_table, opportunity_max_ts)
+
+            # Load the opportunity market once and share it across every liquid exchange below
+            opportunity_series = fetch_candle_series(opportunity_engine, opportunity_table)
+            if opportunity_series.empty:
+                print(f"Skipping {opportunity_table} due to empty opportunity data.")
+                ledger.finish(opportunity_db_uri, opportunity_table, opportunity_max_ts, None)
+                continue
+
+            # Fingerprinted once here and reused by every cache lookup of this unit
+            opportunity_fingerprint = table_fingerprint(opportunity_engine, opportunity_table, START_DATE, END_DATE)
             result = None
+            # Liquid tables compared, fingerprinted by the ledger so a no-result unit is redone once one of them gains data
+            tried_liquid = []
 
             # Iterate through all liquid exchanges in priority order
             for liquid_db_uri in liquid_exchanges:
@@ -281,55 +284,78 @@ def compare_exchanges(opportunity_exchanges, liquid_exchanges, timeframe, batch_
                     continue
 
                 liquid_engine = create_engine(liquid_db_uri)
+                # Stays None for synthetic comparisons, which have no single liquid table to fingerprint
+                liquid_table_name = None
 
                 # Prioritize USDT, USDC, USD comparisons
                 if quote_asset in ['USD', 'USDC']:
                     liquid_table_name = f"{liquid_exchange_name.lower()}_{base_asset.lower()}_usdt_{timeframe.lower()}"
+                    tried_liquid.append((liquid_db_uri, liquid_table_name))
                     result = analyze_opportunities_fixed_bins(
                         opportunity_engine, liquid_engine,
                         opportunity_table, liquid_table_name,
                         base_asset, quote_asset,
-                        opportunity_exchange_name, liquid_exchange_name
+                        opportunity_exchange_name, liquid_exchange_name,
+                        opportunity_series=opportunity_series,
+                        result_cache=result_cache,
+                        opportunity_fingerprint=opportunity_fingerprint
                     )
                     if not result:
                         liquid_table_name = f"{liquid_exchange_name.lower()}_{base_asset.lower()}_usdc_{timeframe.lower()}"
+                        tried_liquid.append((liquid_db_uri, liquid_table_name))
                         result = analyze_opportunities_fixed_bins(
                             opportunity_engine, liquid_engine,
                             opportunity_table, liquid_table_name,
                             base_asset, quote_asset,
-                            opportunity_exchange_name, liquid_exchange_name
+                            opportunity_exchange_name, liquid_exchange_name,
+                            opportunity_series=opportunity_series,
+                            result_cache=result_cache,
+                            opportunity_fingerprint=opportunity_fingerprint
                         )
                     if not result:
                         liquid_table_name = f"{liquid_exchange_name.lower()}_{base_asset.lower()}_usd_{timeframe.lower()}"
+                        tried_liquid.append((liquid_db_uri, liquid_table_name))
                         result = analyze_opportunities_fixed_bins(
                             opportunity_engine, liquid_engine,
                             opportunity_table, liquid_table_name,
                             base_asset, quote_asset,
-                            opportunity_exchange_name, liquid_exchange_name
+                            opportunity_exchange_name, liquid_exchange_name,
+                            opportunity_series=opportunity_series,
+                            result_cache=result_cache,
+                            opportunity_fingerprint=opportunity_fingerprint
                         )
 
                 elif quote_asset == 'USDT':
                     liquid_table_name = f"{liquid_exchange_name.lower()}_{base_asset.lower()}_{quote_asset.lower()}_{timeframe.lower()}"
+                    tried_liquid.append((liquid_db_uri, liquid_table_name))
                     result = analyze_opportunities_fixed_bins(
                         opportunity_engine, liquid_engine,
                         opportunity_table, liquid_table_name,
                         base_asset, quote_asset,
-                        opportunity_exchange_name, liquid_exchange_name
+                        opportunity_exchange_name, liquid_exchange_name,
+                        opportunity_series=opportunity_series,
+                        result_cache=result_cache,
+                        opportunity_fingerprint=opportunity_fingerprint
                     )
                 else:
                     # Synthetic price comparison
-                    synthetic_df = calculate_synthetic_price(
+                    synthetic_series = calculate_synthetic_price(
                         opportunity_engine, liquid_engine,
                         base_asset, quote_asset, timeframe,
-                        liquid_exchange_name
+                        liquid_exchange_name, rates=rates
                     )
-                    if synthetic_df is not None:
+                    # Every candidate leg of the cross rate, so a no-result unit is redone once one of them gains data
+                    tried_liquid.extend(rates.leg_sources(base_asset, quote_asset, liquid_exchange_name))
+                    if synthetic_series is not None:
                         result = analyze_opportunities_fixed_bins(
                             opportunity_engine, liquid_engine,
                             opportunity_table, None,
                             base_asset, quote_asset,
                             opportunity_exchange_name, liquid_exchange_name,
-                            synthetic_df=synthetic_df
+                            synthetic_series=synthetic_series,
+                            opportunity_series=opportunity_series,
+                            result_cache=result_cache,
+                            opportunity_fingerprint=opportunity_fingerprint
                         )
                     else:
                         print(f"Skipping {opportunity_table}: Synthetic price calculation failed.")
@@ -337,52 +363,27 @@ def compare_exchanges(opportunity_exchanges, liquid_exchanges, timeframe, batch_
 
                 # If a result is found, break out of the liquid exchange loop
                 if result:
-                    results.append(result)
-                    batch_counter += 1
+                    sink.append(result)
                     print(f"Result found for {opportunity_table} - {result}")
-
-                    # If the batch size is reached, save the results and reset the list
-                    if batch_counter % batch_size == 0:
-                        save_results_to_excel(results, f"arbitrage_analysis_batch_{batch_counter // batch_size}.xlsx")
-                        results.clear()
                     break
 
+            ledger.finish(opportunity_db_uri, opportunity_table, opportunity_max_ts, result,
+                          liquid_db_uri if result else None, liquid_table_name if result else None, tried_liquid)
             print(f"                                        Processed {i}/{total_tables} tables from the opportunity exchange.")
 
-    # Save any remaining results after the loop finishes
-    if results:
-        save_results_to_excel(results, f"arbitrage_analysis_final.xlsx")
-        print("Final batch saved.")
+    # Only the categorized workbook is built at the end; the CSV log already holds every result
+    sink.close()
+    print(ledger.summary())
+    ledger.close()
+    print(result_cache.summary())
+    result_cache.close()
+    if sink.rows_written:
+        sink.write_excel("arbitrage_analysis_final.xlsx")
+        print(f"Final workbook saved from {results_log}.")
 
 # Save results to Excel with categorized and sorted tabs
 def save_results_to_excel(results, filename="arbitrage_analysis.xlsx"):
-    final_df = pd.DataFrame(results)
-
-    # Define the tabs and their filters
-    tab_definitions = {
-        "USD Buy":  (['usdt', 'usdc', 'usd'], "monthly_buy_profit_percentage"),
-        "USD Sell": (['usdt', 'usdc', 'usd'], "monthly_sell_profit_percentage"),
-        "BTC Buy":  (['btc'], "monthly_buy_profit_percentage"),
-        "BTC Sell": (['btc'], "monthly_sell_profit_percentage"),
-        "ETH Buy":  (['eth'], "monthly_buy_profit_percentage"),
-        "ETH Sell": (['eth'], "monthly_sell_profit_percentage"),
-        "Others Buy": (None, "monthly_buy_profit_percentage"),
-        "Others Sell": (None, "monthly_sell_profit_percentage")
-    }
-
-    with pd.ExcelWriter(filename, engine='xlsxwriter') as writer:
-        for tab_name, (quote_assets, sort_column) in tab_definitions.items():
-            if quote_assets:
-                filtered_df = final_df[final_df['exchange_quote_asset'].str.lower().isin(quote_assets)]
-            else:
-                filtered_df = final_df[~final_df['exchange_quote_asset'].str.lower().isin(['usdt','usdc','usd','btc','eth'])]
-
-            sorted_df = filtered_df.sort_values(by=sort_column, ascending=False)
-
-            if not sorted_df.empty:
-                sorted_df.to_excel(writer, sheet_name=tab_name, index=False)
-
-    print(f"Results saved to {filename}")
+    write_categorized_excel(pd.DataFrame(results), filename)
 
 
 # ------------------------------------------------------------------------------
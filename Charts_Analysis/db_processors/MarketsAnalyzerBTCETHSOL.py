@@ -2,15 +2,14 @@ import pandas as pd
 import numpy as np
 import xlsxwriter
 from sqlalchemy import create_engine, inspect
+from alignHelpers import *
+from syntheticRates import *
 
 START_DATE = pd.to_datetime("2025-07-01 00:00:00")
 END_DATE = pd.to_datetime("2025-07-15 23:59:59")
 
-FIAT_TO_USD = {
-    'eur': ('kraken', 'kraken_eur_usd_1m'),
-    'gbp': ('kraken', 'kraken_gbp_usd_1m'),
-    'cad': ('kraken', 'kraken_usd_cad_1m')
-}
+# Fiat quotes priced through Kraken's USD pairs (USD/CAD is inverted inside the rate engine)
+FIAT_TO_USD = FIAT_USD_LEGS
 
 INTERESTING_ASSETS = {"BTC", "ETH", "SOL"}
 
@@ -21,6 +20,9 @@ EXCHANGE_ENGINES = {
     'kraken': create_engine("postgresql+psycopg2://postgres:@localhost:5432/Testing_Data_Collection_Kraken"),
 }
 
+# Synthetic legs are loaded once for the whole run and shared by every opportunity table
+SYNTHETIC_RATES = SyntheticRateEngine(EXCHANGE_ENGINES, timeframe='1m', start=START_DATE, end=END_DATE)
+
 def parse_table_name(table_name):
     parts = table_name.split('_')
     if len(parts) == 4:
@@ -59,38 +61,19 @@ def is_relevant_market(base, quote):
     return base.upper() in INTERESTING_ASSETS or quote.upper() in INTERESTING_ASSETS
 
 def calculate_synthetic_price(base, quote):
-    base_table = f"binance_{base.lower()}_usdt_1m"
-    base_df = fetch_market_data(EXCHANGE_ENGINES['binance'], base_table)
-
-    if quote.lower() in FIAT_TO_USD:
-        fiat_exchange, quote_table = FIAT_TO_USD[quote.lower()]
-        quote_df = fetch_market_data(EXCHANGE_ENGINES[fiat_exchange], quote_table)
-    else:
-        quote_table = f"binance_{quote.lower()}_usdt_1m"
-        quote_df = fetch_market_data(EXCHANGE_ENGINES['binance'], quote_table)
-
-    if base_df.empty or quote_df.empty:
+    rate = SYNTHETIC_RATES.cross_rate(base, quote, 'binance')
+    if rate is None:
         return pd.DataFrame()
-
-    merged = pd.merge(base_df, quote_df, on='timestamp', suffixes=('_base', '_quote'))
-    if quote.lower() == 'cad':
-        merged['price_liquid'] = merged['close_base'] * merged['close_quote']
-    else:
-        merged['price_liquid'] = merged['close_base'] / merged['close_quote']
-
-    merged['timestamp'] = pd.to_datetime(merged['timestamp'])
-    merged['low_liquid'] = merged['price_liquid']
-    merged['high_liquid'] = merged['price_liquid']
-    merged['volume_liquid'] = (
-        (merged['volume_base'] + merged['volume_quote']) / 2
-        if 'volume_base' in merged.columns and 'volume_quote' in merged.columns
-        else 0
-    )
-    return merged[['timestamp', 'low_liquid', 'high_liquid', 'volume_liquid']]
+    return pd.DataFrame({
+        'timestamp': rate.datetimes(),
+        'low_liquid': rate.low,
+        'high_liquid': rate.high,
+        'volume_liquid': rate.volume
+    }, copy=False)
 
 
-def calculate_differences(opp_df, liquid_df):
-    merged = pd.merge(opp_df, liquid_df, on='timestamp')
+def calculate_differences(opp_df, liquid_df, tolerance_ms=ALIGN_TOLERANCE_MS):
+    merged = asof_merge(opp_df, liquid_df, tolerance_ms=tolerance_ms)
     merged['Low Difference (%)'] = ((merged['low'] - merged['low_liquid']) / merged['low_liquid']) * 100
     merged['High Difference (%)'] = ((merged['high'] - merged['high_liquid']) / merged['high_liquid']) * 100
     return merged
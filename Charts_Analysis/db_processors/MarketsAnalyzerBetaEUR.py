@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
 from sqlalchemy import create_engine
+from alignHelpers import *
+from syntheticRates import *
 
 
 def parse_table_name(table_name):
@@ -14,13 +16,15 @@ def parse_table_name(table_name):
     raise ValueError("Table name format is incorrect. Expected format: 'exchange_baseAsset_quoteAsset_timeframe'")
 
 
-def fetch_eur_usd_conversion_df(engine, table_name="kraken_eur_usd_1m"):
-    with engine.connect() as connection:
-        df = pd.read_sql_table(table_name, con=connection)
-    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', errors='coerce')
-    df = df.dropna(subset=['timestamp'])
-    df = df[['timestamp', 'close']].rename(columns={'close': 'eur_usd_rate'})
-    return df
+# EUR/USD rate from the synthetic-rate engine: the Kraken table or a more liquid EUR/USD(T) market, date-filtered in SQL
+def fetch_eur_usd_conversion_df(engine, table_name="kraken_eur_usd_1m", start_datetime=None, end_datetime=None):
+    rates = SyntheticRateEngine({'kraken': engine}, timeframe=table_name.rsplit('_', 1)[-1],
+                                start=start_datetime, end=end_datetime,
+                                fiat_legs={'eur': ('kraken', table_name, False)})
+    eur_usd = rates.usd_rate('eur')
+    if eur_usd is None:
+        return pd.DataFrame(columns=['timestamp', 'eur_usd_rate'])
+    return pd.DataFrame({'timestamp': eur_usd.datetimes(), 'eur_usd_rate': eur_usd.close}, copy=False)
 
 
 def analyze_opportunities_fixed_bins(opportunity_database_uri, liquid_database_uri,
@@ -52,11 +56,11 @@ def analyze_opportunities_fixed_bins(opportunity_database_uri, liquid_database_u
         base_usdt_df = base_usdt_df[(base_usdt_df['timestamp'] >= start_datetime) & (base_usdt_df['timestamp'] <= end_datetime)]
 
     kraken_engine = create_engine("postgresql+psycopg2://postgres:@localhost:5432/Testing_Data_Collection_Kraken")
-    eur_usd_df = fetch_eur_usd_conversion_df(kraken_engine)
+    eur_usd_df = fetch_eur_usd_conversion_df(kraken_engine, start_datetime=start_datetime, end_datetime=end_datetime)
 
     # Merge all
-    merged_df = pd.merge(opportunity_df, base_usdt_df, on='timestamp', suffixes=('_opportunity', '_usdt'))
-    merged_df = pd.merge(merged_df, eur_usd_df, on='timestamp', how='inner')
+    merged_df = asof_merge(opportunity_df, base_usdt_df, suffixes=('_opportunity', '_usdt'))
+    merged_df = asof_merge(merged_df, eur_usd_df)
 
     # Convert USDT prices to EUR using EUR/USD rate
     merged_df['low_liquid'] = merged_df['low_usdt'] / merged_df['eur_usd_rate']
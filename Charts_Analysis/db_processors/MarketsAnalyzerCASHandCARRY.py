@@ -2,6 +2,11 @@ import pandas as pd
 import numpy as np
 import xlsxwriter
 from sqlalchemy import create_engine, inspect
+from alignHelpers import *
+from candleSeries import *
+from resultSink import *
+from jobLedger import *
+from fundingRates import *
 
 # Optional date filters; if both are None, the entire dataset will be analyzed
 START_DATE = pd.to_datetime("2025-04-01 00:00:00")
@@ -18,27 +23,19 @@ def parse_table_name(table_name):
         return exchange.upper(), base_asset.upper(), quote_asset.upper(), timeframe
     raise ValueError(f"Table name format is incorrect: '{table_name}' - Expected format: 'exchange_baseAsset_quoteAsset_timeframe'")
 
-# Fetch data from a table
-def fetch_market_data(engine, table_name, is_liquid=False):
+# Load a table as a compact CandleSeries, date and zero-volume filtered in SQL
+def fetch_candle_series(engine, table_name, min_volume=0):
     try:
         print(f"Fetching market data from table: {table_name}")
-        with engine.connect() as connection:
-            df = pd.read_sql_table(table_name, con=connection)
-        if 'timestamp' in df.columns:
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', errors='coerce')
-            df = df.dropna(subset=['timestamp'])
-            if START_DATE and END_DATE:
-                df = df[(df['timestamp'] >= START_DATE) & (df['timestamp'] <= END_DATE)]
-        df = df[df['volume'] > 0]
-        if is_liquid:
-            df.rename(columns={'low': 'low_liquid', 'high': 'high_liquid', 'close': 'close_liquid', 'volume': 'volume_liquid'}, inplace=True)
-        print(f"Fetched {len(df)} rows from {table_name}")
-        return df
-    except Exception as e:
-        print(f"Error fetching data from {table_name}: {e}")
-        return pd.DataFrame()
+        series = CandleSeries.load(engine, table_name, START_DATE, END_DATE, min_volume=min_volume)
+        print(f"Fetched {len(series)} rows from {table_name}")
+        return series
+    except ValueError as e:
+        print(f"Error: {e}")
+        return CandleSeries.empty_series(table_name)
 
 # Calculate bins and monthly profit
+# With buy_carry/sell_carry columns (per-row funding %, see fundingRates) each bin also carries its funding-adjusted return
 def calculate_opportunity_bins(merged_df, quote_asset, threshold=0.5, step=0.1):
     bins = {}
     days_in_dataset = (merged_df['timestamp'].max() - merged_df['timestamp'].min()).days or 1
@@ -60,14 +57,23 @@ def calculate_opportunity_bins(merged_df, quote_asset, threshold=0.5, step=0.1):
 
             total_return = abs(t / 100 * len(filtered) * avg_volume)
             monthly_return = (total_return / avg_volume) * (30 / days_in_dataset) * 100 if avg_volume else 0
-            bins[f"{side}_≥{t:.1f}%"] = (len(filtered), total_return, monthly_return, avg_volume, median_volume)
+            carry = filtered[f'{side}_carry'].to_numpy() if f'{side}_carry' in filtered else np.empty(0)
+            avg_carry, adjusted_monthly_return = funding_adjusted_bin(t, carry, days_in_dataset)
+            bins[f"{side}_≥{t:.1f}%"] = (len(filtered), total_return, monthly_return, avg_volume, median_volume,
+                                         avg_carry, adjusted_monthly_return)
     return bins
 
-# Compare each futures (opportunity) table to each spot (liquid) table
-def compare_exchanges(opportunity_exchanges, liquid_exchanges, timeframe):
-    results = []
+# Compare each futures (opportunity) table to each spot (liquid) table, streaming results to a CSV log
+def compare_exchanges(opportunity_exchanges, liquid_exchanges, timeframe, results_log="cash_and_carry_results.csv", ledger_path="cash_and_carry_ledger.sqlite"):
+    # Rewritten every run: units the ledger skips re-log their stored result, so the log holds exactly this sweep
+    sink = ResultSink(results_log)
+    # Finished units are keyed by these params; changing any of them starts a fresh set of units
+    ledger = JobLedger(ledger_path, {
+        'analyzer': 'MarketsAnalyzerCASHandCARRY', 'timeframe': timeframe,
+        'start': START_DATE, 'end': END_DATE, 'liquid_exchanges': liquid_exchanges,
+        'funding_hold_hours': FUNDING_HOLD_HOURS
+    }, end=END_DATE)
     excluded_quote_assets = ['try']
-    batch_counter = 0
 
     for opportunity_db_uri in opportunity_exchanges:
         print(f"Connecting to opportunity exchange database: {opportunity_db_uri}")
@@ -92,7 +98,30 @@ def compare_exchanges(opportunity_exchanges, liquid_exchanges, timeframe):
             if quote_asset.lower() in excluded_quote_assets or table_timeframe != timeframe:
                 continue
 
+            # Reuse the ledger result when neither side's data moved since the last completed run
+            opportunity_max_ts = table_max_timestamp(opportunity_engine, opportunity_table, END_DATE)
+            reusable, previous_result = ledger.reusable_result(opportunity_db_uri, opportunity_table, opportunity_max_ts)
+            if reusable:
+                if previous_result:
+                    sink.append(previous_result)
+                print(f"Skipping {opportunity_table}: unchanged since the last completed run.")
+                continue
+            ledger.start(opportunity_db_uri, opportunity_table, opportunity_max_ts)
+
+            # Load the futures market once and share it across every spot comparison below
+            opportunity_series = fetch_candle_series(opportunity_engine, opportunity_table)
+            if opportunity_series.empty:
+                print(f"Skipping {opportunity_table} due to empty opportunity data.")
+                ledger.finish(opportunity_db_uri, opportunity_table, opportunity_max_ts, None)
+                continue
+
+            # Funding of the futures leg, shared by every spot comparison below
+            funding = FundingSeries.load(opportunity_engine, opportunity_table, START_DATE, END_DATE)
+
             result = None
+            failed = False
+            # Spot tables tried (missing ones included), fingerprinted by the ledger so a no-result unit is redone once one gains data
+            tried_liquid = []
             for liquid_db_uri in liquid_exchanges:
                 liquid_exchange_name = liquid_db_uri.split("_")[-1]
                 liquid_engine = create_engine(liquid_db_uri)
@@ -100,21 +129,24 @@ def compare_exchanges(opportunity_exchanges, liquid_exchanges, timeframe):
                 liquid_tables = inspector_liq.get_table_names()
 
                 spot_table_name = f"{liquid_exchange_name.lower()}_{base_asset.lower()}_{quote_asset.lower()}_{table_timeframe.lower()}"
+                tried_liquid.append((liquid_db_uri, spot_table_name))
                 if spot_table_name not in liquid_tables:
                     continue
 
                 try:
                     print(f"Comparing futures {opportunity_table} to spot {spot_table_name}")
-                    df_opp = fetch_market_data(opportunity_engine, opportunity_table)
-                    df_liq = fetch_market_data(liquid_engine, spot_table_name, is_liquid=True)
-
-                    merged = pd.merge(df_opp, df_liq, on='timestamp', how='inner')
+                    liquid_series = fetch_candle_series(liquid_engine, spot_table_name)
+                    merged = asof_merge(opportunity_series.to_frame(), liquid_series.to_frame(
+                        {'low': 'low_liquid', 'high': 'high_liquid', 'close': 'close_liquid', 'volume': 'volume_liquid'}))
                     if merged.empty:
                         print(f"No valid rows found for {opportunity_table}")
                         continue
 
                     merged['low_diff'] = ((merged['low_liquid'] - merged['low']) / merged['low']) * 100
                     merged['high_diff'] = ((merged['high_liquid'] - merged['high']) / merged['high']) * 100
+                    # buy: long spot / short futures (receives funding); sell: short spot / long futures (pays it)
+                    merged['buy_carry'] = side_carry_pct(merged['timestamp'], short_leg=funding)
+                    merged['sell_carry'] = side_carry_pct(merged['timestamp'], long_leg=funding)
 
                     bins = calculate_opportunity_bins(merged, quote_asset)
                     best_buy = max((k for k in bins if k.startswith("buy")), key=lambda x: bins[x][2], default=None)
@@ -123,7 +155,8 @@ def compare_exchanges(opportunity_exchanges, liquid_exchanges, timeframe):
                     if best_buy is None and best_sell is None:
                         continue
 
-                    result = {
+                    # Built in full before it becomes the unit's result, so a failed funding/basis lookup leaves result unset
+                    row = {
                         "opportunity_exchange": opportunity_exchange_name.capitalize(),
                         "liquid_exchange": liquid_exchange_name.capitalize(),
                         "market_pair": f"{base_asset}/{quote_asset}",
@@ -135,39 +168,35 @@ def compare_exchanges(opportunity_exchanges, liquid_exchanges, timeframe):
                         "monthly_sell_profit_percentage": bins[best_sell][2] if best_sell else None,
                         "exchange_quote_asset": quote_asset
                     }
+                    window_ms = to_ms_array(merged['timestamp'].agg(['min', 'max']))
+                    row.update(funding_result_columns(
+                        bins[best_buy] if best_buy else None, bins[best_sell] if best_sell else None,
+                        funding.monthly_short_pct(window_ms[0], window_ms[1]),
+                        average_basis_pct(opportunity_engine, opportunity_table, START_DATE, END_DATE)))
+                    result = row
                     print(f"Result found for {opportunity_table} - {result}")
-                    results.append(result)
-                    batch_counter += 1
+                    sink.append(result)
                     break
                 except Exception as e:
                     print(f"Error comparing {opportunity_table} and {spot_table_name}: {e}")
+                    failed = True
+
+            # A unit that hit an error stays 'running' in the ledger so the next run retries it
+            if result or not failed:
+                ledger.finish(opportunity_db_uri, opportunity_table, opportunity_max_ts, result,
+                              liquid_db_uri if result else None, spot_table_name if result else None, tried_liquid)
 
             print(f"Processed {i}/{len(valid_futures_tables)} tables from the opportunity exchange.")
 
-    print(f"Completed processing. Found {len(results)} opportunities.")
-    return results
+    sink.close()
+    print(ledger.summary())
+    ledger.close()
+    print(f"Completed processing. Found {sink.rows_written} opportunities.")
+    return sink
 
 # Save results to Excel
 def save_results_to_excel(results, filename="cash_and_carry_opportunities.xlsx"):
-    df = pd.DataFrame(results)
-    tab_definitions = {
-        "USD Buy":  (["usdt", "usdc", "usd"], "monthly_buy_profit_percentage"),
-        "USD Sell": (["usdt", "usdc", "usd"], "monthly_sell_profit_percentage"),
-        "BTC Buy":  (["btc"], "monthly_buy_profit_percentage"),
-        "BTC Sell": (["btc"], "monthly_sell_profit_percentage"),
-        "ETH Buy":  (["eth"], "monthly_buy_profit_percentage"),
-        "ETH Sell": (["eth"], "monthly_sell_profit_percentage"),
-        "Others Buy": (None, "monthly_buy_profit_percentage"),
-        "Others Sell": (None, "monthly_sell_profit_percentage")
-    }
-    with pd.ExcelWriter(filename, engine='xlsxwriter') as writer:
-        for tab_name, (quote_assets, sort_col) in tab_definitions.items():
-            if quote_assets:
-                filtered = df[df['exchange_quote_asset'].str.lower().isin(quote_assets)]
-            else:
-                filtered = df[~df['exchange_quote_asset'].str.lower().isin(['usdt','usdc','usd','btc','eth'])]
-            filtered.sort_values(by=sort_col, ascending=False).to_excel(writer, sheet_name=tab_name, index=False)
-    print(f"Saved results to {filename}")
+    write_categorized_excel(pd.DataFrame(results), filename)
 
 # ----------------------------------------------------------------------------
 # Run Comparison with DB URIs and timeframe
@@ -185,8 +214,8 @@ if __name__ == "__main__":
 
     timeframe = '1m'
 
-    final_results = compare_exchanges(opportunity_exchanges, liquid_exchanges, timeframe)
-    if final_results:
-        save_results_to_excel(final_results)
+    sink = compare_exchanges(opportunity_exchanges, liquid_exchanges, timeframe)
+    if sink.rows_written:
+        sink.write_excel("cash_and_carry_opportunities.xlsx")
     else:
         print("No arbitrage opportunities found.")
@@ -2,6 +2,9 @@ import pandas as pd
 import numpy as np
 import xlsxwriter
 from sqlalchemy import create_engine, inspect
+from alignHelpers import *
+from candleSeries import *
+from fundingRates import *
 
 # Optional date filters; if both are None, the entire dataset will be analyzed
 START_DATE = pd.to_datetime("2025-04-01 00:00:00")
@@ -18,32 +21,22 @@ def parse_table_name(table_name):
         return exchange.upper(), base_asset.upper(), quote_asset.upper(), timeframe
     raise ValueError(f"Table name format is incorrect: '{table_name}' - Expected format: 'exchange_baseAsset_quoteAsset_timeframe'")
 
-# Fetch data from a table
-def fetch_market_data(engine, table_name, suffix=''):
+# Load a table as a compact CandleSeries, date and zero-volume filtered in SQL
+def fetch_candle_series(engine, table_name, min_volume=0):
     try:
         print(f"Fetching market data from table: {table_name}")
-        with engine.connect() as connection:
-            df = pd.read_sql_table(table_name, con=connection)
-        if 'timestamp' in df.columns:
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', errors='coerce')
-            df = df.dropna(subset=['timestamp'])
-            if START_DATE and END_DATE:
-                df = df[(df['timestamp'] >= START_DATE) & (df['timestamp'] <= END_DATE)]
-        df = df[df['volume'] > 0]
-        if suffix:
-            df.rename(columns={
-                'low': f'low_{suffix}',
-                'high': f'high_{suffix}',
-                'close': f'close_{suffix}',
-                'volume': f'volume_{suffix}'
-            }, inplace=True)
-        print(f"Fetched {len(df)} rows from {table_name}")
-        return df
-    except Exception as e:
-        print(f"Error fetching data from {table_name}: {e}")
-        return pd.DataFrame()
+        series = CandleSeries.load(engine, table_name, START_DATE, END_DATE, min_volume=min_volume)
+        print(f"Fetched {len(series)} rows from {table_name}")
+        return series
+    except ValueError as e:
+        print(f"Error: {e}")
+        return CandleSeries.empty_series(table_name)
+
+# Candle columns of each side of the merge, e.g. low -> low_base
+SUFFIXED_COLUMNS = {suffix: {col: f'{col}_{suffix}' for col in ('low', 'high', 'close', 'volume')} for suffix in ('base', 'quote')}
 
 # Calculate bins and monthly profit
+# With buy_carry/sell_carry columns (per-row funding %, see fundingRates) each bin also carries its funding-adjusted return
 def calculate_opportunity_bins(merged_df, threshold=0.5, step=0.1):
     bins = {}
     days_in_dataset = (merged_df['timestamp'].max() - merged_df['timestamp'].min()).days or 1
@@ -63,7 +56,10 @@ def calculate_opportunity_bins(merged_df, threshold=0.5, step=0.1):
             median_volume = (filtered[vol_col] * filtered[close_col]).median()
             total_return = abs(t / 100 * len(filtered) * avg_volume)
             monthly_return = (total_return / avg_volume) * (30 / days_in_dataset) * 100 if avg_volume else 0
-            bins[f"{side}_≥{t:.1f}%"] = (len(filtered), total_return, monthly_return, avg_volume, median_volume)
+            carry = filtered[f'{side}_carry'].to_numpy() if f'{side}_carry' in filtered else np.empty(0)
+            avg_carry, adjusted_monthly_return = funding_adjusted_bin(t, carry, days_in_dataset)
+            bins[f"{side}_≥{t:.1f}%"] = (len(filtered), total_return, monthly_return, avg_volume, median_volume,
+                                         avg_carry, adjusted_monthly_return)
     return bins
 
 # Compare each opportunity futures table to each liquid futures table
@@ -90,6 +86,13 @@ def compare_exchanges(opportunity_exchanges, liquid_exchanges, timeframe):
             if quote_asset.lower() in excluded_quote_assets or table_timeframe != timeframe:
                 continue
 
+            # Load the opportunity contract once and share it across every liquid exchange below
+            opp_series = fetch_candle_series(opp_engine, opp_table)
+            if opp_series.empty:
+                print(f"Skipping {opp_table} due to empty opportunity data.")
+                continue
+            opp_funding = FundingSeries.load(opp_engine, opp_table, START_DATE, END_DATE)
+
             for liq_uri in liquid_exchanges:
                 liq_engine = create_engine(liq_uri)
                 liq_name = liq_uri.split("_")[-1]
@@ -100,16 +103,18 @@ def compare_exchanges(opportunity_exchanges, liquid_exchanges, timeframe):
 
                 try:
                     print(f"Comparing futures {opp_table} to futures {match_name}")
-                    df_opp = fetch_market_data(opp_engine, opp_table, suffix='base')
-                    df_liq = fetch_market_data(liq_engine, match_name, suffix='quote')
-
-                    merged = pd.merge(df_opp, df_liq, on='timestamp', how='inner')
+                    liq_series = fetch_candle_series(liq_engine, match_name)
+                    merged = asof_merge(opp_series.to_frame(SUFFIXED_COLUMNS['base']), liq_series.to_frame(SUFFIXED_COLUMNS['quote']))
                     if merged.empty:
                         print(f"No valid rows found for {opp_table}")
                         continue
 
                     merged['low_diff'] = ((merged['low_quote'] - merged['low_base']) / merged['low_base']) * 100
                     merged['high_diff'] = ((merged['high_quote'] - merged['high_base']) / merged['high_base']) * 100
+                    # buy: long the liquid contract / short the opportunity one; sell: the reverse
+                    liq_funding = FundingSeries.load(liq_engine, match_name, START_DATE, END_DATE)
+                    merged['buy_carry'] = side_carry_pct(merged['timestamp'], long_leg=liq_funding, short_leg=opp_funding)
+                    merged['sell_carry'] = side_carry_pct(merged['timestamp'], long_leg=opp_funding, short_leg=liq_funding)
 
                     bins = calculate_opportunity_bins(merged)
                     best_buy = max((k for k in bins if k.startswith("buy")), key=lambda x: bins[x][2], default=None)
@@ -130,6 +135,11 @@ def compare_exchanges(opportunity_exchanges, liquid_exchanges, timeframe):
                         "monthly_sell_profit_percentage": bins[best_sell][2] if best_sell else None,
                         "exchange_quote_asset": quote_asset
                     }
+                    window_ms = to_ms_array(merged['timestamp'].agg(['min', 'max']))
+                    result.update(funding_result_columns(
+                        bins[best_buy] if best_buy else None, bins[best_sell] if best_sell else None,
+                        opp_funding.monthly_short_pct(window_ms[0], window_ms[1]),
+                        average_basis_pct(opp_engine, opp_table, START_DATE, END_DATE)))
                     print(f"Result found for {opp_table} - {result}")
                     results.append(result)
                     batch_counter += 1
@@ -2,6 +2,13 @@ import pandas as pd
 import numpy as np
 import xlsxwriter
 from sqlalchemy import create_engine, inspect
+from alignHelpers import *
+from candleSeries import *
+from resultSink import *
+from jobLedger import *
+from resultCache import *
+from syntheticRates import *
+from fundingRates import *
 
 # Optional date filters; if both are None, the entire dataset will be analyzed
 START_DATE = None
@@ -18,86 +25,40 @@ def parse_table_name(table_name):
         return exchange.upper(), base_asset.upper(), quote_asset.upper(), timeframe
     raise ValueError(f"Table name format is incorrect: '{table_name}' - Expected format: 'exchange_baseAsset_quoteAsset_timeframe'")
 
-# Fetch data from a table
-def fetch_market_data(engine, table_name, is_liquid=False):
+# Load a table as a compact CandleSeries, date-filtered in SQL
+def fetch_candle_series(engine, table_name, min_volume=0):
     try:
         print(f"Fetching market data from table: {table_name}")
-        with engine.connect() as connection:
-            df = pd.read_sql_table(table_name, con=connection)
-        if 'timestamp' in df.columns:
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', errors='coerce')
-            df = df.dropna(subset=['timestamp'])
-            
-            # Date‐range filtering if both START_DATE and END_DATE are not None
-            if START_DATE and END_DATE:
-                df = df[(df['timestamp'] >= START_DATE) & (df['timestamp'] <= END_DATE)]
-        
-        print(f"Fetched {len(df)} rows from {table_name}")
-
-        # Rename columns for liquid data if needed
-        if is_liquid:
-            df.rename(columns={'low': 'low_liquid', 'high': 'high_liquid', 'volume': 'volume_liquid'}, inplace=True)
-        
-        return df
+        series = CandleSeries.load(engine, table_name, START_DATE, END_DATE, min_volume=min_volume)
+        print(f"Fetched {len(series)} rows from {table_name}")
+        return series
     except ValueError as e:
         print(f"Error: {e}")
-        return pd.DataFrame()
+        return CandleSeries.empty_series(table_name)
 
 # Calculate synthetic price for base/quote asset
-def calculate_synthetic_price(opportunity_engine, liquid_engine, base_asset, quote_asset, timeframe, exchange_name):
+# compare_exchanges passes one SyntheticRateEngine per sweep so every USD/fiat leg is read only once
+def calculate_synthetic_price(opportunity_engine, liquid_engine, base_asset, quote_asset, timeframe, exchange_name, rates=None):
     print(f"Calculating synthetic price for {base_asset}/{quote_asset} on {exchange_name}")
-
-    base_to_usdt_table = f"{exchange_name.lower()}_{base_asset.lower()}_usdt_{timeframe.lower()}"
-    quote_to_usdt_table = f"{exchange_name.lower()}_{quote_asset.lower()}_usdt_{timeframe.lower()}"
-
-    base_df = fetch_market_data(liquid_engine, base_to_usdt_table)
-    quote_df = fetch_market_data(liquid_engine, quote_to_usdt_table)
-    
-    if base_df.empty or quote_df.empty:
-        print(f"Error: Could not fetch synthetic price data for {base_asset}/{quote_asset}. Missing base or quote table.")
-        return None
-
-    synthetic_df = pd.merge(base_df[['timestamp', 'close']],
-                            quote_df[['timestamp', 'close']],
-                            on='timestamp',
-                            suffixes=('_base', '_quote')).copy()
-    synthetic_df['synthetic_price'] = synthetic_df['close_base'] / synthetic_df['close_quote']
-    synthetic_df['low_liquid'] = synthetic_df['synthetic_price']
-    synthetic_df['high_liquid'] = synthetic_df['synthetic_price']
-    
-    return synthetic_df[['timestamp', 'low_liquid', 'high_liquid']].copy()
+    if rates is None:
+        rates = SyntheticRateEngine(timeframe=timeframe, start=START_DATE, end=END_DATE)
+    rates.register(exchange_name, liquid_engine)
+    return rates.cross_rate(base_asset, quote_asset, exchange_name)
 
 # Calculate price differences between opportunity and liquid markets
-def calculate_differences(opportunity_df, liquid_df):
+# Only the columns the bin sweep needs are aligned, so no full-width frame is ever merged or copied
+def calculate_differences(opportunity, liquid, tolerance_ms=ALIGN_TOLERANCE_MS):
     print(f"Calculating price differences...")
-    merged_df = opportunity_df.merge(liquid_df, on='timestamp', suffixes=('_opportunity', '_liquid')).copy()
-    merged_df['Low Difference (%)'] = ((merged_df['low_opportunity'] - merged_df['low_liquid']) / merged_df['low_liquid']) * 100
-    merged_df['High Difference (%)'] = ((merged_df['high_opportunity'] - merged_df['high_liquid']) / merged_df['high_liquid']) * 100
-    return merged_df.copy()
-
-# Fetch and rename market data with .loc to avoid SettingWithCopyWarning
-def fetch_and_rename_market_data(engine, table_name, rename_columns):
-    try:
-        print(f"Fetching market data from table: {table_name}")
-        with engine.connect() as connection:
-            df = pd.read_sql_table(table_name, con=connection)
-        
-        if 'timestamp' in df.columns:
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', errors='coerce')
-            df = df.dropna(subset=['timestamp'])
-
-            # Date‐range filtering if both START_DATE and END_DATE are not None
-            if START_DATE and END_DATE:
-                df = df[(df['timestamp'] >= START_DATE) & (df['timestamp'] <= END_DATE)]
-
-        df = df[df['volume'] > 0]  # Filter out rows where volume is zero
-        df.rename(columns=rename_columns, inplace=True)
-        
-        print(f"Fetched {len(df)} rows from {table_name}")
-        return df
-    except ValueError as e:
-        print(f"Error: {e}")
-        return pd.DataFrame()
+    aligned = align_columns(opportunity.timestamp,
+                            {'low_opportunity': opportunity.low, 'high_opportunity': opportunity.high,
+                             'close_opportunity': opportunity.close, 'volume_opportunity': opportunity.volume},
+                            liquid.timestamp,
+                            {'low_liquid': liquid.low, 'high_liquid': liquid.high},
+                            tolerance_ms)
+    aligned['timestamp'] = aligned['timestamp'].view('datetime64[ms]')
+    aligned['Low Difference (%)'] = ((aligned['low_opportunity'] - aligned['low_liquid']) / aligned['low_liquid']) * 100
+    aligned['High Difference (%)'] = ((aligned['high_opportunity'] - aligned['high_liquid']) / aligned['high_liquid']) * 100
+    return pd.DataFrame(aligned, copy=False)
 
 # Filter the best bins
 def filter_best_bins(occurrences):
@@ -130,38 +91,61 @@ def analyze_opportunities_fixed_bins(opportunity_engine, liquid_engine,
                                      opportunity_table_name, liquid_table_name,
                                      base_asset, quote_asset,
                                      opportunity_exchange_name, liquid_exchange_name,
-                                     synthetic_df=None, threshold=0.5, step=0.1,
-                                     total_tables=1, current_table=1):
+                                     synthetic_series=None, threshold=0.5, step=0.1,
+                                     total_tables=1, current_table=1, opportunity_series=None, result_cache=None,
+                                     opportunity_fingerprint=None):
+    # Pair-level memo: the same tables, window and bins over unchanged data return the stored result
+    # Synthetic comparisons depend on several legs and are always recomputed
+    if result_cache is not None and synthetic_series is None:
+        return result_cache.get_or_compute(
+            {'analyzer': 'MarketsAnalyzerPERPS', 'threshold': threshold, 'step': step, 'start': START_DATE, 'end': END_DATE,
+             'funding_hold_hours': FUNDING_HOLD_HOURS},
+            [(opportunity_engine, opportunity_table_name, opportunity_fingerprint) if opportunity_fingerprint is not None
+             else (opportunity_engine, opportunity_table_name), (liquid_engine, liquid_table_name),
+             (liquid_engine, funding_table_name(liquid_table_name))],
+            lambda: analyze_opportunities_fixed_bins(
+                opportunity_engine, liquid_engine,
+                opportunity_table_name, liquid_table_name,
+                base_asset, quote_asset,
+                opportunity_exchange_name, liquid_exchange_name,
+                threshold=threshold, step=step, opportunity_series=opportunity_series
+            ),
+            START_DATE, END_DATE)
+
     print(f"Analyzing opportunities between {opportunity_table_name} and {liquid_table_name or 'synthetic price'}")
 
-    # Fetch opportunity data
-    rename_opportunity_columns = {'low': 'low_opportunity', 'high': 'high_opportunity', 'volume': 'volume_opportunity'}
-    opportunity_df = fetch_and_rename_market_data(opportunity_engine, opportunity_table_name, rename_opportunity_columns)
+    # Fetch opportunity data (compare_exchanges loads it once and reuses it across liquid exchanges)
+    if opportunity_series is None:
+        opportunity_series = fetch_candle_series(opportunity_engine, opportunity_table_name)
 
-    if opportunity_df.empty:
+    if opportunity_series.empty:
         print(f"Skipping {opportunity_table_name} due to empty opportunity data.")
         return None
 
     # Fetch liquid data
-    if synthetic_df is not None:
-        liquid_df = synthetic_df
+    if synthetic_series is not None:
+        liquid_series = synthetic_series
     else:
-        liquid_df = fetch_and_rename_market_data(liquid_engine, liquid_table_name,
-                                                 {'low': 'low_liquid', 'high': 'high_liquid'})
+        liquid_series = fetch_candle_series(liquid_engine, liquid_table_name)
 
-    if liquid_df.empty:
+    if liquid_series.empty:
         print(f"Skipping {opportunity_table_name} due to empty liquid data.")
         return None
 
     # Calculate price differences
-    merged_df = calculate_differences(opportunity_df, liquid_df)
+    merged_df = calculate_differences(opportunity_series, liquid_series)
     merged_df[f'{quote_asset} Volume_opportunity'] = merged_df['volume_opportunity'] * merged_df['low_opportunity']
 
+    # The liquid leg is the perpetual: buy = long spot / short perp (receives funding), sell = the reverse
+    funding = FundingSeries.load(liquid_engine, liquid_table_name, START_DATE, END_DATE) if synthetic_series is None else None
+    merged_df['buy_carry'] = side_carry_pct(merged_df['timestamp'], short_leg=funding) if funding else np.nan
+    merged_df['sell_carry'] = side_carry_pct(merged_df['timestamp'], long_leg=funding) if funding else np.nan
+
     # Filter valid rows
     valid_rows = merged_df.loc[
         (merged_df['Low Difference (%)'] <= -threshold) |
         (merged_df['High Difference (%)'] >= threshold)
-    ].copy()
+    ]
 
     if valid_rows.empty:
         print(f"No valid rows found for {opportunity_table_name}")
@@ -187,7 +171,9 @@ def analyze_opportunities_fixed_bins(opportunity_engine, liquid_engine,
 
                     # Normalize the monthly return percentage to a 30-day period
                     monthly_return_percentage = (total_return / avg_volume) * (30 / days_in_dataset) * 100
-                    buy_occurrences[f"≥ {t:.1f}%"] = (count, total_return, monthly_return_percentage, avg_volume, median_volume)
+                    carry = buying_opportunities[buying_opportunities['Low Difference (%)'] <= -t]['buy_carry'].to_numpy()
+                    buy_occurrences[f"≥ {t:.1f}%"] = (count, total_return, monthly_return_percentage, avg_volume, median_volume,
+                                                     *funding_adjusted_bin(t, carry, days_in_dataset))
 
     # Calculate sell opportunities
     selling_opportunities = valid_rows[valid_rows['High Difference (%)'] >= threshold]
@@ -204,7 +190,9 @@ def analyze_opportunities_fixed_bins(opportunity_engine, liquid_engine,
                 if avg_volume != 0 and days_in_dataset > 0:
                     total_return = abs(t / 100 * count * avg_volume)
                     monthly_return_percentage = (total_return / avg_volume) * (30 / days_in_dataset) * 100
-                    sell_occurrences[f"≥ {t:.1f}%"] = (count, total_return, monthly_return_percentage, avg_volume, median_volume)
+                    carry = selling_opportunities[selling_opportunities['High Difference (%)'] >= t]['sell_carry'].to_numpy()
+                    sell_occurrences[f"≥ {t:.1f}%"] = (count, total_return, monthly_return_percentage, avg_volume, median_volume,
+                                                      *funding_adjusted_bin(t, carry, days_in_dataset))
 
     # Get the best buy and sell bins (highest monthly return)
     best_buy_opportunity = max(buy_occurrences.items(), key=lambda x: x[1][2], default=None)
@@ -224,20 +212,33 @@ def analyze_opportunities_fixed_bins(opportunity_engine, liquid_engine,
         'median_sell_volume': best_sell_opportunity[1][4] if best_sell_opportunity else None,
         'monthly_buy_profit_percentage': best_buy_opportunity[1][2] if best_buy_opportunity else None,
         'monthly_sell_profit_percentage': best_sell_opportunity[1][2] if best_sell_opportunity else None,
-        'exchange_quote_asset': quote_asset
+        'exchange_quote_asset': quote_asset,
+        **funding_result_columns(
+            best_buy_opportunity[1] if best_buy_opportunity else None,
+            best_sell_opportunity[1] if best_sell_opportunity else None,
+            funding.monthly_short_pct(*to_ms_array(merged_df['timestamp'].agg(['min', 'max']))) if funding else None,
+            average_basis_pct(liquid_engine, liquid_table_name, START_DATE, END_DATE) if funding else None)
     }
 
-# Compare exchanges and find arbitrage opportunities (with batch saving in increments of 4)
+# Compare exchanges and find arbitrage opportunities, streaming every result to a CSV log
 # Updated compare_exchanges function with fix for futures handling
 
 # Updated compare_exchanges function to compare spot (opportunity) vs futures (liquid)
 
 # Updated compare_exchanges function to compare spot (opportunity) vs futures (liquid), including same exchange
 
-def compare_exchanges(opportunity_exchanges, liquid_exchanges, timeframe, batch_size=2000):
+def compare_exchanges(opportunity_exchanges, liquid_exchanges, timeframe, results_log="arbitrage_analysis_perps_results.csv", ledger_path="arbitrage_analysis_perps_ledger.sqlite",
+                      result_cache_path="arbitrage_analysis_perps_cache.sqlite"):
     excluded_quote_assets = ['try']
-    results = []
-    batch_counter = 0
+    # Rewritten every run: units the ledger skips re-log their stored result, so the log holds exactly this sweep
+    sink = ResultSink(results_log)
+    # Finished units are keyed by these params; changing any of them starts a fresh set of units
+    ledger = JobLedger(ledger_path, {
+        'analyzer': 'MarketsAnalyzerPERPS', 'timeframe': timeframe,
+        'start': START_DATE, 'end': END_DATE, 'liquid_exchanges': liquid_exchanges,
+        'funding_hold_hours': FUNDING_HOLD_HOURS
+    }, end=END_DATE)
+    result_cache = PairResultCache(result_cache_path)
 
     for opportunity_db_uri in opportunity_exchanges:
         print(f"Connecting to opportunity exchange database: {opportunity_db_uri}")
@@ -269,7 +270,28 @@ def compare_exchanges(opportunity_exchanges, liquid_exchanges, timeframe, batch_
                 print(f"Skipping table {opportunity_table} due to base asset being excluded.")
                 continue
 
+            # Reuse the ledger result when neither side's data moved since the last completed run
+            opportunity_max_ts = table_max_timestamp(opportunity_engine, opportunity_table, END_DATE)
+            reusable, previous_result = ledger.reusable_result(opportunity_db_uri, opportunity_table, opportunity_max_ts)
+            if reusable:
+                if previous_result:
+                    sink.append(previous_result)
+                print(f"Skipping {opportunity_table}: unchanged since the last completed run.")
+                continue
+            ledger.start(opportunity_db_uri, opportunity_table, opportunity_max_ts)
+
+            # Load the opportunity market once and share it across every liquid exchange below
+            opportunity_series = fetch_candle_series(opportunity_engine, opportunity_table)
+            if opportunity_series.empty:
+                print(f"Skipping {opportunity_table} due to empty opportunity data.")
+                ledger.finish(opportunity_db_uri, opportunity_table, opportunity_max_ts, None)
+                continue
+
+            # Fingerprinted once here and reused by every cache lookup of this unit
+            opportunity_fingerprint = table_fingerprint(opportunity_engine, opportunity_table, START_DATE, END_DATE)
             result = None
+            # Liquid tables compared, fingerprinted by the ledger so a no-result unit is redone once one of them gains data
+            tried_liquid = []
 
             for liquid_db_uri in liquid_exchanges:
                 liquid_exchange_name = liquid_db_uri.split("_")[-1]
@@ -279,61 +301,42 @@ def compare_exchanges(opportunity_exchanges, liquid_exchanges, timeframe, batch_
                 # Compare spot to futures: try futures markets on the liquid side
                 for q in ['usdt', 'usdc', 'usd']:
                     liquid_table_name = f"{liquid_exchange_name.lower()}_{base_asset.lower()}_{q}:{q}_{timeframe.lower()}"
+                    tried_liquid.append((liquid_db_uri, liquid_table_name))
                     result = analyze_opportunities_fixed_bins(
                         opportunity_engine, liquid_engine,
                         opportunity_table, liquid_table_name,
                         base_asset, quote_asset,
-                        opportunity_exchange_name, liquid_exchange_name
+                        opportunity_exchange_name, liquid_exchange_name,
+                        opportunity_series=opportunity_series,
+                        result_cache=result_cache,
+                        opportunity_fingerprint=opportunity_fingerprint
                     )
                     if result:
                         break
 
                 if result:
-                    results.append(result)
-                    batch_counter += 1
+                    sink.append(result)
                     print(f"Result found for {opportunity_table} - {result}")
-
-                    if batch_counter % batch_size == 0:
-                        save_results_to_excel(results, f"arbitrage_analysis_batch_{batch_counter // batch_size}.xlsx")
-                        results.clear()
                     break
 
+            ledger.finish(opportunity_db_uri, opportunity_table, opportunity_max_ts, result,
+                          liquid_db_uri if result else None, liquid_table_name if result else None, tried_liquid)
             print(f"                                        Processed {i}/{total_tables} tables from the opportunity exchange.")
 
-    if results:
-        save_results_to_excel(results, f"arbitrage_analysis_perps_final.xlsx")
-        print("Final batch saved.")
+    # Only the categorized workbook is built at the end; the CSV log already holds every result
+    sink.close()
+    print(ledger.summary())
+    ledger.close()
+    print(result_cache.summary())
+    result_cache.close()
+    if sink.rows_written:
+        sink.write_excel("arbitrage_analysis_perps_final.xlsx")
+        print(f"Final workbook saved from {results_log}.")
 
 
 # Save results to Excel with categorized and sorted tabs
 def save_results_to_excel(results, filename="arbitrage_analysis_perps.xlsx"):
-    final_df = pd.DataFrame(results)
-
-    # Define the tabs and their filters
-    tab_definitions = {
-        "USD Buy":  (['usdt', 'usdc', 'usd'], "monthly_buy_profit_percentage"),
-        "USD Sell": (['usdt', 'usdc', 'usd'], "monthly_sell_profit_percentage"),
-        "BTC Buy":  (['btc'], "monthly_buy_profit_percentage"),
-        "BTC Sell": (['btc'], "monthly_sell_profit_percentage"),
-        "ETH Buy":  (['eth'], "monthly_buy_profit_percentage"),
-        "ETH Sell": (['eth'], "monthly_sell_profit_percentage"),
-        "Others Buy": (None, "monthly_buy_profit_percentage"),
-        "Others Sell": (None, "monthly_sell_profit_percentage")
-    }
-
-    with pd.ExcelWriter(filename, engine='xlsxwriter') as writer:
-        for tab_name, (quote_assets, sort_column) in tab_definitions.items():
-            if quote_assets:
-                filtered_df = final_df[final_df['exchange_quote_asset'].str.lower().isin(quote_assets)]
-            else:
-                filtered_df = final_df[~final_df['exchange_quote_asset'].str.lower().isin(['usdt','usdc','usd','btc','eth'])]
-
-            sorted_df = filtered_df.sort_values(by=sort_column, ascending=False)
-
-            if not sorted_df.empty:
-                sorted_df.to_excel(writer, sheet_name=tab_name, index=False)
-
-    print(f"Results saved to {filename}")
+    write_categorized_excel(pd.DataFrame(results), filename)
 
 
 # ------------------------------------------------------------------------------
@@ -2,6 +2,7 @@ import pandas as pd
 import numpy as np
 import xlsxwriter
 from sqlalchemy import create_engine, inspect
+from alignHelpers import *
 
 # Optional date filters; if both are None, the entire dataset will be analyzed
 START_DATE = None
@@ -57,10 +58,9 @@ def calculate_synthetic_price(opportunity_engine, liquid_engine, base_asset, quo
         print(f"Error: Could not fetch synthetic price data for {base_asset}/{quote_asset}. Missing base or quote table.")
         return None
 
-    synthetic_df = pd.merge(base_df[['timestamp', 'close']],
-                            quote_df[['timestamp', 'close']],
-                            on='timestamp',
-                            suffixes=('_base', '_quote')).copy()
+    synthetic_df = asof_merge(base_df[['timestamp', 'close']],
+                              quote_df[['timestamp', 'close']],
+                              suffixes=('_base', '_quote'))
     synthetic_df['synthetic_price'] = synthetic_df['close_base'] / synthetic_df['close_quote']
     synthetic_df['low_liquid'] = synthetic_df['synthetic_price']
     synthetic_df['high_liquid'] = synthetic_df['synthetic_price']
@@ -68,12 +68,12 @@ def calculate_synthetic_price(opportunity_engine, liquid_engine, base_asset, quo
     return synthetic_df[['timestamp', 'low_liquid', 'high_liquid']].copy()
 
 # Calculate price differences between opportunity and liquid markets
-def calculate_differences(opportunity_df, liquid_df):
+def calculate_differences(opportunity_df, liquid_df, tolerance_ms=ALIGN_TOLERANCE_MS):
     print(f"Calculating price differences...")
-    merged_df = opportunity_df.merge(liquid_df, on='timestamp', suffixes=('_opportunity', '_liquid')).copy()
+    merged_df = asof_merge(opportunity_df, liquid_df, suffixes=('_opportunity', '_liquid'), tolerance_ms=tolerance_ms)
     merged_df['Low Difference (%)'] = ((merged_df['low_opportunity'] - merged_df['low_liquid']) / merged_df['low_liquid']) * 100
     merged_df['High Difference (%)'] = ((merged_df['high_opportunity'] - merged_df['high_liquid']) / merged_df['high_liquid']) * 100
-    return merged_df.copy()
+    return merged_df
 
 # Fetch and rename market data with .loc to avoid SettingWithCopyWarning
 def fetch_and_rename_market_data(engine, table_name, rename_columns):
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+# Default as-of tolerance in milliseconds; 0 keeps the old exact-timestamp join
+ALIGN_TOLERANCE_MS = 0
+
+# Convert a timestamp column (BIGINT ms or datetime64) to an int64 ms array without pd.to_datetime
+def to_ms_array(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ms]').view('int64')
+    return values.astype('int64', copy=False)
+
+# Sorted as-of join of two timestamp arrays, returns the matching row positions on both sides
+# direction is 'nearest', 'backward' (last right <= left) or 'forward' (first right >= left)
+def asof_join_indices(left_ts, right_ts, tolerance_ms=ALIGN_TOLERANCE_MS, direction='nearest'):
+    left_ts = to_ms_array(left_ts)
+    right_ts = to_ms_array(right_ts)
+
+    if len(left_ts) == 0 or len(right_ts) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+
+    # Only pay for a sort when the loader didn't already return rows in timestamp order
+    left_order = None if np.all(left_ts[1:] >= left_ts[:-1]) else np.argsort(left_ts, kind='stable')
+    right_order = None if np.all(right_ts[1:] >= right_ts[:-1]) else np.argsort(right_ts, kind='stable')
+    left_sorted = left_ts if left_order is None else left_ts[left_order]
+    right_sorted = right_ts if right_order is None else right_ts[right_order]
+
+    last = len(right_sorted) - 1
+    if direction == 'backward':
+        candidate = np.searchsorted(right_sorted, left_sorted, side='right') - 1
+        valid = candidate >= 0
+    elif direction == 'forward':
+        candidate = np.searchsorted(right_sorted, left_sorted, side='left')
+        valid = candidate <= last
+    elif direction == 'nearest':
+        after = np.searchsorted(right_sorted, left_sorted, side='left')
+        before = after - 1
+        dist_after = np.where(after <= last, right_sorted[np.minimum(after, last)] - left_sorted, np.iinfo(np.int64).max)
+        dist_before = np.where(before >= 0, left_sorted - right_sorted[np.maximum(before, 0)], np.iinfo(np.int64).max)
+        # Ties go to the earlier candle, same as a backward join
+        candidate = np.where(dist_before <= dist_after, before, after)
+        valid = (candidate >= 0) & (candidate <= last)
+    else:
+        raise ValueError(f"Unknown as-of direction '{direction}' - Expected 'nearest', 'backward' or 'forward'")
+
+    candidate = np.clip(candidate, 0, last)
+    valid &= np.abs(right_sorted[candidate] - left_sorted) <= tolerance_ms
+
+    left_idx = np.flatnonzero(valid)
+    right_idx = candidate[valid]
+    if left_order is not None:
+        left_idx = left_order[left_idx]
+    if right_order is not None:
+        right_idx = right_order[right_idx]
+    return left_idx, right_idx
+
+# Pick rows out of a column array; returns the array itself (a view) when every row is kept in order
+def take_rows(values, idx):
+    values = np.asarray(values)
+    if len(idx) == len(values) and (len(idx) == 0 or (idx[0] == 0 and idx[-1] == len(values) - 1 and np.all(np.diff(idx) == 1))):
+        return values
+    return values[idx]
+
+# As-of align two sets of column arrays on their ms timestamps
+# Returns a dict of aligned arrays keyed by column name plus the matched timestamp under 'timestamp'
+def align_columns(left_ts, left_columns, right_ts, right_columns, tolerance_ms=ALIGN_TOLERANCE_MS, direction='nearest'):
+    left_idx, right_idx = asof_join_indices(left_ts, right_ts, tolerance_ms, direction)
+    aligned = {'timestamp': take_rows(left_ts, left_idx)}
+    for name, values in left_columns.items():
+        aligned[name] = take_rows(values, left_idx)
+    for name, values in right_columns.items():
+        aligned[name] = take_rows(values, right_idx)
+    return aligned
+
+# Drop-in replacement for pd.merge(left_df, right_df, on='timestamp') using the as-of join
+# Overlapping column names get the same suffixes pd.merge would give them, and the result is
+# built once from the aligned arrays instead of merging and copying whole frames
+def asof_merge(left_df, right_df, on='timestamp', suffixes=('_x', '_y'), tolerance_ms=ALIGN_TOLERANCE_MS, direction='nearest'):
+    overlap = (set(left_df.columns) & set(right_df.columns)) - {on}
+    left_columns = {f"{col}{suffixes[0]}" if col in overlap else col: left_df[col].to_numpy()
+                    for col in left_df.columns if col != on}
+    right_columns = {f"{col}{suffixes[1]}" if col in overlap else col: right_df[col].to_numpy()
+                     for col in right_df.columns if col != on}
+
+    # Keep the left side's original timestamp dtype so downstream .days arithmetic still works
+    data = align_columns(left_df[on].to_numpy(), left_columns, right_df[on].to_numpy(), right_columns, tolerance_ms, direction)
+    if on != 'timestamp':
+        data[on] = data.pop('timestamp')
+    return pd.DataFrame(data, copy=False)
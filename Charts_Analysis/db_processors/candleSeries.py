@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import inspect, text
+
+CANDLE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+# Convert a date filter (None, pd.Timestamp, datetime or string) to epoch ms
+def to_epoch_ms(value):
+    if value is None:
+        return None
+    return int(pd.Timestamp(value).value // 1_000_000)
+
+# Candle series held as contiguous NumPy arrays: int64 ms timestamps and float32 OHLCV
+# Rows are always sorted by timestamp so time-range slices are plain views
+class CandleSeries:
+    def __init__(self, timestamp, open, high, low, close, volume, name=''):
+        self.name = name
+        self.timestamp = np.ascontiguousarray(timestamp, dtype=np.int64)
+        self.open = np.ascontiguousarray(open, dtype=np.float32)
+        self.high = np.ascontiguousarray(high, dtype=np.float32)
+        self.low = np.ascontiguousarray(low, dtype=np.float32)
+        self.close = np.ascontiguousarray(close, dtype=np.float32)
+        self.volume = np.ascontiguousarray(volume, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    @property
+    def empty(self):
+        return len(self.timestamp) == 0
+
+    @property
+    def nbytes(self):
+        return self.timestamp.nbytes + sum(getattr(self, col).nbytes for col in CANDLE_COLUMNS)
+
+    # Build from a raw candle DataFrame (timestamp in ms or datetime64)
+    @classmethod
+    def from_frame(cls, df, name=''):
+        if df.empty:
+            return cls.empty_series(name)
+        ts = df['timestamp'].to_numpy()
+        if np.issubdtype(ts.dtype, np.datetime64):
+            ts = ts.astype('datetime64[ms]').view('int64')
+        order = None if np.all(ts[1:] >= ts[:-1]) else np.argsort(ts, kind='stable')
+        columns = [df[col].to_numpy() for col in CANDLE_COLUMNS]
+        if order is not None:
+            ts = ts[order]
+            columns = [values[order] for values in columns]
+        return cls(ts, *columns, name=name)
+
+    @classmethod
+    def empty_series(cls, name=''):
+        return cls(*([np.empty(0)] * 6), name=name)
+
+    # Load a {exchange}_{base}_{quote}_{tf} table, filtering dates and zero volume in SQL
+    @classmethod
+    def load(cls, engine, table_name, start=None, end=None, min_volume=None):
+        conditions = []
+        params = {}
+        if start is not None:
+            conditions.append('timestamp >= :start_ms')
+            params['start_ms'] = to_epoch_ms(start)
+        if end is not None:
+            conditions.append('timestamp <= :end_ms')
+            params['end_ms'] = to_epoch_ms(end)
+        if min_volume is not None:
+            conditions.append('volume > :min_volume')
+            params['min_volume'] = min_volume
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        quoted = engine.dialect.identifier_preparer.quote(table_name)
+        query = text(f"SELECT timestamp, open, high, low, close, volume FROM {quoted}{where} ORDER BY timestamp")
+
+        with engine.connect() as connection:
+            # Same ValueError read_sql_table raised, so callers can tell a missing table from a DB failure
+            if not inspect(connection).has_table(table_name):
+                raise ValueError(f"Table {table_name} not found")
+            df = pd.read_sql_query(query, con=connection, params=params)
+        return cls.from_frame(df, name=table_name)
+
+    # Zero-copy slice by [start, end] (inclusive), same semantics as the START_DATE/END_DATE filters
+    def between(self, start=None, end=None):
+        lo = 0 if start is None else np.searchsorted(self.timestamp, to_epoch_ms(start), side='left')
+        hi = len(self) if end is None else np.searchsorted(self.timestamp, to_epoch_ms(end), side='right')
+        return self[lo:hi]
+
+    # Positional slices return views; index arrays and masks return compact copies
+    def __getitem__(self, key):
+        return CandleSeries(self.timestamp[key], *(getattr(self, col)[key] for col in CANDLE_COLUMNS), name=self.name)
+
+    def datetimes(self):
+        return self.timestamp.view('datetime64[ms]')
+
+    # Materialize as a DataFrame for code that still works on frames, e.g. ({'low': 'low_liquid'})
+    def to_frame(self, rename_columns=None):
+        rename_columns = rename_columns or {}
+        data = {'timestamp': self.datetimes()}
+        for col in CANDLE_COLUMNS:
+            data[rename_columns.get(col, col)] = getattr(self, col)
+        return pd.DataFrame(data, copy=False)
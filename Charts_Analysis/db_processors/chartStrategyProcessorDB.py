@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
 from sqlalchemy import create_engine
+from alignHelpers import *
 
 def parse_table_name(table_name):
     parts = table_name.split('_')
@@ -91,7 +92,7 @@ def analyze_opportunities_fixed_bins(opportunity_database_uri, liquid_database_u
     liquid_df[f'{quote_asset} Volume'] = liquid_df['volume'] * liquid_df['low']
 
     # Merge data on timestamp
-    merged_df = pd.merge(opportunity_df, liquid_df, on='timestamp', suffixes=('_opportunity', '_liquid'))
+    merged_df = asof_merge(opportunity_df, liquid_df, suffixes=('_opportunity', '_liquid'))
 
     # Calculate differences
     merged_df['Low Difference (%)'] = ((merged_df['low_opportunity'] - merged_df['low_liquid']) / merged_df['low_liquid']) * 100
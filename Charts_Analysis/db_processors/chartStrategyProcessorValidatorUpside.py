@@ -1,6 +1,6 @@
 import pandas as pd
 import numpy as np
-from sqlalchemy import create_engine
+from validatorService import *
 
 # Configuration Section
 opportunity_exchange_string = 'Kraken'
@@ -18,36 +18,17 @@ start_datetime = pd.to_datetime('2025-05-01 00:00:00')
 end_datetime = pd.to_datetime('2025-08-30 23:10:00')
 bin_threshold_upside = 4 # e.g. 0.8% upside threshold
 
-# Fetch function
-def fetch_table_data(uri, table_name, start_datetime, end_datetime):
-    engine = create_engine(uri)
-    with engine.connect() as conn:
-        df = pd.read_sql_table(table_name, conn)
-    df = df[df['volume'] > 0]
-    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-    df = df[(df['timestamp'] >= start_datetime) & (df['timestamp'] <= end_datetime)]
-    df.sort_values(by='timestamp', inplace=True)
-    return df
-
-# Load Data
-opportunity_df = fetch_table_data(opportunity_database_uri, opportunity_table_name, start_datetime, end_datetime)
-liquid_df = fetch_table_data(liquid_database_uri, liquid_table_name, start_datetime, end_datetime)
-
-# Merge on timestamp
-merged_df = pd.merge(opportunity_df, liquid_df, on='timestamp', suffixes=('_opportunity', '_liquid'))
-
-# Calculate arbitrage % using high prices
-merged_df['high_diff_pct'] = ((merged_df['high_opportunity'] - merged_df['high_liquid']) / merged_df['high_liquid']) * 100
+# Aligned pair is served from the validator cache (memory-mapped after the first run), so
+# re-auditing the same pair skips the full table load; use validatorService.py for interactive queries
+service = ValidatorService()
+pair = service.pair(opportunity_table_name, liquid_table_name, start_datetime, end_datetime,
+                    opportunity_database_uri, liquid_database_uri)
 
 # Print max value for debugging
-print("Max high_diff_pct:", merged_df['high_diff_pct'].max())
-
-# Filter upside arbitrage opportunities
-filtered_df = merged_df[merged_df['high_diff_pct'] >= bin_threshold_upside]
+print("Max high_diff_pct:", np.nanmax(pair.columns['high_diff_pct']) if len(pair) else np.nan)
 
-# Select relevant columns
-result = filtered_df[['timestamp', 'high_opportunity', 'high_liquid', 'volume_opportunity', 'high_diff_pct']]
-result.sort_values(by='timestamp', inplace=True)
+# Upside arbitrage opportunities, already in time order
+result = pair.query('high_diff_pct', '>=', bin_threshold_upside)
 
 # Print result
 print("Matching upside arbitrage records (high_opportunity > high_liquid):")
@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
 from sqlalchemy import create_engine
+from alignHelpers import *
 
 
 def parse_table_name(table_name):
@@ -55,8 +56,8 @@ def analyze_opportunities_fixed_bins(opportunity_database_uri, liquid_database_u
     conversion_df = fetch_fiat_conversion_df(kraken_engine)
 
     # Merge all
-    merged_df = pd.merge(opportunity_df, base_usdt_df, on='timestamp', suffixes=('_opportunity', '_usdt'))
-    merged_df = pd.merge(merged_df, conversion_df, on='timestamp', how='inner')
+    merged_df = asof_merge(opportunity_df, base_usdt_df, suffixes=('_opportunity', '_usdt'))
+    merged_df = asof_merge(merged_df, conversion_df)
 
     # Convert USDT prices to EUR using EUR/USD rate
     merged_df['low_liquid'] = merged_df['low_usdt'] / merged_df['conversion_rate']
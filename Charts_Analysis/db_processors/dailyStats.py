@@ -0,0 +1,291 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+from alignHelpers import *
+from candleSeries import *
+
+DAY_MS = 86_400_000
+
+# Difference % histogram: bin k holds rows whose |diff| falls in [k * width, (k + 1) * width)
+# The width must divide the analyzer's threshold/step (0.5 / 0.1) for reports to match the sweep
+STATS_BIN_WIDTH = 0.1
+STATS_MAX_BIN = 1000          # everything beyond 100% lands in the last bin
+BIN_EPSILON = 1e-6            # keeps float32 diffs sitting exactly on a bin edge in the upper bin
+
+# Log-bucketed volume sketch (relative error ~1%), mergeable by summing bucket counts
+SKETCH_GAMMA = 1.02
+SKETCH_MIN_VALUE = 1e-8
+
+def sketch_bucket(values):
+    values = np.nan_to_num(np.asarray(values, dtype=np.float64), nan=0.0)
+    clipped = np.maximum(values, SKETCH_MIN_VALUE)
+    return np.floor(np.log(clipped / SKETCH_MIN_VALUE) / np.log(SKETCH_GAMMA)).astype(np.int32)
+
+def sketch_value(bucket):
+    return SKETCH_MIN_VALUE * SKETCH_GAMMA ** (np.asarray(bucket, dtype=np.float64) + 0.5)
+
+# Median from a (buckets, counts) sketch, averaging the two middle ranks like pandas does
+def sketch_median(buckets, counts):
+    total = counts.sum()
+    if total == 0:
+        return np.nan
+    cumulative = np.cumsum(counts)
+    lower = np.searchsorted(cumulative, (total - 1) // 2, side='right')
+    upper = np.searchsorted(cumulative, total // 2, side='right')
+    return float((sketch_value(buckets[lower]) + sketch_value(buckets[upper])) / 2)
+
+# Per-day, per-bin aggregates of one aligned (opportunity, liquid) pair
+# side 'buy' bins -Low Difference (%), side 'sell' bins High Difference (%); rows on the wrong side of 0 are dropped
+def daily_aggregates(timestamp_ms, low_diff, high_diff, volume_base, volume_quote):
+    timestamp_ms = np.asarray(timestamp_ms, dtype=np.int64)
+    bin_frames, sketch_frames = [], []
+
+    for side, magnitude in (('buy', -np.asarray(low_diff, dtype=np.float64)), ('sell', np.asarray(high_diff, dtype=np.float64))):
+        keep = np.isfinite(magnitude) & (magnitude >= 0)
+        frame = pd.DataFrame({
+            'day': timestamp_ms[keep] // DAY_MS,
+            'bin': np.minimum(np.floor(magnitude[keep] / STATS_BIN_WIDTH + BIN_EPSILON), STATS_MAX_BIN).astype(np.int32),
+            'ts': timestamp_ms[keep],
+            'volume_quote': np.asarray(volume_quote)[keep],
+            'volume_base': np.asarray(volume_base)[keep],
+        })
+        if frame.empty:
+            continue
+
+        bins = frame.groupby(['day', 'bin']).agg(
+            count=('ts', 'size'),
+            volume_quote_sum=('volume_quote', 'sum'),
+            volume_base_sum=('volume_base', 'sum'),
+            first_ts=('ts', 'min'),
+            last_ts=('ts', 'max')
+        ).reset_index()
+        bins['side'] = side
+        bin_frames.append(bins)
+
+        for metric in ('quote', 'base'):
+            frame['bucket'] = sketch_bucket(frame[f'volume_{metric}'].to_numpy())
+            sketch = frame.groupby(['day', 'bin', 'bucket']).size().rename('count').reset_index()
+            sketch['side'] = side
+            sketch['metric'] = metric
+            sketch_frames.append(sketch)
+
+    bins = pd.concat(bin_frames, ignore_index=True) if bin_frames else pd.DataFrame()
+    sketches = pd.concat(sketch_frames, ignore_index=True) if sketch_frames else pd.DataFrame()
+    return bins, sketches
+
+# Incremental store of daily aggregates; reports for any day range are assembled from it without touching candles
+class DailyStatsStore:
+    def __init__(self, uri="sqlite:///analyzer_daily_stats.sqlite"):
+        self.engine = create_engine(uri)
+        with self.engine.begin() as connection:
+            connection.execute(text("""
+                CREATE TABLE IF NOT EXISTS stats_bins (
+                    pair_key TEXT, day BIGINT, side TEXT, bin INTEGER, count BIGINT,
+                    volume_quote_sum DOUBLE PRECISION, volume_base_sum DOUBLE PRECISION,
+                    first_ts BIGINT, last_ts BIGINT
+                )"""))
+            connection.execute(text("""
+                CREATE TABLE IF NOT EXISTS stats_sketch (
+                    pair_key TEXT, day BIGINT, side TEXT, metric TEXT, bin INTEGER, bucket INTEGER, count BIGINT
+                )"""))
+            connection.execute(text("CREATE TABLE IF NOT EXISTS stats_days (pair_key TEXT, day BIGINT, last_ts BIGINT)"))
+            connection.execute(text("CREATE INDEX IF NOT EXISTS stats_bins_pair_day ON stats_bins (pair_key, day)"))
+            connection.execute(text("CREATE INDEX IF NOT EXISTS stats_sketch_pair_day ON stats_sketch (pair_key, day)"))
+
+    @staticmethod
+    def pair_key(opportunity_table, liquid_table):
+        return f"{opportunity_table}|{liquid_table}"
+
+    def last_day(self, pair_key):
+        with self.engine.connect() as connection:
+            return connection.execute(text("SELECT MAX(day) FROM stats_days WHERE pair_key = :pair_key"),
+                                      {'pair_key': pair_key}).scalar()
+
+    # Fold new candles into the store; the last stored day is rebuilt since it was probably partial
+    # Returns the number of days written
+    def update_pair(self, opportunity_engine, opportunity_table, liquid_engine, liquid_table, tolerance_ms=ALIGN_TOLERANCE_MS):
+        pair_key = self.pair_key(opportunity_table, liquid_table)
+        last_day = self.last_day(pair_key)
+        start = None if last_day is None else pd.Timestamp(int(last_day) * DAY_MS, unit='ms')
+
+        opportunity = CandleSeries.load(opportunity_engine, opportunity_table, start=start, min_volume=0)
+        liquid = CandleSeries.load(liquid_engine, liquid_table, start=start, min_volume=0)
+        if opportunity.empty or liquid.empty:
+            print(f"No new candles for {pair_key}")
+            return 0
+
+        aligned = align_columns(opportunity.timestamp,
+                                {'low_opportunity': opportunity.low, 'high_opportunity': opportunity.high,
+                                 'close_opportunity': opportunity.close, 'volume_opportunity': opportunity.volume},
+                                liquid.timestamp,
+                                {'low_liquid': liquid.low, 'high_liquid': liquid.high},
+                                tolerance_ms)
+        if len(aligned['timestamp']) == 0:
+            print(f"No overlapping candles for {pair_key}")
+            return 0
+
+        low_diff = (aligned['low_opportunity'] - aligned['low_liquid']) / aligned['low_liquid'] * 100
+        high_diff = (aligned['high_opportunity'] - aligned['high_liquid']) / aligned['high_liquid'] * 100
+        volume_quote = aligned['volume_opportunity'].astype(np.float64) * aligned['close_opportunity']
+        bins, sketches = daily_aggregates(aligned['timestamp'], low_diff, high_diff, aligned['volume_opportunity'], volume_quote)
+
+        days = aligned['timestamp'] // DAY_MS
+        day_marks = pd.DataFrame({'day': days, 'last_ts': aligned['timestamp']}).groupby('day', as_index=False)['last_ts'].max()
+        first_day = int(days.min())
+
+        with self.engine.begin() as connection:
+            for table in ('stats_bins', 'stats_sketch', 'stats_days'):
+                connection.execute(text(f"DELETE FROM {table} WHERE pair_key = :pair_key AND day >= :day"),
+                                   {'pair_key': pair_key, 'day': first_day})
+            for table, frame in (('stats_bins', bins), ('stats_sketch', sketches), ('stats_days', day_marks)):
+                if not frame.empty:
+                    frame.insert(0, 'pair_key', pair_key)
+                    frame.to_sql(table, connection, if_exists='append', index=False, method='multi', chunksize=5000)
+
+        print(f"Stored {len(day_marks)} day(s) of aggregates for {pair_key}")
+        return len(day_marks)
+
+    def _load(self, table, pair_key, start, end, group_columns, aggregates):
+        conditions = ['pair_key = :pair_key']
+        params = {'pair_key': pair_key}
+        if start is not None:
+            conditions.append('day >= :start_day')
+            params['start_day'] = to_epoch_ms(start) // DAY_MS
+        if end is not None:
+            conditions.append('day <= :end_day')
+            params['end_day'] = to_epoch_ms(end) // DAY_MS
+        query = text(f"SELECT {', '.join(group_columns)}, {aggregates} FROM {table} "
+                     f"WHERE {' AND '.join(conditions)} GROUP BY {', '.join(group_columns)}")
+        with self.engine.connect() as connection:
+            return pd.read_sql_query(query, con=connection, params=params)
+
+    # analyze_opportunities_fixed_bins-equivalent result for [start, end] (whole UTC days)
+    # Counts, sums and monthly returns are exact at bin resolution; medians come from the volume sketch
+    def report(self, opportunity_table, liquid_table, base_asset, quote_asset,
+               opportunity_exchange_name, liquid_exchange_name,
+               start=None, end=None, threshold=0.5, step=0.1):
+        pair_key = self.pair_key(opportunity_table, liquid_table)
+        bins = self._load('stats_bins', pair_key, start, end, ['side', 'bin'],
+                          'SUM(count) AS count, SUM(volume_quote_sum) AS volume_quote_sum, '
+                          'SUM(volume_base_sum) AS volume_base_sum, MIN(first_ts) AS first_ts, MAX(last_ts) AS last_ts')
+        if bins.empty:
+            print(f"No stored aggregates for {pair_key}")
+            return None
+
+        threshold_bin = int(round(threshold / STATS_BIN_WIDTH))
+        step_bins = max(int(round(step / STATS_BIN_WIDTH)), 1)
+
+        # Same day count as calculate_days_in_dataset over rows past the threshold on either side
+        valid = bins[bins['bin'] >= threshold_bin]
+        if valid.empty:
+            print(f"No valid rows found for {opportunity_table}")
+            return None
+        days_in_dataset = max(int((valid['last_ts'].max() - valid['first_ts'].min()) // DAY_MS), 1)
+
+        sketches = self._load('stats_sketch', pair_key, start, end, ['side', 'metric', 'bin', 'bucket'], 'SUM(count) AS count')
+
+        buy = self._side_occurrences(bins, sketches, 'buy', threshold_bin, step_bins, days_in_dataset, with_base=False)
+        sell = self._side_occurrences(bins, sketches, 'sell', threshold_bin, step_bins, days_in_dataset, with_base=True)
+        best_buy_opportunity = max(buy.items(), key=lambda x: x[1][2], default=None)
+        best_sell_opportunity = max(sell.items(), key=lambda x: x[1][2], default=None)
+
+        if best_buy_opportunity is None and best_sell_opportunity is None:
+            print("No valid buy or sell opportunities found.")
+            return None
+
+        return {
+            'opportunity_exchange': opportunity_exchange_name,
+            'liquid_exchange': liquid_exchange_name,
+            'market_pair': f"{base_asset}/{quote_asset}",
+            'avg_buy_volume': best_buy_opportunity[1][3] if best_buy_opportunity else None,
+            'median_buy_volume': best_buy_opportunity[1][4] if best_buy_opportunity else None,
+            'avg_sell_volume': best_sell_opportunity[1][3] if best_sell_opportunity else None,
+            'median_sell_volume': best_sell_opportunity[1][4] if best_sell_opportunity else None,
+            'avg_sell_volume_usd': best_sell_opportunity[1][5] if best_sell_opportunity else None,
+            'median_sell_volume_usd': best_sell_opportunity[1][6] if best_sell_opportunity else None,
+            'monthly_buy_profit_percentage': best_buy_opportunity[1][2] if best_buy_opportunity else None,
+            'monthly_sell_profit_percentage': best_sell_opportunity[1][2] if best_sell_opportunity else None,
+            'exchange_quote_asset': quote_asset
+        }
+
+    # Cumulative "≥ t%" occurrences for one side, the same tuples the analyzer's bin loops build
+    @staticmethod
+    def _side_occurrences(bins, sketches, side, threshold_bin, step_bins, days_in_dataset, with_base):
+        side_bins = bins[bins['side'] == side]
+        if side_bins.empty:
+            return {}
+
+        top = int(side_bins['bin'].max())
+        counts = np.zeros(top + 1, dtype=np.int64)
+        quote_sums = np.zeros(top + 1)
+        base_sums = np.zeros(top + 1)
+        idx = side_bins['bin'].to_numpy()
+        counts[idx] = side_bins['count'].to_numpy()
+        quote_sums[idx] = side_bins['volume_quote_sum'].to_numpy()
+        base_sums[idx] = side_bins['volume_base_sum'].to_numpy()
+
+        # Reverse cumulative sums give "rows with |diff| >= bin k" for every k at once
+        counts_ge = np.cumsum(counts[::-1])[::-1]
+        quote_ge = np.cumsum(quote_sums[::-1])[::-1]
+        base_ge = np.cumsum(base_sums[::-1])[::-1]
+
+        def cumulative_sketch(metric):
+            rows = sketches[(sketches['side'] == side) & (sketches['metric'] == metric)]
+            buckets = np.unique(rows['bucket'].to_numpy())
+            grid = np.zeros((top + 1, len(buckets)), dtype=np.int64)
+            grid[rows['bin'].to_numpy(), np.searchsorted(buckets, rows['bucket'].to_numpy())] = rows['count'].to_numpy()
+            return buckets, np.cumsum(grid[::-1], axis=0)[::-1]
+
+        quote_buckets, quote_sketch = cumulative_sketch('quote')
+        if with_base:
+            base_buckets, base_sketch = cumulative_sketch('base')
+
+        occurrences = {}
+        for k in range(threshold_bin, top + 1, step_bins):
+            count = int(counts_ge[k])
+            if count == 0:
+                continue
+            t = k * STATS_BIN_WIDTH
+            avg_volume_usd = quote_ge[k] / count
+            median_volume_usd = sketch_median(quote_buckets, quote_sketch[k])
+            if avg_volume_usd == 0 or days_in_dataset <= 0:
+                continue
+
+            total_return = abs(t / 100 * count * avg_volume_usd)
+            monthly_return_percentage = (total_return / avg_volume_usd) * (30 / days_in_dataset) * 100
+            if with_base:
+                occurrences[f"≥ {t:.1f}%"] = (count, total_return, monthly_return_percentage,
+                                             base_ge[k] / count, sketch_median(base_buckets, base_sketch[k]),
+                                             avg_volume_usd, median_volume_usd)
+            else:
+                occurrences[f"≥ {t:.1f}%"] = (count, total_return, monthly_return_percentage, avg_volume_usd, median_volume_usd)
+        return occurrences
+
+
+# ------------------------------------------------------------------------------
+#  Daily mode: fold yesterday's (and today's partial) candles into the store, then report any window
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    opportunity_db_uri = "postgresql+psycopg2://postgres:@localhost:5432/Testing_Data_Collection_Kraken"
+    liquid_db_uri = "postgresql+psycopg2://postgres:@localhost:5432/Testing_Data_Collection_Binance"
+
+    # (opportunity table, liquid table, base, quote)
+    pairs = [
+        ("kraken_ada_usd_1m", "binance_ada_usdt_1m", "ADA", "USD"),
+    ]
+
+    REPORT_START = pd.to_datetime("2025-07-01")
+    REPORT_END = pd.to_datetime("2025-09-30")
+
+    store = DailyStatsStore()
+    opportunity_engine = create_engine(opportunity_db_uri)
+    liquid_engine = create_engine(liquid_db_uri)
+    opportunity_exchange_name = opportunity_db_uri.split("_")[-1]
+    liquid_exchange_name = liquid_db_uri.split("_")[-1]
+
+    for opportunity_table, liquid_table, base_asset, quote_asset in pairs:
+        store.update_pair(opportunity_engine, opportunity_table, liquid_engine, liquid_table)
+        result = store.report(opportunity_table, liquid_table, base_asset, quote_asset,
+                              opportunity_exchange_name, liquid_exchange_name,
+                              start=REPORT_START, end=REPORT_END)
+        print(f"Result for {opportunity_table} - {result}")
@@ -0,0 +1,125 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, inspect
+from alignHelpers import *
+from candleSeries import *
+from resultSink import *
+
+# Drop/pump sizes (%) reported as columns of the summary table
+SUMMARY_THRESHOLDS = (0.5, 1, 2, 3, 5, 10)
+# Drop/pump size (%) whose events per day rank the summary; must be one of SUMMARY_THRESHOLDS
+RANK_THRESHOLD = 1
+
+# Every (primary table, reference table) pair with the same base asset, e.g. bitget_x_usdt_1m vs kraken_x_usd_1m
+def catalogue_pairs(database_uri, reference_database_uri, quote_asset, reference_quote_asset, timeframe='1m'):
+    reference_exchange = reference_database_uri.split("_")[-1].lower()
+    tables = inspect(create_engine(database_uri)).get_table_names()
+    reference_tables = set(inspect(create_engine(reference_database_uri)).get_table_names())
+
+    pairs = []
+    for table_name in tables:
+        parts = table_name.split('_')
+        if len(parts) != 4 or parts[2] != quote_asset.lower() or parts[3] != timeframe:
+            continue
+        reference_table_name = f"{reference_exchange}_{parts[1]}_{reference_quote_asset.lower()}_{timeframe}"
+        if reference_table_name in reference_tables:
+            pairs.append((table_name, reference_table_name))
+    return pairs
+
+# Counts of values >= each edge from a single histogram pass (reverse cumulative sum)
+# NaN/inf sizes (zero or missing open_ref) are dropped first; the open top bin would otherwise count them
+def cumulative_counts(values, edges):
+    values = values[np.isfinite(values)]
+    hist, _ = np.histogram(values, bins=np.append(edges, np.inf))
+    return np.cumsum(hist[::-1])[::-1]
+
+# Drop and pump distribution of one pair, the same measures as dropCalculatorDB/pumpCalculatorDB
+# Runs in a worker process, so engines are created here from the URIs
+def pair_distribution(database_uri, table_name, reference_database_uri, reference_table_name,
+                      start_datetime, end_datetime, max_diff_pct, thresholds=SUMMARY_THRESHOLDS):
+    primary = CandleSeries.load(create_engine(database_uri), table_name, start_datetime, end_datetime, min_volume=0)
+    reference = CandleSeries.load(create_engine(reference_database_uri), reference_table_name, start_datetime, end_datetime, min_volume=0)
+    aligned = align_columns(primary.timestamp, {'low': primary.low, 'high': primary.high},
+                            reference.timestamp, {'open_ref': reference.open, 'low_ref': reference.low, 'high_ref': reference.high})
+    if len(aligned['timestamp']) == 0:
+        return None
+
+    low_diff = (aligned['low'] - aligned['open_ref']) / aligned['open_ref'] * 100
+    high_diff = (aligned['high'] - aligned['open_ref']) / aligned['open_ref'] * 100
+    # Same bad-candle filters as the single-pair calculators, applied per side
+    drop_sizes = -low_diff[aligned['low'] >= aligned['low_ref'] * (1 - max_diff_pct / 100)]
+    pump_sizes = high_diff[aligned['high'] <= aligned['high_ref'] * (1 + max_diff_pct / 100)]
+
+    days = int((aligned['timestamp'].max() - aligned['timestamp'].min()) // 86_400_000) + 1
+    edges = np.asarray(thresholds, dtype=np.float64)
+    drop_counts = cumulative_counts(drop_sizes, edges)
+    pump_counts = cumulative_counts(pump_sizes, edges)
+
+    summary = {
+        'primary_table': table_name,
+        'reference_table': reference_table_name,
+        'rows': len(aligned['timestamp']),
+        'days': days,
+        'max_drop_pct': float(drop_sizes.max()) if len(drop_sizes) else np.nan,
+        'max_pump_pct': float(pump_sizes.max()) if len(pump_sizes) else np.nan,
+    }
+    for t, count in zip(thresholds, drop_counts):
+        summary[f"drops ≤ -{t}%"] = int(count)
+    for t, count in zip(thresholds, pump_counts):
+        summary[f"pumps ≥ {t}%"] = int(count)
+    rank_idx = list(thresholds).index(RANK_THRESHOLD)
+    summary[f"drops/day ≤ -{RANK_THRESHOLD}%"] = drop_counts[rank_idx] / days
+    summary[f"pumps/day ≥ {RANK_THRESHOLD}%"] = pump_counts[rank_idx] / days
+    return summary
+
+# Distribution of every catalogued pair, computed in parallel and logged as each pair finishes
+def run_batch(database_uri, reference_database_uri, quote_asset, reference_quote_asset,
+              start_datetime, end_datetime, max_diff_pct, timeframe='1m',
+              results_log="drop_pump_results.csv", summary_file="drop_pump_summary.csv", max_workers=None):
+    pairs = catalogue_pairs(database_uri, reference_database_uri, quote_asset, reference_quote_asset, timeframe)
+    print(f"Found {len(pairs)} pairs to analyze")
+
+    with ResultSink(results_log) as sink, ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        futures = {
+            executor.submit(pair_distribution, database_uri, table_name, reference_database_uri, reference_table_name,
+                            start_datetime, end_datetime, max_diff_pct): table_name
+            for table_name, reference_table_name in pairs
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            table_name = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                print(f"Error analyzing {table_name}: {e}")
+                continue
+            if summary:
+                sink.append(summary)
+            print(f"Processed {done}/{len(pairs)} pairs ({table_name})")
+
+        summary_df = sink.read()
+
+    if summary_df.empty:
+        print("No pairs produced a distribution.")
+        return summary_df
+    summary_df = summary_df.sort_values(by=f"drops/day ≤ -{RANK_THRESHOLD}%", ascending=False)
+    summary_df.to_csv(summary_file, index=False)
+    print(f"Summary of {len(summary_df)} pairs saved to {summary_file}")
+    return summary_df
+
+
+if __name__ == "__main__":
+    opportunity_exchange_string = 'Kraken'
+    liquid_exchange_string = 'Bitget'
+    opportunity_quote_asset = 'usd'
+    liquid_quote_asset = 'usdt'
+
+    database_uri = f"postgresql+psycopg2://postgres:@localhost:5432/Testing_Data_Collection_{liquid_exchange_string}"
+    reference_database_uri = f"postgresql+psycopg2://postgres:@localhost:5432/Testing_Data_Collection_{opportunity_exchange_string}"
+    start_datetime = pd.to_datetime("2025-01-01 00:00:00")
+    end_datetime = pd.to_datetime("2026-12-30 23:59:59")
+    max_diff_pct = 2  # Maximum allowable low/high difference percentage
+
+    run_batch(database_uri, reference_database_uri, liquid_quote_asset, opportunity_quote_asset,
+              start_datetime, end_datetime, max_diff_pct)
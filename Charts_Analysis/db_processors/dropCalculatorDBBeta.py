@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
 from sqlalchemy import create_engine
+from alignHelpers import *
 
 def parse_table_name_v2(table_name):
     parts = table_name.split('_')
@@ -14,7 +15,7 @@ def parse_table_name_v2(table_name):
 
 def calculate_percentage_changes_v2(df, ref_df):
     # Merge primary and reference market data on timestamp
-    merged_df = pd.merge(df, ref_df, on='timestamp', suffixes=('', '_ref'))
+    merged_df = asof_merge(df, ref_df, suffixes=('', '_ref'))
 
     # Calculate percentage differences relative to the reference market
     merged_df['Low Difference (%)'] = ((merged_df['low'] - merged_df['open_ref']) / merged_df['open_ref']) * 100
@@ -37,9 +38,11 @@ def bin_results_v2(occurrences, bin_width, threshold):
 
     binned_data = []
     total_occurrences = occurrences.shape[0]
+    sorted_diffs = np.sort(occurrences['Low Difference (%)'].to_numpy())
+    counts = np.searchsorted(sorted_diffs, bins, side='right')
 
-    for bin in bins:
-        count = occurrences[occurrences['Low Difference (%)'] <= bin].shape[0]
+    for bin, count in zip(bins, counts):
+        count = int(count)
         percentile = (count / total_occurrences) * 100 if total_occurrences > 0 else 0
         binned_data.append((f"≤ {bin:.2f}%", count, percentile))
 
@@ -0,0 +1,53 @@
+# Candle databases are Testing_Data_Collection_<name>, with tables <exchange>_<base>_<quote>_<tf> (exchange = ccxt id)
+DB_URI_TEMPLATE = "postgresql+psycopg2://postgres:@localhost:5432/Testing_Data_Collection_{exchange}"
+
+# Table prefix -> database name; listed explicitly since the names are not derivable (okx -> OKX)
+EXCHANGE_DB_NAMES = {
+    'binance': 'Binance',
+    'bitfinex': 'Bitfinex',
+    'bitget': 'Bitget',
+    'bitstamp': 'Bitstamp',
+    'bitvavo': 'Bitvavo',
+    'bybit': 'Bybit',
+    'coinbase': 'Coinbase',
+    'cryptocom': 'Cryptocom',
+    'gate': 'Gate',
+    'kraken': 'Kraken',
+    'kucoin': 'Kucoin',
+    'okx': 'OKX',
+    'probit': 'Probit',
+}
+
+# TradingView export prefix -> table prefix written by the scrapers (GATEIO_* exports belong in gate_* tables)
+TRADINGVIEW_EXCHANGES = {
+    'BINANCE': 'binance',
+    'BITFINEX': 'bitfinex',
+    'BITGET': 'bitget',
+    'BITSTAMP': 'bitstamp',
+    'BITVAVO': 'bitvavo',
+    'BYBIT': 'bybit',
+    'COINBASE': 'coinbase',
+    'CRYPTOCOM': 'cryptocom',
+    'GATEIO': 'gate',
+    'GATE': 'gate',
+    'KRAKEN': 'kraken',
+    'KUCOIN': 'kucoin',
+    'OKX': 'okx',
+    'PROBIT': 'probit',
+}
+
+def exchange_db_name(exchange):
+    try:
+        return EXCHANGE_DB_NAMES[exchange.lower()]
+    except KeyError:
+        raise ValueError(f"No candle database known for exchange '{exchange}' - add it to EXCHANGE_DB_NAMES") from None
+
+# Database URI of a candle table, from its exchange prefix
+def exchange_uri(table_name, uri_template=DB_URI_TEMPLATE):
+    return uri_template.format(exchange=exchange_db_name(table_name.split('_')[0]))
+
+def tradingview_exchange(prefix):
+    try:
+        return TRADINGVIEW_EXCHANGES[prefix.upper()]
+    except KeyError:
+        raise ValueError(f"Unknown TradingView exchange prefix '{prefix}' - add it to TRADINGVIEW_EXCHANGES") from None
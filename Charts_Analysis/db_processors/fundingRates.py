@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from alignHelpers import *
+from candleSeries import *
+
+# Hours a trade keeps its futures leg open; the funding settled in that window is credited/charged to the trade
+FUNDING_HOLD_HOURS = 8
+HOUR_MS = 3_600_000
+
+# Tables written by scraper_bots/funding_collector.py next to the futures candles:
+#   bitget_btc_usdt:usdt_1m -> bitget_btc_usdt:usdt_funding, bitget_btc_usdt:usdt_mark1m, bitget_btc_usdt:usdt_index1m
+# The last part is never a plain timeframe, so the analyzers' timeframe filters skip these tables
+def funding_table_name(futures_table):
+    return f"{futures_table.rsplit('_', 1)[0]}_funding"
+
+def price_table_name(futures_table, kind):
+    prefix, timeframe = futures_table.rsplit('_', 1)
+    return f"{prefix}_{kind}{timeframe}"
+
+# Funding settlements of one perpetual: int64 ms timestamps and float64 rates (fraction per interval), time-ordered
+# A long position pays rate * notional at each settlement, a short receives it
+class FundingSeries:
+    def __init__(self, timestamp, rate, name=''):
+        self.name = name
+        self.timestamp = np.ascontiguousarray(timestamp, dtype=np.int64)
+        self.rate = np.ascontiguousarray(rate, dtype=np.float64)
+        # cumulative[i] = sum of the first i rates, so any window sum is two lookups
+        self.cumulative = np.concatenate(([0.0], np.cumsum(self.rate)))
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    @property
+    def empty(self):
+        return len(self.timestamp) == 0
+
+    # Settlements of a futures table inside [start, end + hold], so trades near END_DATE still see their funding
+    @classmethod
+    def load(cls, engine, futures_table, start=None, end=None, hold_hours=FUNDING_HOLD_HOURS):
+        table_name = funding_table_name(futures_table)
+        conditions = []
+        params = {}
+        if start is not None:
+            conditions.append('timestamp >= :start_ms')
+            params['start_ms'] = to_epoch_ms(start)
+        if end is not None:
+            conditions.append('timestamp <= :end_ms')
+            params['end_ms'] = to_epoch_ms(end) + hold_hours * HOUR_MS
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        quoted = engine.dialect.identifier_preparer.quote(table_name)
+        query = text(f"SELECT timestamp, funding_rate FROM {quoted}{where} ORDER BY timestamp")
+        try:
+            with engine.connect() as connection:
+                df = pd.read_sql_query(query, con=connection, params=params)
+        except Exception as e:
+            print(f"No funding history for {futures_table}: {e}")
+            return cls(np.empty(0), np.empty(0), name=table_name)
+        df = df.dropna(subset=['funding_rate'])
+        return cls(df['timestamp'].to_numpy(), df['funding_rate'].to_numpy(), name=table_name)
+
+    # Funding (%) settled in (entry, entry + hold] for every entry timestamp, signed for a long position
+    def forward_carry_pct(self, entry_ts, hold_hours=FUNDING_HOLD_HOURS):
+        entry_ts = to_ms_array(entry_ts)
+        if self.empty:
+            return np.full(len(entry_ts), np.nan)
+        lo = np.searchsorted(self.timestamp, entry_ts, side='right')
+        hi = np.searchsorted(self.timestamp, entry_ts + hold_hours * HOUR_MS, side='right')
+        return -(self.cumulative[hi] - self.cumulative[lo]) * 100
+
+    # Funding (%) a short held over the whole [start, end] window would collect, normalized to 30 days
+    def monthly_short_pct(self, start_ms, end_ms):
+        if self.empty or end_ms <= start_ms:
+            return None
+        lo = np.searchsorted(self.timestamp, start_ms, side='left')
+        hi = np.searchsorted(self.timestamp, end_ms, side='right')
+        days = (end_ms - start_ms) / 86_400_000
+        return float(self.cumulative[hi] - self.cumulative[lo]) * 100 * 30 / days
+
+# Average mark-vs-index basis (%) of a perpetual over the window, or None when either series is missing
+def average_basis_pct(engine, futures_table, start=None, end=None):
+    try:
+        mark = CandleSeries.load(engine, price_table_name(futures_table, 'mark'), start, end)
+        index = CandleSeries.load(engine, price_table_name(futures_table, 'index'), start, end)
+    except Exception as e:
+        print(f"No mark/index prices for {futures_table}: {e}")
+        return None
+    aligned = align_columns(mark.timestamp, {'mark': mark.close}, index.timestamp, {'index': index.close})
+    if len(aligned['timestamp']) == 0:
+        return None
+    return float(np.nanmean((aligned['mark'].astype(np.float64) - aligned['index']) / aligned['index'] * 100))
+
+# Per-row funding carry (%) of both sides of a spread, for the analyzers' bin sweeps
+# long_leg/short_leg name which FundingSeries is held long/short on that side; None means a spot leg (no funding)
+def side_carry_pct(entry_ts, long_leg=None, short_leg=None, hold_hours=FUNDING_HOLD_HOURS):
+    carry = np.zeros(len(entry_ts))
+    if long_leg is not None:
+        carry += long_leg.forward_carry_pct(entry_ts, hold_hours)
+    if short_leg is not None:
+        carry -= short_leg.forward_carry_pct(entry_ts, hold_hours)
+    return carry
+
+# Funding-adjusted monthly return of a bin: every occurrence earns the threshold plus its own funding carry
+def funding_adjusted_bin(threshold_pct, carry_pct, days_in_dataset):
+    if len(carry_pct) == 0 or np.all(np.isnan(carry_pct)):
+        return None, None
+    avg_carry = float(np.nanmean(carry_pct))
+    return avg_carry, (threshold_pct + avg_carry) * len(carry_pct) * (30 / days_in_dataset)
+
+# Funding columns appended to every analyzer result (None when the collector has no data for the market)
+def funding_result_columns(buy_bin, sell_bin, monthly_short_funding, basis):
+    return {
+        'buy_funding_carry_percentage': buy_bin[5] if buy_bin else None,
+        'sell_funding_carry_percentage': sell_bin[5] if sell_bin else None,
+        'funding_adjusted_monthly_buy_profit_percentage': buy_bin[6] if buy_bin else None,
+        'funding_adjusted_monthly_sell_profit_percentage': sell_bin[6] if sell_bin else None,
+        'monthly_short_funding_percentage': monthly_short_funding,
+        'avg_basis_percentage': basis,
+    }
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import sqlite3
+import time
+from sqlalchemy import create_engine, text
+from candleSeries import to_epoch_ms
+
+# Latest candle timestamp (ms) in a table up to the END_DATE bound; None if the table is missing/empty
+# MAX on the primary key is an index lookup, so this is cheap enough to run for every unit
+def table_max_timestamp(engine, table_name, end=None, log_errors=True):
+    quoted = engine.dialect.identifier_preparer.quote(table_name)
+    if end is None:
+        query, params = text(f"SELECT MAX(timestamp) FROM {quoted}"), {}
+    else:
+        query, params = text(f"SELECT MAX(timestamp) FROM {quoted} WHERE timestamp <= :end_ms"), {'end_ms': to_epoch_ms(end)}
+    try:
+        with engine.connect() as connection:
+            value = connection.execute(query, params).scalar()
+        return int(value) if value is not None else None
+    except Exception as e:
+        if log_errors:
+            print(f"Error reading max timestamp of {table_name}: {e}")
+        return None
+
+# JSON encoder fallback for NumPy scalars in analyzer results
+def _json_default(value):
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+# Persistent record of sweep units (one opportunity table under one parameter set) and their results
+# Statuses: running (started, never finished - recomputed on rerun), done, no_result
+# A no_result unit also stores the max timestamp of every liquid table it tried (None if the table was missing),
+# so it is recomputed once any of them gains data
+class JobLedger:
+    def __init__(self, path, params, end=None):
+        self.path = path
+        self.end = end
+        self.params_json = json.dumps(params, sort_keys=True, default=str)
+        self.params_key = hashlib.sha1(self.params_json.encode()).hexdigest()[:16]
+        self._engines = {}
+        self.skipped = 0
+        self.computed = 0
+
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS units (
+                params_key TEXT,
+                opportunity_uri TEXT,
+                opportunity_table TEXT,
+                status TEXT,
+                opportunity_max_ts INTEGER,
+                liquid_uri TEXT,
+                liquid_table TEXT,
+                liquid_max_ts INTEGER,
+                result_json TEXT,
+                params_json TEXT,
+                updated_at REAL,
+                tried_liquid_json TEXT,
+                PRIMARY KEY (params_key, opportunity_uri, opportunity_table)
+            )
+        """)
+        self._conn.commit()
+
+    def _engine(self, uri):
+        if uri not in self._engines:
+            self._engines[uri] = create_engine(uri)
+        return self._engines[uri]
+
+    # Missing candidate tables are expected (usdc/usd fallbacks), so their errors are not logged
+    def max_timestamp(self, uri, table_name):
+        return table_max_timestamp(self._engine(uri), table_name, self.end, log_errors=False)
+
+    # Returns (True, result_or_None) when a finished unit can be reused as-is, (False, None) when it must be recomputed
+    def reusable_result(self, opportunity_uri, opportunity_table, opportunity_max_ts):
+        row = self._conn.execute("""
+            SELECT status, opportunity_max_ts, liquid_uri, liquid_table, liquid_max_ts, result_json, tried_liquid_json
+            FROM units WHERE params_key = ? AND opportunity_uri = ? AND opportunity_table = ?
+        """, (self.params_key, opportunity_uri, opportunity_table)).fetchone()
+        if row is None:
+            return False, None
+
+        status, stored_opportunity_ts, liquid_uri, liquid_table, stored_liquid_ts, result_json, tried_liquid_json = row
+        if status not in ('done', 'no_result') or stored_opportunity_ts != opportunity_max_ts:
+            return False, None
+        if liquid_table is not None and self.max_timestamp(liquid_uri, liquid_table) != stored_liquid_ts:
+            return False, None
+        if status == 'no_result':
+            for tried_uri, tried_table, tried_ts in json.loads(tried_liquid_json):
+                if self.max_timestamp(tried_uri, tried_table) != tried_ts:
+                    return False, None
+
+        self.skipped += 1
+        return True, json.loads(result_json) if result_json else None
+
+    def start(self, opportunity_uri, opportunity_table, opportunity_max_ts):
+        self._upsert(opportunity_uri, opportunity_table, 'running', opportunity_max_ts, None, None, None, None)
+
+    # tried_liquid: (uri, table) of every liquid candidate compared, fingerprinted when there is no result
+    def finish(self, opportunity_uri, opportunity_table, opportunity_max_ts, result, liquid_uri=None, liquid_table=None,
+               tried_liquid=()):
+        liquid_max_ts = self.max_timestamp(liquid_uri, liquid_table) if liquid_table else None
+        result_json = json.dumps(result, default=_json_default) if result else None
+        tried_liquid_json = None if result else json.dumps(
+            [(uri, table, self.max_timestamp(uri, table)) for uri, table in dict.fromkeys(tried_liquid)])
+        self._upsert(opportunity_uri, opportunity_table, 'done' if result else 'no_result',
+                     opportunity_max_ts, liquid_uri, liquid_table, liquid_max_ts, result_json, tried_liquid_json)
+        self.computed += 1
+
+    def _upsert(self, opportunity_uri, opportunity_table, status, opportunity_max_ts, liquid_uri, liquid_table, liquid_max_ts, result_json,
+                tried_liquid_json=None):
+        self._conn.execute("""
+            INSERT OR REPLACE INTO units (params_key, opportunity_uri, opportunity_table, status, opportunity_max_ts,
+                                          liquid_uri, liquid_table, liquid_max_ts, result_json, params_json, updated_at,
+                                          tried_liquid_json)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (self.params_key, opportunity_uri, opportunity_table, status, opportunity_max_ts,
+              liquid_uri, liquid_table, liquid_max_ts, result_json, self.params_json, time.time(), tried_liquid_json))
+        self._conn.commit()
+
+    def summary(self):
+        return f"Ledger {self.path}: {self.computed} units computed, {self.skipped} reused from earlier runs."
+
+    def close(self):
+        self._conn.close()
@@ -2,6 +2,7 @@ import pandas as pd
 import numpy as np
 from sqlalchemy import create_engine, inspect
 from sqlalchemy.sql import text
+from alignHelpers import *
 
 # Function to parse table name into exchange, base_asset, quote_asset, timeframe
 def parse_table_name(table_name):
@@ -54,7 +55,7 @@ def analyze_opportunity_vs_liquid(opportunity_engine, liquid_engine, opportunity
         liquid_df['low'] = liquid_df['adjusted_price']
         liquid_df['high'] = liquid_df['adjusted_price']
 
-    merged_df = opportunity_df.merge(liquid_df[['timestamp', 'low', 'high']], on='timestamp', suffixes=('_opportunity', '_liquid'))
+    merged_df = asof_merge(opportunity_df, liquid_df[['timestamp', 'low', 'high']], suffixes=('_opportunity', '_liquid'))
     merged_df['Low Difference (%)'] = ((merged_df['low_opportunity'] - merged_df['low_liquid']) / merged_df['low_liquid']) * 100
     merged_df['High Difference (%)'] = ((merged_df['high_opportunity'] - merged_df['high_liquid']) / merged_df['high_liquid']) * 100
     return merged_df
@@ -0,0 +1,180 @@
+import bisect
+import glob
+import os
+import struct
+import zlib
+import numpy as np
+import pandas as pd
+from candleSeries import to_epoch_ms
+from orderBookSim import BookTape, TradeTape
+
+# Block format written by scraper_bots/orderbook_recorder.py (keep the two in sync):
+#   <root>/<exchange>_<base>_<quote>/<YYYYMMDD_HH>.obk, append-only, one file per UTC hour
+#   block = BLOCK_HEADER + zlib(events, levels, trades); every block opens with a full snapshot
+ARCHIVE_ROOT = "orderbook_archive"
+BLOCK_MAGIC = b'OBK1'
+BLOCK_HEADER = struct.Struct('<4sqqIIII')  # magic, first_ts, last_ts, n_events, n_levels, n_trades, payload bytes
+EVENT_DTYPE = np.dtype([('timestamp', '<i8'), ('kind', 'u1'), ('n_levels', '<u4')])
+LEVEL_DTYPE = np.dtype([('side', 'u1'), ('price', '<f8'), ('amount', '<f8')])
+TRADE_DTYPE = np.dtype([('timestamp', '<i8'), ('price', '<f8'), ('amount', '<f8'), ('side', 'u1')])
+
+# Archive times are epoch ms; plain integers are taken as ms, anything else goes through pd.Timestamp
+def as_epoch_ms(value):
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return to_epoch_ms(value)
+
+# Where one block sits on disk and which time range it covers
+class BlockRef:
+    def __init__(self, path, offset, first_ts, last_ts, n_events, n_levels, n_trades, payload_bytes):
+        self.path = path
+        self.offset = offset
+        self.first_ts = first_ts
+        self.last_ts = last_ts
+        self.counts = (n_events, n_levels, n_trades)
+        self.payload_bytes = payload_bytes
+
+# Decoded block: events, their levels and the trades recorded alongside
+def read_block(ref):
+    with open(ref.path, 'rb') as f:
+        f.seek(ref.offset + BLOCK_HEADER.size)
+        raw = zlib.decompress(f.read(ref.payload_bytes))
+    n_events, n_levels, n_trades = ref.counts
+    events = np.frombuffer(raw, dtype=EVENT_DTYPE, count=n_events)
+    position = n_events * EVENT_DTYPE.itemsize
+    levels = np.frombuffer(raw, dtype=LEVEL_DTYPE, count=n_levels, offset=position)
+    position += n_levels * LEVEL_DTYPE.itemsize
+    trades = np.frombuffer(raw, dtype=TRADE_DTYPE, count=n_trades, offset=position)
+    return events, levels, trades
+
+# Top-of-book arrays from a price -> amount dict, best level first
+def top_levels(side_book, depth, descending):
+    prices = sorted(side_book, reverse=descending)[:depth]
+    price = np.full(depth, np.nan)
+    amount = np.zeros(depth)
+    price[:len(prices)] = prices
+    amount[:len(prices)] = [side_book[p] for p in prices]
+    return price, amount
+
+# Read-only view of one market's recorded books and trades
+# Only block headers are scanned on open; a lookup decompresses just the block that covers the requested time
+class OrderBookArchive:
+    def __init__(self, exchange_id, symbol, root=ARCHIVE_ROOT):
+        market = f"{exchange_id}_{symbol.replace('/', '_').replace(':', '_').lower()}"
+        self.directory = os.path.join(root, market)
+        self.blocks = []
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.obk"))):
+            self.blocks.extend(self._scan(path))
+        self.blocks.sort(key=lambda ref: ref.first_ts)
+        self._first_ts = [ref.first_ts for ref in self.blocks]
+
+    @staticmethod
+    def _scan(path):
+        refs = []
+        size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            offset = 0
+            while offset + BLOCK_HEADER.size <= size:
+                f.seek(offset)
+                magic, first_ts, last_ts, n_events, n_levels, n_trades, payload_bytes = BLOCK_HEADER.unpack(f.read(BLOCK_HEADER.size))
+                # A block cut short by a crash ends the readable part of the file
+                if magic != BLOCK_MAGIC or offset + BLOCK_HEADER.size + payload_bytes > size:
+                    break
+                refs.append(BlockRef(path, offset, first_ts, last_ts, n_events, n_levels, n_trades, payload_bytes))
+                offset += BLOCK_HEADER.size + payload_bytes
+        return refs
+
+    def __len__(self):
+        return len(self.blocks)
+
+    # Replays from the last block starting at or before start_ms (its state carries up to the next block) through end_ms,
+    # yielding (timestamp, (bids dict, asks dict)) after every event
+    def _replay(self, start_ms, end_ms):
+        lo = max(bisect.bisect_right(self._first_ts, start_ms) - 1, 0)
+        for ref in self.blocks[lo:]:
+            if ref.first_ts > end_ms:
+                break
+            events, levels, _ = read_block(ref)
+            book = ({}, {})
+            position = 0
+            for timestamp, kind, n_levels in events.tolist():
+                if timestamp > end_ms:
+                    break
+                chunk = levels[position:position + n_levels]
+                position += n_levels
+                if kind == 0:
+                    book = ({}, {})
+                for side, price, amount in chunk.tolist():
+                    if amount == 0:
+                        book[side].pop(price, None)
+                    else:
+                        book[side][price] = amount
+                yield timestamp, book
+
+    # Book as of a timestamp: (timestamp of the state, bids [[price, amount]], asks [[price, amount]]), or None
+    def book_at(self, timestamp, depth=100):
+        target = as_epoch_ms(timestamp)
+        state = None
+        for event_ts, book in self._replay(target, target):
+            if event_ts > target:
+                break
+            state = (event_ts, book[0].copy(), book[1].copy())
+        if state is None:
+            return None
+        event_ts, bids, asks = state
+        bid_price, bid_amount = top_levels(bids, depth, True)
+        ask_price, ask_amount = top_levels(asks, depth, False)
+        return event_ts, np.column_stack((bid_price, bid_amount)), np.column_stack((ask_price, ask_amount))
+
+    # Books in [start, end] as a BookTape for orderBookSim, one row per event or the last state every sample_ms
+    def book_tape(self, start=None, end=None, depth=100, sample_ms=None):
+        start_ms = as_epoch_ms(start) if start is not None else (self.blocks[0].first_ts if self.blocks else 0)
+        end_ms = as_epoch_ms(end) if end is not None else (self.blocks[-1].last_ts if self.blocks else 0)
+        timestamps, rows = [], []
+        next_sample = start_ms
+        for event_ts, book in self._replay(start_ms, end_ms):
+            if event_ts < start_ms:
+                continue
+            if sample_ms is not None:
+                if event_ts < next_sample:
+                    continue
+                next_sample = event_ts - event_ts % sample_ms + sample_ms
+            timestamps.append(event_ts)
+            rows.append(top_levels(book[0], depth, True) + top_levels(book[1], depth, False))
+
+        if not rows:
+            empty = np.empty((0, depth))
+            return BookTape(np.empty(0), empty, empty, empty, empty)
+        bid_price, bid_amount, ask_price, ask_amount = (np.vstack(column) for column in zip(*rows))
+        return BookTape(np.array(timestamps), bid_price, bid_amount, ask_price, ask_amount)
+
+    # Trades in [start, end] as a TradeTape for orderBookSim
+    def trade_tape(self, start=None, end=None):
+        start_ms = as_epoch_ms(start) if start is not None else -np.inf
+        end_ms = as_epoch_ms(end) if end is not None else np.inf
+        chunks = []
+        for ref in self.blocks:
+            if ref.last_ts < start_ms or ref.first_ts > end_ms or ref.counts[2] == 0:
+                continue
+            trades = read_block(ref)[2]
+            chunks.append(trades[(trades['timestamp'] >= start_ms) & (trades['timestamp'] <= end_ms)])
+        trades = np.concatenate(chunks) if chunks else np.empty(0, dtype=TRADE_DTYPE)
+        return TradeTape(trades['timestamp'], trades['price'], trades['amount'], np.where(trades['side'] == 1, 'sell', 'buy'))
+
+    def summary(self):
+        if not self.blocks:
+            return f"{self.directory}: no blocks"
+        size = sum(ref.payload_bytes + BLOCK_HEADER.size for ref in self.blocks)
+        events = sum(ref.counts[0] for ref in self.blocks)
+        trades = sum(ref.counts[2] for ref in self.blocks)
+        return (f"{self.directory}: {len(self.blocks)} blocks, {events} book events, {trades} trades, {size / 1e6:.1f} MB, "
+                f"{pd.Timestamp(self.blocks[0].first_ts, unit='ms')} to {pd.Timestamp(self.blocks[-1].last_ts, unit='ms')}")
+
+
+if __name__ == "__main__":
+    archive = OrderBookArchive('kraken', 'ONDO/USD')
+    print(archive.summary())
+    state = archive.book_at(pd.Timestamp.now('UTC').tz_localize(None) - pd.Timedelta(minutes=5), depth=10)
+    if state:
+        event_ts, bids, asks = state
+        print(f"Book at {pd.Timestamp(event_ts, unit='ms')}:\nbids\n{bids}\nasks\n{asks}")
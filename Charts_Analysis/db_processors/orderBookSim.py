@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+
+# Order book snapshots as dense [snapshot, level] arrays, best level first; missing levels are NaN price / 0 amount
+# Timestamps are int64 ms, sorted
+class BookTape:
+    def __init__(self, timestamp, bid_price, bid_amount, ask_price, ask_amount):
+        self.timestamp = np.ascontiguousarray(timestamp, dtype=np.int64)
+        self.bid_price = np.ascontiguousarray(bid_price, dtype=np.float64)
+        self.bid_amount = np.ascontiguousarray(bid_amount, dtype=np.float64)
+        self.ask_price = np.ascontiguousarray(ask_price, dtype=np.float64)
+        self.ask_amount = np.ascontiguousarray(ask_amount, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    # Long format, one row per level: timestamp (ms, identifies the snapshot), side ('bids'/'asks'), price, amount
+    # Same side/price/amount columns as the orderbookPusher tables
+    @classmethod
+    def from_frame(cls, df, depth=None):
+        df = df.sort_values(['timestamp', 'side', 'price'], kind='stable')
+        timestamps = np.unique(df['timestamp'].to_numpy(dtype=np.int64))
+        snapshot = np.searchsorted(timestamps, df['timestamp'].to_numpy(dtype=np.int64))
+        sides = {}
+        for side, best_first in (('bids', True), ('asks', False)):
+            rows = (df['side'] == side).to_numpy()
+            side_snapshot = snapshot[rows]
+            price = df['price'].to_numpy(dtype=np.float64)[rows]
+            amount = df['amount'].to_numpy(dtype=np.float64)[rows]
+            # Rows are price-ascending per snapshot; bids are reversed so level 0 is the best bid
+            order = np.lexsort((-price if best_first else price, side_snapshot))
+            side_snapshot, price, amount = side_snapshot[order], price[order], amount[order]
+            starts = np.searchsorted(side_snapshot, np.arange(len(timestamps)))
+            level = np.arange(len(side_snapshot)) - starts[side_snapshot]
+            levels = depth or (int(level.max()) + 1 if len(level) else 1)
+            keep = level < levels
+            price_grid = np.full((len(timestamps), levels), np.nan)
+            amount_grid = np.zeros((len(timestamps), levels))
+            price_grid[side_snapshot[keep], level[keep]] = price[keep]
+            amount_grid[side_snapshot[keep], level[keep]] = amount[keep]
+            sides[side] = (price_grid, amount_grid)
+        return cls(timestamps, *sides['bids'], *sides['asks'])
+
+# Public trades: int64 ms timestamps, price, amount and aggressor side ('buy' lifts asks, 'sell' hits bids)
+class TradeTape:
+    def __init__(self, timestamp, price, amount, side):
+        order = np.argsort(np.asarray(timestamp, dtype=np.int64), kind='stable')
+        self.timestamp = np.ascontiguousarray(np.asarray(timestamp, dtype=np.int64)[order])
+        self.price = np.ascontiguousarray(np.asarray(price, dtype=np.float64)[order])
+        self.amount = np.ascontiguousarray(np.asarray(amount, dtype=np.float64)[order])
+        self.is_sell = np.ascontiguousarray(np.asarray(side)[order] == 'sell')
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(df['timestamp'].to_numpy(), df['price'].to_numpy(), df['amount'].to_numpy(), df['side'].to_numpy())
+
+# Entry-bot quote for every requote at once, as in get_highest_bid_under_specified_value / get_lowest_ask_above_specified_value:
+# walk our side from the limit outwards, stop at the level where competition volume exceeds the allowance, step one tick inside
+# Returns (order price, queue ahead at that price), NaN price where the book has no level past the limit
+def quote_prices(levels_price, levels_amount, limit, max_competition_volume, tick, side):
+    if side == 'buy':
+        eligible = levels_price <= limit[:, None]
+    else:
+        eligible = levels_price >= limit[:, None]
+    cumulative = np.cumsum(np.where(eligible, levels_amount, 0), axis=1)
+    over = eligible & (cumulative > max_competition_volume)
+    has_over = over.any(axis=1)
+    # Fall back to the last eligible level, as the bots do when every level fits inside the allowance
+    last_eligible = levels_price.shape[1] - 1 - np.argmax(eligible[:, ::-1], axis=1)
+    level = np.where(has_over, np.argmax(over, axis=1), last_eligible)
+    rows = np.arange(len(limit))
+    anchor = levels_price[rows, level]
+    anchor = np.where(eligible.any(axis=1), anchor, np.nan)
+
+    price = anchor + tick if side == 'buy' else anchor - tick
+    # Resting size already at our exact price (normally none, since we quote a tick inside the anchor level)
+    same_price = np.isclose(levels_price, price[:, None], rtol=0, atol=tick / 2)
+    queue_ahead = np.where(same_price, levels_amount, 0).sum(axis=1)
+    return price, queue_ahead
+
+# Volume that could have reached our order in each requote interval, ignoring our own size
+# Trades at our price first consume the queue ahead; a trade through our price fills us completely (inf)
+def interval_capacity(trades, interval_start, interval_end, price, queue_ahead, side, tick):
+    capacity = np.zeros(len(interval_start))
+    if len(trades.timestamp) == 0:
+        return capacity
+    interval = np.searchsorted(interval_start, trades.timestamp, side='right') - 1
+    inside = (interval >= 0) & (trades.timestamp < interval_end[np.clip(interval, 0, None)])
+    aggressor = trades.is_sell if side == 'buy' else ~trades.is_sell
+    relevant = inside & aggressor
+    interval = interval[relevant]
+    trade_price = trades.price[relevant]
+    our_price = price[interval]
+    at_price = np.isclose(trade_price, our_price, rtol=0, atol=tick / 2)
+    through = (trade_price < our_price) if side == 'buy' else (trade_price > our_price)
+    through &= ~at_price
+
+    volume_at_price = np.bincount(interval[at_price], weights=trades.amount[relevant][at_price], minlength=len(capacity))
+    capacity = np.maximum(volume_at_price - queue_ahead, 0)
+    capacity[np.unique(interval[through])] = np.inf
+    capacity[np.isnan(price)] = 0
+    return capacity
+
+# Replay one entry bot over recorded books and trades
+# reference: (timestamp ms, price) arrays of the liquid market; the bot quotes reference * (1 - discount) for buys,
+# reference * (1 + premium) for sells, cancels and requotes every requote_seconds, and stops once budget is used
+# budget is in quote currency for buys and base currency for sells, like max_target_quote_asset_to_use / max_base_asset_to_use
+def simulate_entry_orders(book, trades, reference_timestamp, reference_price, side='buy', discount=0.02,
+                          max_competition_volume=10000, tick=0.00001, budget=100, min_order_value=10,
+                          requote_seconds=2.5, stale_seconds=10):
+    requote_ms = int(requote_seconds * 1000)
+    start = max(book.timestamp[0], int(reference_timestamp[0]))
+    end = book.timestamp[-1]
+    interval_start = np.arange(start, end, requote_ms, dtype=np.int64)
+    interval_end = interval_start + requote_ms
+
+    # Latest snapshot and reference price at every requote; stale inputs mean the bot skips that loop
+    snapshot = np.searchsorted(book.timestamp, interval_start, side='right') - 1
+    reference_idx = np.searchsorted(reference_timestamp, interval_start, side='right') - 1
+    fresh = (interval_start - book.timestamp[snapshot] <= stale_seconds * 1000) & \
+            (interval_start - reference_timestamp[reference_idx] <= stale_seconds * 1000)
+    reference = np.asarray(reference_price, dtype=np.float64)[reference_idx]
+
+    if side == 'buy':
+        limit = reference * (1 - discount)
+        price, queue_ahead = quote_prices(book.bid_price[snapshot], book.bid_amount[snapshot], limit, max_competition_volume, tick, side)
+    else:
+        limit = reference * (1 + discount)
+        price, queue_ahead = quote_prices(book.ask_price[snapshot], book.ask_amount[snapshot], limit, max_competition_volume, tick, side)
+    price[~fresh] = np.nan
+
+    capacity = interval_capacity(trades, interval_start, interval_end, price, queue_ahead, side, tick)
+
+    # The budget makes intervals depend on each other, but only intervals with any capacity need a look
+    fills = []
+    remaining = budget
+    for k in np.flatnonzero(capacity > 0):
+        order_amount = remaining / price[k] if side == 'buy' else remaining
+        if order_amount * price[k] < min_order_value:
+            break
+        filled = min(order_amount, capacity[k])
+        remaining -= filled * price[k] if side == 'buy' else filled
+        fills.append((interval_start[k], price[k], filled, filled * price[k], reference[k], filled < order_amount))
+
+    fills = pd.DataFrame(fills, columns=['timestamp', 'price', 'amount', 'quote_value', 'reference_price', 'partial'])
+    fills['timestamp'] = pd.to_datetime(fills['timestamp'], unit='ms')
+    sign = 1 if side == 'buy' else -1
+    fills['edge_pct'] = sign * (fills['reference_price'] / fills['price'] - 1) * 100
+    return fills, {
+        'side': side,
+        'requotes': int(np.count_nonzero(~np.isnan(price))),
+        'fills': len(fills),
+        'partial_fills': int(fills['partial'].sum()),
+        'filled_quote_value': float(fills['quote_value'].sum()),
+        'budget_used_pct': float((budget - remaining) / budget * 100) if budget else 0.0,
+        'avg_edge_pct': float(np.average(fills['edge_pct'], weights=fills['quote_value'])) if len(fills) else None,
+    }
+
+
+if __name__ == "__main__":
+    # Books/trades from scraper_bots/orderbook_recorder.py and a liquid reference candle table
+    from sqlalchemy import create_engine
+    from candleSeries import CandleSeries
+    from orderBookArchive import OrderBookArchive
+
+    archive = OrderBookArchive('kraken', 'ONDO/USD')
+    book = archive.book_tape(depth=100)
+    trades = archive.trade_tape()
+    liquid = CandleSeries.load(create_engine("postgresql+psycopg2://postgres:@localhost:5432/Testing_Data_Collection_Binance"),
+                               "binance_ondo_usdt_1m", pd.Timestamp(int(book.timestamp[0]), unit='ms'), None)
+
+    fills, summary = simulate_entry_orders(book, trades, liquid.timestamp, liquid.close, side='buy', discount=0.02,
+                                           max_competition_volume=10000, tick=0.00001, budget=100.01,
+                                           stale_seconds=90)  # 1m candles: allow one full candle of age
+    print(fills.to_string(index=False))
+    print(summary)
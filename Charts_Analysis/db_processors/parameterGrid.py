@@ -0,0 +1,156 @@
+import itertools
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from alignHelpers import *
+from candleSeries import *
+
+DAY_MS = 86_400_000
+GRID_COLUMNS = ['rank', 'side', 'window_start', 'window_end', 'min_quote_volume', 'max_diff_pct', 'threshold', 'step',
+                'best_bin_pct', 'count', 'avg_volume', 'monthly_return_pct', 'days']
+
+# One (opportunity, liquid) pair aligned once over the union of all grid windows
+# Same differences as chartStrategyProcessorDB: opportunity low/high vs liquid low/high, zero-volume candles dropped
+class GridPair:
+    def __init__(self, opportunity, liquid, tolerance_ms=ALIGN_TOLERANCE_MS):
+        aligned = align_columns(opportunity.timestamp,
+                                {'low_opportunity': opportunity.low, 'high_opportunity': opportunity.high,
+                                 'volume_opportunity': opportunity.volume},
+                                liquid.timestamp,
+                                {'low_liquid': liquid.low, 'high_liquid': liquid.high},
+                                tolerance_ms)
+        self.timestamp = aligned['timestamp']
+        self.low_opportunity = aligned['low_opportunity'].astype(np.float64)
+        self.high_opportunity = aligned['high_opportunity'].astype(np.float64)
+        self.low_liquid = aligned['low_liquid'].astype(np.float64)
+        self.high_liquid = aligned['high_liquid'].astype(np.float64)
+        # Positive sizes: how far the opportunity low is below / high is above the liquid market
+        self.buy_size = -(self.low_opportunity - self.low_liquid) / self.low_liquid * 100
+        self.sell_size = (self.high_opportunity - self.high_liquid) / self.high_liquid * 100
+        self.base_volume = aligned['volume_opportunity'].astype(np.float64)
+        self.quote_volume = self.base_volume * self.low_opportunity
+
+    @classmethod
+    def load(cls, opportunity_engine, opportunity_table, liquid_engine, liquid_table, start=None, end=None):
+        opportunity = CandleSeries.load(opportunity_engine, opportunity_table, start, end, min_volume=0)
+        liquid = CandleSeries.load(liquid_engine, liquid_table, start, end, min_volume=0)
+        return cls(opportunity, liquid)
+
+    # Row range of [start, end], a slice because the aligned timestamps are sorted
+    def window(self, start=None, end=None):
+        lo = 0 if start is None else np.searchsorted(self.timestamp, to_epoch_ms(start), side='left')
+        hi = len(self.timestamp) if end is None else np.searchsorted(self.timestamp, to_epoch_ms(end), side='right')
+        return slice(lo, hi)
+
+# Best bin of every (threshold, step) ladder for one set of opportunity sizes
+# Sizes are sorted once; each ladder rung is a searchsorted plus a suffix sum of the volumes
+def best_bins(sizes, volumes, thresholds, steps, days):
+    order = np.argsort(sizes, kind='stable')
+    sorted_sizes = sizes[order]
+    suffix_volume = np.concatenate((np.cumsum(volumes[order][::-1])[::-1], [0.0]))
+    max_size = sorted_sizes[-1] if len(sorted_sizes) else 0
+
+    results = []
+    for threshold, step in itertools.product(thresholds, steps):
+        ladder = np.arange(threshold, max_size + step, step)
+        if len(ladder) == 0:
+            results.append((threshold, step, None, 0, None, 0.0))
+            continue
+        first = np.searchsorted(sorted_sizes, ladder, side='left')
+        counts = len(sorted_sizes) - first
+        monthly = ladder * counts * (30 / days)
+        best = int(np.argmax(monthly))
+        count = int(counts[best])
+        avg_volume = suffix_volume[first[best]] / count if count else None
+        results.append((threshold, step, float(ladder[best]) if count else None, count, avg_volume, float(monthly[best])))
+    return results
+
+# Evaluate every combination of window, min quote volume, bad-candle filter, threshold and step on one loaded pair
+# max_diff_pct=None keeps every candle (chartStrategyProcessorDB); a number applies dropCalculatorDB's filter per side
+def evaluate_grid(pair, thresholds, steps, windows=((None, None),), min_quote_volumes=(0,), max_diff_pcts=(None,)):
+    rows = []
+    for (start, end), min_quote_volume, max_diff_pct in itertools.product(windows, min_quote_volumes, max_diff_pcts):
+        rows_in_window = pair.window(start, end)
+        timestamps = pair.timestamp[rows_in_window]
+        if len(timestamps) == 0:
+            continue
+        days = int((timestamps[-1] - timestamps[0]) // DAY_MS) + 1
+        keep = pair.quote_volume[rows_in_window] >= min_quote_volume
+
+        for side, sizes, volumes in (('buy', pair.buy_size, pair.quote_volume), ('sell', pair.sell_size, pair.base_volume)):
+            side_keep = keep.copy()
+            if max_diff_pct is not None:
+                if side == 'buy':
+                    side_keep &= pair.low_opportunity[rows_in_window] >= pair.low_liquid[rows_in_window] * (1 - max_diff_pct / 100)
+                else:
+                    side_keep &= pair.high_opportunity[rows_in_window] <= pair.high_liquid[rows_in_window] * (1 + max_diff_pct / 100)
+            side_sizes = sizes[rows_in_window][side_keep]
+            side_volumes = volumes[rows_in_window][side_keep]
+            valid = ~np.isnan(side_sizes)
+            for threshold, step, best_bin, count, avg_volume, monthly in best_bins(side_sizes[valid], side_volumes[valid], thresholds, steps, days):
+                rows.append({
+                    'side': side,
+                    'window_start': pd.Timestamp(start) if start is not None else pd.Timestamp(int(timestamps[0]), unit='ms'),
+                    'window_end': pd.Timestamp(end) if end is not None else pd.Timestamp(int(timestamps[-1]), unit='ms'),
+                    'min_quote_volume': min_quote_volume,
+                    'max_diff_pct': max_diff_pct,
+                    'threshold': threshold,
+                    'step': step,
+                    'best_bin_pct': best_bin,
+                    'count': count,
+                    'avg_volume': avg_volume,
+                    'monthly_return_pct': monthly,
+                    'days': days,
+                })
+
+    grid = pd.DataFrame(rows)
+    if grid.empty:
+        return pd.DataFrame(columns=GRID_COLUMNS)
+    grid = grid.sort_values('monthly_return_pct', ascending=False, kind='stable').reset_index(drop=True)
+    grid['rank'] = np.arange(1, len(grid) + 1)
+    return grid[GRID_COLUMNS]
+
+# Load the pair once over the union of the windows, evaluate the whole grid and write the ranked table
+def run_grid(opportunity_database_uri, liquid_database_uri, opportunity_table_name, liquid_table_name,
+             thresholds, steps, windows=((None, None),), min_quote_volumes=(0,), max_diff_pcts=(None,),
+             output_file="parameter_grid_results.csv"):
+    starts = [start for start, _ in windows]
+    ends = [end for _, end in windows]
+    load_start = None if any(start is None for start in starts) else min(pd.Timestamp(start) for start in starts)
+    load_end = None if any(end is None for end in ends) else max(pd.Timestamp(end) for end in ends)
+
+    pair = GridPair.load(create_engine(opportunity_database_uri), opportunity_table_name,
+                         create_engine(liquid_database_uri), liquid_table_name, load_start, load_end)
+    print(f"Loaded {len(pair.timestamp)} aligned rows for {opportunity_table_name} vs {liquid_table_name}")
+
+    grid = evaluate_grid(pair, thresholds, steps, windows, min_quote_volumes, max_diff_pcts)
+    grid.to_csv(output_file, index=False)
+    print(f"Evaluated {len(grid)} configurations, saved to {output_file}")
+    print(grid.head(20).to_string(index=False))
+    return grid
+
+
+if __name__ == "__main__":
+    opportunity_exchange_string = 'Kraken'
+    liquid_exchange_string = 'Bitget'
+    base_asset = 'pengu'
+    opportunity_quote_asset = 'usd'
+    liquid_quote_asset = 'usdt'
+    opportunity_table_name = f'{opportunity_exchange_string.lower()}_{base_asset}_{opportunity_quote_asset}_1m'
+    liquid_table_name = f'{liquid_exchange_string.lower()}_{base_asset}_{liquid_quote_asset}_1m'
+
+    opportunity_database_uri = f"postgresql+psycopg2://postgres:@localhost:5432/Testing_Data_Collection_{opportunity_exchange_string}"
+    liquid_database_uri = f"postgresql+psycopg2://postgres:@localhost:5432/Testing_Data_Collection_{liquid_exchange_string}"
+
+    windows = [
+        (pd.to_datetime('2025-05-01 00:00:00'), pd.to_datetime('2025-07-31 23:59:59')),
+        (pd.to_datetime('2025-08-01 00:00:00'), pd.to_datetime('2025-10-31 23:59:59')),
+        (pd.to_datetime('2025-05-01 00:00:00'), pd.to_datetime('2025-10-31 23:59:59')),
+    ]
+
+    run_grid(opportunity_database_uri, liquid_database_uri, opportunity_table_name, liquid_table_name,
+             thresholds=[0.1, 0.3, 0.5, 1.0],
+             steps=[0.05, 0.1, 0.25],
+             windows=windows,
+             min_quote_volumes=[0, 100, 1000],
+             max_diff_pcts=[None, 2, 5])
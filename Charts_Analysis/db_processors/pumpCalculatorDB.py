@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
 from sqlalchemy import create_engine
+from alignHelpers import *
 
 def parse_table_name_v2(table_name):
     parts = table_name.split('_')
@@ -14,7 +15,7 @@ def parse_table_name_v2(table_name):
 
 def calculate_percentage_changes_v2(df, ref_df):
     # Merge primary and reference market data on timestamp
-    merged_df = pd.merge(df, ref_df, on='timestamp', suffixes=('', '_ref'))
+    merged_df = asof_merge(df, ref_df, suffixes=('', '_ref'))
 
     # Calculate percentage differences relative to the reference market
     merged_df['Low Difference (%)'] = ((merged_df['low'] - merged_df['open_ref']) / merged_df['open_ref']) * 100
@@ -33,8 +34,11 @@ def count_occurrences_v2(df, threshold):
 
 def bin_results_v2(occurrences, bin_width, threshold):
     # Bin the occurrences based on high percentage changes
+    # One sort, then every bin's "≥ bin" count is a searchsorted on the sorted differences
     bins = np.arange(threshold, occurrences['High Difference (%)'].max() + bin_width, bin_width)
-    binned_data = {f"≥ {bin:.2f}%": occurrences[occurrences['High Difference (%)'] >= bin].shape[0] for bin in bins}
+    sorted_diffs = np.sort(occurrences['High Difference (%)'].to_numpy())
+    counts = len(sorted_diffs) - np.searchsorted(sorted_diffs, bins, side='left')
+    binned_data = {f"≥ {bin:.2f}%": int(count) for bin, count in zip(bins, counts)}
     return binned_data
 
 def analyze_chart_strategy_v2(database_uri, table_name, reference_database_uri, reference_table_name, start_datetime, end_datetime, threshold, bin_width, max_diff_pct):
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from sqlalchemy import text
+from candleSeries import to_epoch_ms
+from jobLedger import _json_default
+
+# Row count and newest timestamp of the analysed window (a range on the timestamp primary key, i.e. an index scan)
+# Only rows inside [start, end] matter, so scrapers appending after a historical end leave the fingerprint alone
+# None when the table is missing, which is itself a valid fingerprint: creating the table changes it
+def table_fingerprint(engine, table_name, start=None, end=None):
+    conditions = []
+    params = {}
+    if start is not None:
+        conditions.append('timestamp >= :start_ms')
+        params['start_ms'] = to_epoch_ms(start)
+    if end is not None:
+        conditions.append('timestamp <= :end_ms')
+        params['end_ms'] = to_epoch_ms(end)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+    quoted = engine.dialect.identifier_preparer.quote(table_name)
+    query = text(f"SELECT COUNT(*), MAX(timestamp) FROM {quoted}{where}")
+    try:
+        with engine.connect() as connection:
+            row_count, max_ts = connection.execute(query, params).one()
+        return [int(row_count), int(max_ts) if max_ts is not None else None]
+    except Exception:
+        return None
+
+# Persistent memo of pair-level analyzer results (including "no result"), keyed by the call parameters
+# An entry is reused only while every source table still has the same fingerprint; otherwise it is recomputed in place
+class PairResultCache:
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                cache_key TEXT PRIMARY KEY,
+                params_json TEXT,
+                fingerprint_json TEXT,
+                result_json TEXT,
+                updated_at REAL
+            )
+        """)
+        self._conn.commit()
+
+    # params: JSON-able call parameters; sources: [(engine, table_name)] whose data the result depends on
+    # A source may be (engine, table_name, fingerprint) when the caller already has it, e.g. the opportunity table
+    # shared by every liquid candidate of a unit
+    def get_or_compute(self, params, sources, compute, start=None, end=None):
+        params_json = json.dumps({**params, 'sources': [[str(source[0].url), source[1]] for source in sources]},
+                                 sort_keys=True, default=str)
+        cache_key = hashlib.sha1(params_json.encode()).hexdigest()
+        fingerprint_json = json.dumps([source[2] if len(source) > 2 else table_fingerprint(source[0], source[1], start, end)
+                                       for source in sources])
+
+        row = self._conn.execute("SELECT fingerprint_json, result_json FROM results WHERE cache_key = ?",
+                                 (cache_key,)).fetchone()
+        if row is not None and row[0] == fingerprint_json:
+            self.hits += 1
+            return json.loads(row[1])
+
+        self.misses += 1
+        result = compute()
+        self._conn.execute("""
+            INSERT OR REPLACE INTO results (cache_key, params_json, fingerprint_json, result_json, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (cache_key, params_json, fingerprint_json, json.dumps(result, default=_json_default), time.time()))
+        self._conn.commit()
+        return result
+
+    def entries(self):
+        return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def size_bytes(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0
+        return (f"Result cache {self.path}: {self.entries()} pairs, {self.size_bytes() / 1e6:.1f} MB, "
+                f"{self.hits} hits / {self.misses} misses ({hit_rate:.0%} hit rate).")
+
+    def close(self):
+        self._conn.close()
+
+
+# Usage: python resultCache.py <cache.sqlite> - prints the size of an existing cache
+if __name__ == "__main__":
+    cache = PairResultCache(sys.argv[1] if len(sys.argv) > 1 else "arbitrage_analysis_cache.sqlite")
+    print(cache.summary())
+    cache.close()
@@ -0,0 +1,115 @@
+import csv
+import os
+import pandas as pd
+import xlsxwriter
+
+# Tab name -> (quote assets, sort column); None collects every quote not listed in MAJOR_QUOTE_ASSETS
+QUOTE_TAB_DEFINITIONS = {
+    "USD Buy":  (['usdt', 'usdc', 'usd'], "monthly_buy_profit_percentage"),
+    "USD Sell": (['usdt', 'usdc', 'usd'], "monthly_sell_profit_percentage"),
+    "BTC Buy":  (['btc'], "monthly_buy_profit_percentage"),
+    "BTC Sell": (['btc'], "monthly_sell_profit_percentage"),
+    "ETH Buy":  (['eth'], "monthly_buy_profit_percentage"),
+    "ETH Sell": (['eth'], "monthly_sell_profit_percentage"),
+    "Others Buy": (None, "monthly_buy_profit_percentage"),
+    "Others Sell": (None, "monthly_sell_profit_percentage")
+}
+MAJOR_QUOTE_ASSETS = ['usdt', 'usdc', 'usd', 'btc', 'eth']
+MAX_COLUMN_WIDTH = 60
+# Excel's General format shows at most 11 characters of a float
+FLOAT_DISPLAY_WIDTH = 11
+DATETIME_DISPLAY_WIDTH = 19
+
+# Longest rendered value of a column, from its dtype and summary stats rather than every cell
+def rendered_width(values):
+    values = values.dropna()
+    if values.empty:
+        return 0
+    if pd.api.types.is_bool_dtype(values):
+        return 5
+    if pd.api.types.is_integer_dtype(values):
+        return max(len(str(values.min())), len(str(values.max())))
+    if pd.api.types.is_float_dtype(values):
+        return FLOAT_DISPLAY_WIDTH
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return DATETIME_DISPLAY_WIDTH
+    # Object columns hold strings already; anything else falls back to the header width
+    return int(values.str.len().max()) if pd.api.types.infer_dtype(values) == 'string' else 0
+
+# Column widths from the longest rendered value per column
+def column_widths(df):
+    return {col: min(max(len(str(col)), rendered_width(df[col])) + 2, MAX_COLUMN_WIDTH) for col in df.columns}
+
+# Write results into quote-categorized, sorted tabs using xlsxwriter's constant-memory mode
+def write_categorized_excel(df, filename, tab_definitions=QUOTE_TAB_DEFINITIONS, quote_column='exchange_quote_asset'):
+    workbook = xlsxwriter.Workbook(filename, {'constant_memory': True, 'nan_inf_to_errors': True})
+    widths = column_widths(df)
+    quotes = df[quote_column].astype(str).str.lower() if not df.empty else pd.Series(dtype=str)
+
+    for tab_name, (quote_assets, sort_column) in tab_definitions.items():
+        if quote_assets:
+            tab_df = df[quotes.isin(quote_assets)]
+        else:
+            tab_df = df[~quotes.isin(MAJOR_QUOTE_ASSETS)]
+        if tab_df.empty:
+            continue
+
+        tab_df = tab_df.sort_values(by=sort_column, ascending=False)
+        worksheet = workbook.add_worksheet(tab_name[:31])
+        # Widths must be set before any row is flushed in constant-memory mode
+        for col_idx, col in enumerate(df.columns):
+            worksheet.set_column(col_idx, col_idx, widths[col])
+        worksheet.write_row(0, 0, list(df.columns))
+        for row_idx, row in enumerate(tab_df.itertuples(index=False, name=None), start=1):
+            worksheet.write_row(row_idx, 0, [None if pd.isna(value) else value for value in row])
+
+    workbook.close()
+    print(f"Results saved to {filename}")
+
+# Append-only CSV log of analyzer results, flushed on every row so a crash loses no finished work
+class ResultSink:
+    def __init__(self, log_path, resume=False):
+        self.log_path = log_path
+        self.fieldnames = None
+        self.rows_written = 0
+
+        if resume and os.path.exists(log_path) and os.path.getsize(log_path) > 0:
+            with open(log_path, newline='', encoding='utf-8') as existing:
+                reader = csv.reader(existing)
+                self.fieldnames = next(reader)
+                self.rows_written = sum(1 for _ in reader)
+            self._file = open(log_path, 'a', newline='', encoding='utf-8')
+        else:
+            self._file = open(log_path, 'w', newline='', encoding='utf-8')
+        self._writer = None if self.fieldnames is None else csv.DictWriter(self._file, fieldnames=self.fieldnames, extrasaction='ignore')
+
+    def append(self, result):
+        if self._writer is None:
+            self.fieldnames = list(result.keys())
+            self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, extrasaction='ignore')
+            self._writer.writeheader()
+        # Missing metrics are logged as empty fields so they read back as NaN, not the string 'nan'
+        self._writer.writerow({key: None if pd.api.types.is_scalar(value) and pd.isna(value) else value for key, value in result.items()})
+        self._file.flush()
+        self.rows_written += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # Everything logged so far, as a DataFrame (one small row per market)
+    def read(self):
+        if not self._file.closed:
+            self._file.flush()
+        if self.rows_written == 0:
+            return pd.DataFrame(columns=self.fieldnames or [])
+        return pd.read_csv(self.log_path, keep_default_na=False, na_values=[''])
+
+    def write_excel(self, filename, tab_definitions=QUOTE_TAB_DEFINITIONS, quote_column='exchange_quote_asset'):
+        write_categorized_excel(self.read(), filename, tab_definitions, quote_column)
@@ -0,0 +1,169 @@
+from collections import OrderedDict
+import numpy as np
+from sqlalchemy import inspect
+from alignHelpers import *
+from candleSeries import *
+
+# Stable quotes treated as USD when pricing a leg, in the order they are tried
+USD_QUOTES = ('usdt', 'usdc', 'usd')
+
+# Fiat -> (exchange, table template, inverted); USD/CAD is quoted as CAD per USD, so CAD legs are inverted
+FIAT_USD_LEGS = {
+    'eur': ('kraken', 'kraken_eur_usd_{timeframe}', False),
+    'gbp': ('kraken', 'kraken_gbp_usd_{timeframe}', False),
+    'cad': ('kraken', 'kraken_usd_cad_{timeframe}', True),
+}
+# Chosen legs and built cross rates kept in memory, least recently used dropped first
+# Quote legs (EUR, BTC, ...) are reused across the sweep; base legs are mostly used for a single market
+LEG_CACHE_SIZE = 32
+RATE_CACHE_SIZE = 32
+
+# One USD-priced leg: asset price in USD per candle plus its traded USD volume (the liquidity score)
+class UsdLeg:
+    def __init__(self, table_name, timestamp, price, usd_volume):
+        self.table_name = table_name
+        self.timestamp = timestamp
+        self.price = price
+        self.usd_volume = usd_volume
+
+# Cross rates base/quote = (base in USD) / (quote in USD)
+# Each side picks its most liquid USD leg (USDT/USDC/USD on the registered exchanges, or the fiat
+# table) by traded USD volume over the sweep window; only the chosen leg is kept, in a small LRU
+class SyntheticRateEngine:
+    def __init__(self, engines=None, timeframe='1m', start=None, end=None,
+                 fiat_legs=FIAT_USD_LEGS, usd_quotes=USD_QUOTES, tolerance_ms=ALIGN_TOLERANCE_MS,
+                 leg_cache_size=LEG_CACHE_SIZE, rate_cache_size=RATE_CACHE_SIZE):
+        self.engines = dict(engines or {})
+        self.timeframe = timeframe.lower()
+        self.start = start
+        self.end = end
+        self.fiat_legs = fiat_legs
+        self.usd_quotes = usd_quotes
+        self.tolerance_ms = tolerance_ms
+        self.leg_cache_size = leg_cache_size
+        self.rate_cache_size = rate_cache_size
+        self._tables = {}
+        self._legs = OrderedDict()
+        self._rates = OrderedDict()
+
+    def register(self, exchange_name, engine):
+        self.engines.setdefault(exchange_name.lower(), engine)
+
+    # Table names per exchange, listed once so absent legs are skipped without a failing query
+    def has_table(self, exchange_name, table_name):
+        if exchange_name not in self._tables:
+            try:
+                self._tables[exchange_name] = set(inspect(self.engines[exchange_name]).get_table_names())
+            except Exception as e:
+                print(f"Could not list tables for {exchange_name}: {e}")
+                self._tables[exchange_name] = set()
+        return table_name in self._tables[exchange_name]
+
+    # Raw table over the sweep window; not cached, only the leg chosen from it is
+    def series(self, exchange_name, table_name):
+        if not self.has_table(exchange_name, table_name):
+            return CandleSeries.empty_series(table_name)
+        try:
+            return CandleSeries.load(self.engines[exchange_name], table_name, self.start, self.end)
+        except Exception as e:
+            print(f"Synthetic leg {table_name} unavailable: {e}")
+            return CandleSeries.empty_series(table_name)
+
+    @staticmethod
+    def _remember(cache, key, value, size):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > size:
+            cache.popitem(last=False)
+
+    # Most liquid USD leg of an asset as a list: [leg], [None] if the asset is USD itself, [] if there is none
+    # The rejected candidates are dropped as soon as the choice is made
+    def usd_legs(self, asset, exchange_name=None):
+        asset = asset.lower()
+        if asset in self.usd_quotes:
+            return [None]  # already USD: the leg is the constant 1
+        key = (asset, exchange_name.lower() if exchange_name else None)
+        if key in self._legs:
+            self._legs.move_to_end(key)
+            return self._legs[key]
+        legs = self._candidate_legs(asset, exchange_name)
+        best = max(legs, key=lambda leg: float(np.nansum(leg.usd_volume, dtype=np.float64)), default=None)
+        chosen = [best] if best is not None else []
+        self._remember(self._legs, key, chosen, self.leg_cache_size)
+        return chosen
+
+    # (exchange, table, inverted) of every USD leg usd_legs considers for an asset, present or not
+    def candidate_tables(self, asset, exchange_name=None):
+        asset = asset.lower()
+        candidates = []
+        if asset in self.usd_quotes:
+            return candidates
+        if asset in self.fiat_legs:
+            fiat_exchange, template, inverted = self.fiat_legs[asset]
+            if fiat_exchange in self.engines:
+                candidates.append((fiat_exchange, template.format(timeframe=self.timeframe), inverted))
+
+        exchanges = [exchange_name.lower()] if exchange_name else list(self.engines)
+        for exchange in exchanges:
+            if exchange not in self.engines:
+                continue
+            for usd_quote in self.usd_quotes:
+                table_name = f"{exchange}_{asset}_{usd_quote}_{self.timeframe}"
+                if not any(candidate[1] == table_name for candidate in candidates):
+                    candidates.append((exchange, table_name, False))
+        return candidates
+
+    # (database URI, table) of every leg a cross rate may use, so a caller can fingerprint them (see JobLedger)
+    def leg_sources(self, base_asset, quote_asset, exchange_name=None):
+        return [(self.engines[exchange].url.render_as_string(hide_password=False), table_name)
+                for asset in (base_asset, quote_asset)
+                for exchange, table_name, _ in self.candidate_tables(asset, exchange_name)]
+
+    def _candidate_legs(self, asset, exchange_name=None):
+        legs = []
+        for exchange, table_name, inverted in self.candidate_tables(asset, exchange_name):
+            series = self.series(exchange, table_name)
+            if series.empty:
+                continue
+            price = 1.0 / series.close if inverted else series.close
+            # The inverted table's base is USD itself, so its base volume already is the USD volume
+            usd_volume = series.volume if inverted else series.volume * series.close
+            legs.append(UsdLeg(table_name, series.timestamp, price, usd_volume))
+        return legs
+
+    # base/quote as a CandleSeries (open = high = low = close = rate, zero volume), or None if no path exists
+    def cross_rate(self, base_asset, quote_asset, exchange_name=None):
+        key = (base_asset.lower(), quote_asset.lower(), exchange_name.lower() if exchange_name else None)
+        if key in self._rates:
+            self._rates.move_to_end(key)
+            return self._rates[key]
+
+        base_legs = self.usd_legs(base_asset, exchange_name)
+        quote_legs = self.usd_legs(quote_asset, exchange_name)
+        name = f"synthetic_{base_asset}_{quote_asset}".lower()
+        rate = None
+        if base_legs and quote_legs and base_legs[0] is not None:
+            base_leg, quote_leg = base_legs[0], quote_legs[0]
+            if quote_leg is None:
+                timestamp, price = base_leg.timestamp, base_leg.price
+            else:
+                aligned = align_columns(base_leg.timestamp, {'base': base_leg.price},
+                                        quote_leg.timestamp, {'quote': quote_leg.price}, self.tolerance_ms)
+                timestamp, price = aligned['timestamp'], aligned['base'] / aligned['quote']
+            if len(timestamp):
+                print(f"Synthetic {base_asset}/{quote_asset} via {base_leg.table_name}"
+                      f"{' / ' + quote_leg.table_name if quote_leg is not None else ''}")
+                rate = CandleSeries(timestamp, price, price, price, price, np.zeros(len(price)), name=name)
+
+        if rate is None:
+            print(f"Error: Could not build a synthetic price for {base_asset}/{quote_asset}. Missing base or quote leg.")
+        self._remember(self._rates, key, rate, self.rate_cache_size)
+        return rate
+
+    # Asset price in USD on its most liquid leg, e.g. usd_rate('eur') for the EUR/USD conversion
+    def usd_rate(self, asset, exchange_name=None):
+        legs = self.usd_legs(asset, exchange_name)
+        if not legs or legs[0] is None:
+            return None
+        leg = legs[0]
+        return CandleSeries(leg.timestamp, leg.price, leg.price, leg.price, leg.price, leg.usd_volume, name=leg.table_name)
@@ -0,0 +1,114 @@
+import glob
+import io
+import os
+import sys
+import pandas as pd
+from sqlalchemy import create_engine
+from exchangeNames import *
+
+# TradingView resolution in the export name -> timeframe suffix used by the candle tables
+TRADINGVIEW_TIMEFRAMES = {
+    '1S': '1s', '5S': '5s', '15S': '15s', '30S': '30s',
+    '1': '1m', '3': '3m', '5': '5m', '15': '15m', '30': '30m', '45': '45m',
+    '60': '1h', '120': '2h', '180': '3h', '240': '4h',
+    '1D': '1d', 'D': '1d', '1W': '1w', 'W': '1w', '1M': '1mo', 'M': '1mo',
+}
+CANDLE_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+# 'EXCHANGE_BASE_QUOTE, TF.csv' as exported from TradingView
+CSV_PATTERN = '*_*_*, *.csv'
+
+# 'KRAKEN_PUMP_USD, 1S.csv' -> ('Kraken', 'kraken_pump_usd_1s'), 'GATEIO_PEPE_USDT, 1.csv' -> ('Gate', 'gate_pepe_usdt_1m')
+# The database name and table prefix come from exchangeNames, the same as the scrapers and the analyzers use
+def export_table_name(file_path):
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    parts = name.replace(',', '').split('_')
+    if len(parts) != 3 or len(parts[2].split()) != 2:
+        raise ValueError(f"Filename format is incorrect: '{name}' - Expected format: 'EXCHANGE_BASEASSET_QUOTEASSET, TIMEFRAME.csv'")
+    exchange, base_asset = parts[0], parts[1]
+    quote_asset, resolution = parts[2].split()
+    timeframe = TRADINGVIEW_TIMEFRAMES.get(resolution.upper())
+    if timeframe is None:
+        raise ValueError(f"Unknown TradingView resolution '{resolution}' in '{name}'")
+    exchange = tradingview_exchange(exchange)
+    return exchange_db_name(exchange), f"{exchange}_{base_asset}_{quote_asset}_{timeframe}".lower()
+
+# Export -> candle rows with ms timestamps; the MA and Low/High Difference columns are TradingView-side
+# comparisons the DB analyzers recompute against their own liquid tables, so they are not stored
+def read_export_candles(file_path):
+    df = pd.read_csv(file_path, usecols=['time', 'open', 'high', 'low', 'close', 'Volume'])
+    df = df.dropna(subset=['time'])
+    candles = pd.DataFrame({
+        'timestamp': df['time'].astype('int64') * 1000,
+        'open': df['open'],
+        'high': df['high'],
+        'low': df['low'],
+        'close': df['close'],
+        'volume': df['Volume'],
+    })
+    return candles.drop_duplicates('timestamp', keep='last')
+
+# COPY the rows into a temporary staging table and merge them in one statement
+# Existing candles (e.g. from the scrapers) are kept unless replace_existing is set
+def copy_candles(engine, table_name, candles, replace_existing=False):
+    buffer = io.StringIO()
+    candles.to_csv(buffer, columns=CANDLE_COLUMNS, index=False, header=False)
+    buffer.seek(0)
+    table = f'"{table_name}"'
+    conflict = ("DO UPDATE SET open = EXCLUDED.open, high = EXCLUDED.high, low = EXCLUDED.low, "
+                "close = EXCLUDED.close, volume = EXCLUDED.volume") if replace_existing else "DO NOTHING"
+
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                timestamp BIGINT PRIMARY KEY,
+                open FLOAT,
+                high FLOAT,
+                low FLOAT,
+                close FLOAT,
+                volume FLOAT
+            )
+        """)
+        cursor.execute(f"CREATE TEMP TABLE tradingview_staging (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+        cursor.copy_expert(f"COPY tradingview_staging ({', '.join(CANDLE_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        cursor.execute(f"""
+            INSERT INTO {table} ({', '.join(CANDLE_COLUMNS)})
+            SELECT {', '.join(CANDLE_COLUMNS)} FROM tradingview_staging
+            ON CONFLICT (timestamp) {conflict}
+        """)
+        inserted = cursor.rowcount
+        connection.commit()
+        return inserted
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+# Import every export in a directory into the per-exchange databases
+# database_uri_template takes {exchange}, the database name from EXCHANGE_DB_NAMES; one engine is kept per exchange
+def import_directory(directory, database_uri_template=DB_URI_TEMPLATE, replace_existing=False, pattern=CSV_PATTERN):
+    engines = {}
+    imported = []
+    for file_path in sorted(glob.glob(os.path.join(directory, pattern))):
+        try:
+            exchange, table_name = export_table_name(file_path)
+            candles = read_export_candles(file_path)
+            if exchange not in engines:
+                engines[exchange] = create_engine(database_uri_template.format(exchange=exchange))
+            written = copy_candles(engines[exchange], table_name, candles, replace_existing)
+        except Exception as e:
+            print(f"Error importing {file_path}: {e}")
+            continue
+        print(f"{os.path.basename(file_path)} -> {table_name}: {len(candles)} rows read, {written} written")
+        imported.append(table_name)
+    for engine in engines.values():
+        engine.dispose()
+    print(f"Imported {len(imported)} exports")
+    return imported
+
+
+if __name__ == "__main__":
+    directory = sys.argv[1] if len(sys.argv) > 1 else '../tradingview_csv_processors'
+    import_directory(directory, DB_URI_TEMPLATE)
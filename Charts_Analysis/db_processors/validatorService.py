@@ -0,0 +1,203 @@
+import json
+import os
+import shlex
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from alignHelpers import *
+from candleSeries import *
+from jobLedger import table_max_timestamp
+from exchangeNames import *
+
+VALIDATOR_CACHE_DIR = "validator_cache"
+
+PAIR_COLUMNS = ('timestamp', 'low_opportunity', 'high_opportunity', 'low_liquid', 'high_liquid',
+                'volume_opportunity', 'low_diff_pct', 'high_diff_pct')
+# Columns printed/exported for each indexed difference, same layout as the validator scripts
+QUERY_COLUMNS = {
+    'low_diff_pct': ['timestamp', 'low_opportunity', 'low_liquid', 'volume_opportunity', 'low_diff_pct'],
+    'high_diff_pct': ['timestamp', 'high_opportunity', 'high_liquid', 'volume_opportunity', 'high_diff_pct'],
+}
+
+# One aligned (opportunity, liquid) pair held as column arrays, time-ordered, with a sorted index per difference column
+class AlignedPair:
+    def __init__(self, name, columns, sorted_positions, sorted_values=None):
+        self.name = name
+        self.columns = columns
+        self.sorted_positions = sorted_positions
+        self.sorted_values = sorted_values or {col: columns[col][positions] for col, positions in sorted_positions.items()}
+
+    def __len__(self):
+        return len(self.columns['timestamp'])
+
+    @classmethod
+    def build(cls, name, opportunity, liquid, tolerance_ms=ALIGN_TOLERANCE_MS):
+        columns = align_columns(opportunity.timestamp,
+                                {'low_opportunity': opportunity.low, 'high_opportunity': opportunity.high,
+                                 'volume_opportunity': opportunity.volume},
+                                liquid.timestamp,
+                                {'low_liquid': liquid.low, 'high_liquid': liquid.high},
+                                tolerance_ms)
+        columns['low_diff_pct'] = (columns['low_opportunity'] - columns['low_liquid']) / columns['low_liquid'] * 100
+        columns['high_diff_pct'] = (columns['high_opportunity'] - columns['high_liquid']) / columns['high_liquid'] * 100
+        columns = {col: np.ascontiguousarray(columns[col]) for col in PAIR_COLUMNS}
+
+        # NaN differences never match a threshold, so they are left out of the index
+        sorted_positions = {}
+        for col in QUERY_COLUMNS:
+            valid = np.flatnonzero(~np.isnan(columns[col]))
+            sorted_positions[col] = valid[np.argsort(columns[col][valid], kind='stable')]
+        return cls(name, columns, sorted_positions)
+
+    def save(self, directory, meta):
+        os.makedirs(directory, exist_ok=True)
+        for col, values in self.columns.items():
+            np.save(os.path.join(directory, f"{col}.npy"), values)
+        for col, positions in self.sorted_positions.items():
+            np.save(os.path.join(directory, f"{col}.order.npy"), positions)
+            np.save(os.path.join(directory, f"{col}.sorted.npy"), self.sorted_values[col])
+        with open(os.path.join(directory, "meta.json"), 'w') as f:
+            json.dump(meta, f)
+
+    # Columns are memory-mapped, so reopening a cached pair costs only the page-ins a query touches
+    @classmethod
+    def open(cls, name, directory):
+        columns = {col: np.load(os.path.join(directory, f"{col}.npy"), mmap_mode='r') for col in PAIR_COLUMNS}
+        sorted_positions = {col: np.load(os.path.join(directory, f"{col}.order.npy"), mmap_mode='r') for col in QUERY_COLUMNS}
+        sorted_values = {col: np.load(os.path.join(directory, f"{col}.sorted.npy"), mmap_mode='r') for col in QUERY_COLUMNS}
+        return cls(name, columns, sorted_positions, sorted_values)
+
+    # All minutes where column <= value (op '<=') or >= value (op '>='), optionally inside [start, end], in time order
+    def query(self, column, op, value, start=None, end=None):
+        if column not in self.sorted_positions:
+            raise ValueError(f"Unknown column '{column}' - Expected one of {list(self.sorted_positions)}")
+        sorted_values = self.sorted_values[column]
+        if op == '<=':
+            hits = self.sorted_positions[column][:np.searchsorted(sorted_values, value, side='right')]
+        elif op == '>=':
+            hits = self.sorted_positions[column][np.searchsorted(sorted_values, value, side='left'):]
+        else:
+            raise ValueError(f"Unknown operator '{op}' - Expected '<=' or '>='")
+
+        hits = np.sort(hits)
+        timestamps = self.columns['timestamp'][hits]
+        keep = np.ones(len(hits), dtype=bool)
+        if start is not None:
+            keep &= timestamps >= to_epoch_ms(start)
+        if end is not None:
+            keep &= timestamps <= to_epoch_ms(end)
+        hits = hits[keep]
+
+        data = {col: np.asarray(self.columns[col][hits]) for col in QUERY_COLUMNS[column]}
+        data['timestamp'] = data['timestamp'].view('datetime64[ms]')
+        return pd.DataFrame(data, copy=False)
+
+# Keeps aligned pairs resident for the session and on disk between sessions
+# A disk entry is reused while both source tables still end at the same timestamp inside the window
+class ValidatorService:
+    def __init__(self, cache_dir=VALIDATOR_CACHE_DIR, uri_template=DB_URI_TEMPLATE):
+        self.cache_dir = cache_dir
+        self.uri_template = uri_template
+        self.pairs = {}
+        self._engines = {}
+
+    def _engine(self, table_name, uri=None):
+        uri = uri or exchange_uri(table_name, self.uri_template)
+        if uri not in self._engines:
+            self._engines[uri] = create_engine(uri)
+        return self._engines[uri]
+
+    @staticmethod
+    def pair_name(opportunity_table, liquid_table, start=None, end=None):
+        window = '_'.join(str(to_epoch_ms(value)) if value is not None else 'all' for value in (start, end))
+        return f"{opportunity_table}__{liquid_table}__{window}"
+
+    # Database URIs default to the Testing_Data_Collection_<Exchange> database named by the table prefix
+    def pair(self, opportunity_table, liquid_table, start=None, end=None, opportunity_uri=None, liquid_uri=None):
+        name = self.pair_name(opportunity_table, liquid_table, start, end)
+        if name in self.pairs:
+            return self.pairs[name]
+
+        opportunity_engine = self._engine(opportunity_table, opportunity_uri)
+        liquid_engine = self._engine(liquid_table, liquid_uri)
+        meta = {
+            'opportunity_max_ts': table_max_timestamp(opportunity_engine, opportunity_table, end),
+            'liquid_max_ts': table_max_timestamp(liquid_engine, liquid_table, end),
+        }
+
+        directory = os.path.join(self.cache_dir, name)
+        meta_path = os.path.join(directory, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                if json.load(f) == meta:
+                    print(f"Opening cached pair {name}")
+                    self.pairs[name] = AlignedPair.open(name, directory)
+                    return self.pairs[name]
+
+        print(f"Loading {opportunity_table} and {liquid_table}")
+        opportunity = CandleSeries.load(opportunity_engine, opportunity_table, start, end, min_volume=0)
+        liquid = CandleSeries.load(liquid_engine, liquid_table, start, end, min_volume=0)
+        pair = AlignedPair.build(name, opportunity, liquid)
+        pair.save(directory, meta)
+        self.pairs[name] = pair
+        return pair
+
+    def query(self, opportunity_table, liquid_table, column, op, value, start=None, end=None, opportunity_uri=None, liquid_uri=None):
+        return self.pair(opportunity_table, liquid_table, start, end, opportunity_uri, liquid_uri).query(column, op, value)
+
+# Interactive session over one service; every pair stays resident until the session ends
+REPL_HELP = """Commands:
+  use <opportunity_table> <liquid_table> [start] [end]   load/select a pair (dates like 2025-05-01 or "2025-05-01 12:00")
+  low <= <pct> [start] [end]                            minutes where low_diff_pct <= pct
+  high >= <pct> [start] [end]                           minutes where high_diff_pct >= pct
+  export <file.csv>                                     write the last result to CSV
+  pairs                                                 list resident pairs
+  quit"""
+
+def run_repl(service):
+    current = None
+    last_result = None
+    print(REPL_HELP)
+    while True:
+        try:
+            line = input("validator> ").strip()
+        except EOFError:
+            break
+        if not line:
+            continue
+        try:
+            args = shlex.split(line)
+            command = args[0].lower()
+            if command in ('quit', 'exit'):
+                break
+            elif command == 'use' and len(args) >= 3:
+                start = pd.to_datetime(args[3]) if len(args) > 3 else None
+                end = pd.to_datetime(args[4]) if len(args) > 4 else None
+                current = service.pair(args[1], args[2], start, end)
+                print(f"{current.name}: {len(current)} aligned rows")
+            elif command in ('low', 'high') and len(args) >= 3:
+                if current is None:
+                    print("No pair selected - use 'use <opportunity_table> <liquid_table>' first")
+                    continue
+                start = pd.to_datetime(args[3]) if len(args) > 3 else None
+                end = pd.to_datetime(args[4]) if len(args) > 4 else None
+                last_result = current.query(f"{command}_diff_pct", args[1], float(args[2]), start, end)
+                print(last_result.to_string(index=False))
+                print(f"{len(last_result)} matching records")
+            elif command == 'export' and len(args) == 2:
+                if last_result is None:
+                    print("Nothing to export yet")
+                    continue
+                last_result.to_csv(args[1], index=False)
+                print(f"Exported {len(last_result)} records to {args[1]}")
+            elif command == 'pairs':
+                for name, pair in service.pairs.items():
+                    print(f"  {name}: {len(pair)} rows")
+            else:
+                print(REPL_HELP)
+        except Exception as e:
+            print(f"Error: {e}")
+
+
+if __name__ == "__main__":
+    run_repl(ValidatorService())
@@ -0,0 +1,155 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from alignHelpers import *
+from candleSeries import *
+from resultSink import *
+from parameterGrid import GridPair
+from distributionBatch import catalogue_pairs
+
+DAY_MS = 86_400_000
+# Sizes above this are counted in the top rung, so one bad candle cannot blow up the ladder
+MAX_RUNG_PCT = 100
+# Keeps a size that lands exactly on a rung in that rung despite float rounding
+RUNG_EPSILON = 1e-6
+
+# counts[day, rung] = rows of that day whose size is >= rung (threshold + rung * step)
+# One bincount over (day, rung) cells plus a reverse cumulative sum along the rungs
+def daily_rung_counts(day_index, sizes, n_days, threshold, step):
+    n_rungs = int(round((MAX_RUNG_PCT - threshold) / step)) + 1
+    keep = sizes >= threshold - RUNG_EPSILON
+    rungs = np.minimum(((sizes[keep] - threshold) / step + RUNG_EPSILON).astype(np.int64), n_rungs - 1)
+    cells = np.bincount(day_index[keep] * n_rungs + rungs, minlength=n_days * n_rungs).reshape(n_days, n_rungs)
+    return np.cumsum(cells[:, ::-1], axis=1)[:, ::-1]
+
+# Rolling folds: pick the best rung on train_days, score that rung on the next test_days, move on by test_days
+# Every fold is computed at once from cumulative sums over the day axis
+def walk_forward_side(counts, ladder, train_days, test_days):
+    n_days = counts.shape[0]
+    fold_starts = np.arange(0, n_days - train_days - test_days + 1, test_days)
+    if len(fold_starts) == 0:
+        return None
+    cumulative = np.concatenate((np.zeros((1, counts.shape[1]), dtype=np.int64), np.cumsum(counts, axis=0)))
+
+    train_counts = cumulative[fold_starts + train_days] - cumulative[fold_starts]
+    test_counts = cumulative[fold_starts + train_days + test_days] - cumulative[fold_starts + train_days]
+    train_monthly = ladder * train_counts * (30 / train_days)
+    best = np.argmax(train_monthly, axis=1)
+    folds = np.arange(len(fold_starts))
+    return {
+        'fold_start_day': fold_starts,
+        'best_bin_pct': ladder[best],
+        'train_count': train_counts[folds, best],
+        'train_monthly_return_pct': train_monthly[folds, best],
+        'test_count': test_counts[folds, best],
+        'test_monthly_return_pct': ladder[best] * test_counts[folds, best] * (30 / test_days),
+    }
+
+# Walk-forward folds of both sides of one aligned pair, as a DataFrame with one row per fold and side
+def walk_forward(pair, train_days=30, test_days=7, threshold=0.5, step=0.1):
+    if len(pair.timestamp) == 0:
+        return pd.DataFrame()
+    first_day = pair.timestamp[0] // DAY_MS * DAY_MS
+    day_index = (pair.timestamp - first_day) // DAY_MS
+    n_days = int(day_index[-1]) + 1
+    ladder = threshold + step * np.arange(int(round((MAX_RUNG_PCT - threshold) / step)) + 1)
+
+    frames = []
+    for side, sizes in (('buy', pair.buy_size), ('sell', pair.sell_size)):
+        valid = ~np.isnan(sizes)
+        counts = daily_rung_counts(day_index[valid], sizes[valid], n_days, threshold, step)
+        folds = walk_forward_side(counts, ladder, train_days, test_days)
+        if folds is None:
+            continue
+        frame = pd.DataFrame(folds)
+        day_start = first_day + frame.pop('fold_start_day').to_numpy() * DAY_MS
+        frame.insert(0, 'side', side)
+        frame.insert(1, 'train_start', pd.to_datetime(day_start, unit='ms'))
+        frame.insert(2, 'test_start', pd.to_datetime(day_start + train_days * DAY_MS, unit='ms'))
+        frame.insert(3, 'test_end', pd.to_datetime(day_start + (train_days + test_days) * DAY_MS - 1, unit='ms'))
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+# Per-side summary of the folds: out-of-sample return next to the in-sample one it was picked on
+def summarize_folds(folds):
+    summary = {}
+    for side in ('buy', 'sell'):
+        side_folds = folds[folds['side'] == side] if not folds.empty else folds
+        if side_folds.empty:
+            continue
+        train = side_folds['train_monthly_return_pct'].mean()
+        test = side_folds['test_monthly_return_pct'].mean()
+        summary[f'{side}_folds'] = len(side_folds)
+        summary[f'{side}_train_monthly_return_pct'] = train
+        summary[f'{side}_test_monthly_return_pct'] = test
+        summary[f'{side}_test_to_train_ratio'] = test / train if train else np.nan
+        summary[f'{side}_folds_with_trades'] = int((side_folds['test_count'] > 0).sum())
+    return summary
+
+# One pair, run in a worker process: engines are created here from the URIs
+def pair_walk_forward(opportunity_database_uri, opportunity_table, liquid_database_uri, liquid_table,
+                      start, end, train_days, test_days, threshold, step):
+    pair = GridPair.load(create_engine(opportunity_database_uri), opportunity_table,
+                         create_engine(liquid_database_uri), liquid_table, start, end)
+    folds = walk_forward(pair, train_days, test_days, threshold, step)
+    if folds.empty:
+        return None, None
+    folds.insert(0, 'opportunity_table', opportunity_table)
+    folds.insert(1, 'liquid_table', liquid_table)
+    summary = {'opportunity_table': opportunity_table, 'liquid_table': liquid_table, **summarize_folds(folds)}
+    return folds, summary
+
+# Walk-forward every catalogued pair in parallel; folds go to a CSV log as pairs finish, plus a ranked summary
+def run_batch(opportunity_database_uri, liquid_database_uri, opportunity_quote_asset, liquid_quote_asset,
+              start, end, train_days=30, test_days=7, threshold=0.5, step=0.1, timeframe='1m',
+              folds_log="walk_forward_folds.csv", summary_file="walk_forward_summary.csv", max_workers=None):
+    pairs = catalogue_pairs(opportunity_database_uri, liquid_database_uri, opportunity_quote_asset, liquid_quote_asset, timeframe)
+    print(f"Found {len(pairs)} pairs to walk forward")
+
+    summaries = []
+    with ResultSink(folds_log) as sink, ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        futures = {
+            executor.submit(pair_walk_forward, opportunity_database_uri, opportunity_table, liquid_database_uri, liquid_table,
+                            start, end, train_days, test_days, threshold, step): opportunity_table
+            for opportunity_table, liquid_table in pairs
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            opportunity_table = futures[future]
+            try:
+                folds, summary = future.result()
+            except Exception as e:
+                print(f"Error walking forward {opportunity_table}: {e}")
+                continue
+            if summary:
+                for row in folds.to_dict('records'):
+                    sink.append(row)
+                summaries.append(summary)
+            print(f"Processed {done}/{len(pairs)} pairs ({opportunity_table})")
+
+    summary_df = pd.DataFrame(summaries)
+    if summary_df.empty:
+        print("No pair had enough days for a single fold.")
+        return summary_df
+    rank_columns = [col for col in ('buy_test_monthly_return_pct', 'sell_test_monthly_return_pct') if col in summary_df]
+    summary_df['best_test_monthly_return_pct'] = summary_df[rank_columns].max(axis=1)
+    summary_df = summary_df.sort_values('best_test_monthly_return_pct', ascending=False)
+    summary_df.to_csv(summary_file, index=False)
+    print(f"Walk-forward summary of {len(summary_df)} pairs saved to {summary_file}")
+    return summary_df
+
+
+if __name__ == "__main__":
+    opportunity_exchange_string = 'Kraken'
+    liquid_exchange_string = 'Bitget'
+    opportunity_quote_asset = 'usd'
+    liquid_quote_asset = 'usdt'
+
+    opportunity_database_uri = f"postgresql+psycopg2://postgres:@localhost:5432/Testing_Data_Collection_{opportunity_exchange_string}"
+    liquid_database_uri = f"postgresql+psycopg2://postgres:@localhost:5432/Testing_Data_Collection_{liquid_exchange_string}"
+    start = pd.to_datetime("2025-01-01 00:00:00")
+    end = pd.to_datetime("2025-12-31 23:59:59")
+
+    run_batch(opportunity_database_uri, liquid_database_uri, opportunity_quote_asset, liquid_quote_asset,
+              start, end, train_days=30, test_days=7)
@@ -1,63 +1,89 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 from sqlalchemy import create_engine, text
 
-# User input section — fill these in
-db_uri = "postgresql+psycopg2://postgres:@localhost:5432/Testing_Data_Collection_Binance"
-table_name = 'binance_sui_usdc:usdc_1m'  # Include colon if needed
-target_timestamp = 1750359900000         # Timestamp in milliseconds
-search_window_ms = 0                 # Look ± this many milliseconds (default: 1 minute)
-
-# Create engine and connect
-engine = create_engine(db_uri)
-
-def query_nearest_record(table, target_ts, window):
-    quoted_table = f'"{table}"'  # Ensure colon table names work
-
-    query = f"""
-    SELECT 
-        *, 
-        to_timestamp("timestamp" / 1000.0) AS human_time,
-        ABS("timestamp" - :target_ts) AS time_diff
-    FROM {quoted_table}
-    WHERE "timestamp" BETWEEN :start_ts AND :end_ts
-    ORDER BY time_diff
-    LIMIT 5;
-    """
+# Database names per exchange are shared with the analyzers (db_processors/exchangeNames.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'db_processors'))
+from exchangeNames import *
 
+# Each exchange has its own database; tables are named exchange_base_quote_tf (perps keep the colon, e.g. binance_sui_usdc:usdc_1m)
+DATABASE_URI_TEMPLATE = DB_URI_TEMPLATE
+CANDLE_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+# One engine per database, shared by every lookup and worker thread
+_engines = {}
+
+def get_engine(database_uri):
+    if database_uri not in _engines:
+        _engines[database_uri] = create_engine(database_uri)
+    return _engines[database_uri]
+
+def database_uri_for_table(table_name, uri_template=DATABASE_URI_TEMPLATE):
+    return exchange_uri(table_name, uri_template)
+
+# Up to count candles closest to target_ts (ms), optionally within ± window_ms
+# Two ordered LIMIT probes on the primary key, one each side of the target, instead of sorting the window by ABS(timestamp - ts)
+def nearest_candles(engine, table_name, target_ts, window_ms=None, count=1):
+    columns = ', '.join(f'"{column}"' for column in CANDLE_COLUMNS)
+    # Without a window the bound predicate is left out entirely rather than compared to sentinel values
+    before_bound = ' AND "timestamp" >= :bound' if window_ms is not None else ''
+    after_bound = ' AND "timestamp" <= :bound' if window_ms is not None else ''
+    before = text(f'SELECT {columns} FROM "{table_name}" WHERE "timestamp" <= :ts{before_bound} '
+                  f'ORDER BY "timestamp" DESC LIMIT :n')
+    after = text(f'SELECT {columns} FROM "{table_name}" WHERE "timestamp" > :ts{after_bound} '
+                 f'ORDER BY "timestamp" ASC LIMIT :n')
+    before_params = {'ts': int(target_ts), 'n': count}
+    after_params = {'ts': int(target_ts), 'n': count}
+    if window_ms is not None:
+        before_params['bound'] = int(target_ts - window_ms)
+        after_params['bound'] = int(target_ts + window_ms)
     with engine.connect() as conn:
-        result = pd.read_sql_query(
-            text(query), 
-            conn,
-            params={
-                "target_ts": target_ts,
-                "start_ts": target_ts - window,
-                "end_ts": target_ts + window
-            }
-        )
-    
+        rows = conn.execute(before, before_params).fetchall()
+        rows += conn.execute(after, after_params).fetchall()
+
+    candles = pd.DataFrame(rows, columns=CANDLE_COLUMNS)
+    candles['diff_ms'] = candles['timestamp'] - int(target_ts)
+    candles = candles.iloc[candles['diff_ms'].abs().argsort(kind='stable')].head(count)
+    candles.insert(1, 'time', pd.to_datetime(candles['timestamp'], unit='ms'))
+    return candles.reset_index(drop=True)
+
+# The same moment on many venues at once: one thread per table, results in the order the tables were given
+# tables: table names (database from the exchange prefix) or (database_uri, table_name) pairs
+def lookup_venues(tables, target_time, window_ms=None, count=1, uri_template=DATABASE_URI_TEMPLATE, max_workers=None):
+    target_ts = int(pd.Timestamp(target_time).value // 1_000_000)
+    targets = [table if isinstance(table, tuple) else (database_uri_for_table(table, uri_template), table) for table in tables]
+
+    def lookup(target):
+        database_uri, table_name = target
+        try:
+            candles = nearest_candles(get_engine(database_uri), table_name, target_ts, window_ms, count)
+        except Exception as e:
+            print(f"Error looking up {table_name}: {e}")
+            return None
+        candles.insert(0, 'table', table_name)
+        return candles
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(targets) or 1) as executor:
+        frames = [frame for frame in executor.map(lookup, targets) if frame is not None]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['table', 'timestamp', 'time', *CANDLE_COLUMNS[1:], 'diff_ms'])
+
+
+# Usage: python SQLlookup.py "2025-06-13 00:02:00" binance_sui_usdc:usdc_1m kraken_sui_usd_1m bitget_sui_usdt_1m --window 600
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Nearest candle to a time on one or more exchange tables")
+    parser.add_argument('time', help="target time, e.g. '2025-06-13 00:02:00' (UTC)")
+    parser.add_argument('tables', nargs='+', help="tables named exchange_base_quote_tf")
+    parser.add_argument('--window', type=float, default=None, help="only candles within ± this many seconds")
+    parser.add_argument('--count', type=int, default=1, help="candles to return per table")
+    parser.add_argument('--uri-template', default=DATABASE_URI_TEMPLATE, help="database URI with an {exchange} placeholder")
+    args = parser.parse_args()
+
+    window_ms = int(args.window * 1000) if args.window is not None else None
+    result = lookup_venues(args.tables, args.time, window_ms, args.count, args.uri_template)
     if result.empty:
-        print(f"No records found ±{window // 1000} seconds from timestamp {target_ts}")
+        print(f"No candles found near {args.time}")
     else:
-        print(f"Top {len(result)} rows closest to {target_ts} (±{window // 1000}s):\n")
-        print(result)
-
-def find_candle(uri, table, dt, window_sec=60):
-    engine = create_engine(uri)
-    ts_ms = int(pd.to_datetime(dt).value // 10**6)
-    with engine.connect() as conn:
-        rows = conn.execute(text(f'''
-        SELECT "timestamp", to_timestamp("timestamp"/1000) AS ts,
-               low, high, open, close, volume,
-               ABS("timestamp" - :ts) AS diff_ms
-        FROM "{table}"
-        WHERE "timestamp" BETWEEN :ts - :win AND :ts + :win
-        ORDER BY diff_ms LIMIT 5
-        '''), {"ts": ts_ms, "win": window_sec * 1000}).fetchall()
-    for r in rows:
-        print(r)
-
-# Run the query
-query_nearest_record(table_name, target_timestamp, search_window_ms)
-
-# Usage
-find_candle(db_uri, table_name, "2025-06-13 00:02:00", window_sec=600)
+        print(result.to_string(index=False))
@@ -1,11 +1,12 @@
 import ccxt
 
+# timeframes is static exchange metadata, so no load_markets round trip is needed
+# (scraper_bots/exchange_registry.py stores it with the markets for every exchange)
 def supports_1s(exchange_id):
     try:
         exchange_class = getattr(ccxt, exchange_id)
         exchange = exchange_class({'enableRateLimit': True})
-        exchange.load_markets()
-        return '1s' in getattr(exchange, 'timeframes', {})
+        return '1s' in (getattr(exchange, 'timeframes', None) or {})
     except Exception as e:
         return False
 
@@ -4,6 +4,7 @@ from psycopg2 import sql
 import logging
 import time
 from config import *
+from exchange_registry import cached_markets
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -133,7 +134,7 @@ def main():
 
         try:
             # List of markets to update
-            markets = exchange.load_markets()
+            markets = cached_markets(exchange)
 
             for symbol in markets:
                 # Create table for the market if it doesn't exist
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import ccxt
+import ccxt.async_support as ccxt_async
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# One JSON file per exchange, so scrapers of different exchanges never write the same file
+REGISTRY_DIR = "exchange_registry"
+# Markets older than this are reloaded from the exchange; new listings show up within this delay
+MAX_AGE_SECONDS = 6 * 60 * 60
+# Exchanges probed at once by refresh_registry, and how long one probe may take
+PROBE_CONCURRENCY = 20
+PROBE_TIMEOUT_SECONDS = 60
+# Seconds between scheduled refreshes when run with --loop
+REFRESH_SECONDS = 6 * 60 * 60
+
+# Time the markets held in memory by each exchange instance were loaded or restored
+_markets_loaded_at = {}
+
+def registry_path(exchange_id):
+    return os.path.join(REGISTRY_DIR, f"{exchange_id}.json")
+
+# Capabilities and market metadata of a loaded exchange instance (sync or async)
+# Markets are kept whole, 'info' included, so set_markets restores exactly what load_markets produced
+def build_entry(exchange):
+    return {
+        'id': exchange.id,
+        'updated_at': time.time(),
+        'timeframes': sorted(getattr(exchange, 'timeframes', None) or {}),
+        'rate_limit_ms': exchange.rateLimit,
+        'precision_mode': exchange.precisionMode,
+        'has': sorted(name for name, supported in exchange.has.items() if supported),
+        'markets': exchange.markets,
+        'currencies': exchange.currencies or {},
+    }
+
+def save_entry(entry):
+    os.makedirs(REGISTRY_DIR, exist_ok=True)
+    tmp_path = f"{registry_path(entry['id'])}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(entry, f, default=str)
+    os.replace(tmp_path, registry_path(entry['id']))
+
+# Stored entry, or None if it is missing, unreadable or older than max_age_seconds
+def load_entry(exchange_id, max_age_seconds=None):
+    try:
+        with open(registry_path(exchange_id)) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if max_age_seconds is not None and time.time() - entry['updated_at'] > max_age_seconds:
+        return None
+    return entry
+
+# Smallest price increment of a stored market, whatever precision mode the exchange reports in
+def tick_size(entry, symbol):
+    price_precision = entry['markets'][symbol]['precision'].get('price')
+    if price_precision is None:
+        return None
+    if entry['precision_mode'] == ccxt.TICK_SIZE:
+        return float(price_precision)
+    return 10 ** -float(price_precision)
+
+def contract_size(entry, symbol):
+    return entry['markets'][symbol].get('contractSize')
+
+# Drop-in for exchange.load_markets() in the scraper loops
+# Markets in memory are reused until max_age_seconds, then replaced by the stored entry if the scheduled refresh
+# (python exchange_registry.py --loop) kept it fresh; only a stale registry costs a load_markets round trip
+def cached_markets(exchange, max_age_seconds=MAX_AGE_SECONDS):
+    loaded_at = _markets_loaded_at.get(id(exchange))
+    if exchange.markets and loaded_at and time.time() - loaded_at <= max_age_seconds:
+        return exchange.markets
+
+    entry = load_entry(exchange.id, max_age_seconds)
+    if entry is not None and (loaded_at is None or entry['updated_at'] > loaded_at):
+        exchange.set_markets(list(entry['markets'].values()), entry['currencies'] or None)
+        _markets_loaded_at[id(exchange)] = entry['updated_at']
+        logging.info(f"Loaded {len(exchange.markets)} {exchange.id} markets from {registry_path(exchange.id)}")
+        return exchange.markets
+
+    markets = exchange.load_markets(reload=True)
+    _markets_loaded_at[id(exchange)] = time.time()
+    try:
+        save_entry(build_entry(exchange))
+    except OSError as e:
+        logging.error(f"Error saving {exchange.id} to the registry: {e}")
+    return markets
+
+async def probe_exchange(exchange_id, semaphore):
+    async with semaphore:
+        exchange = None
+        try:
+            exchange = getattr(ccxt_async, exchange_id)({'enableRateLimit': True})
+            await asyncio.wait_for(exchange.load_markets(reload=True), PROBE_TIMEOUT_SECONDS)
+            save_entry(build_entry(exchange))
+            return exchange_id, None
+        except Exception as e:
+            return exchange_id, e
+        finally:
+            if exchange is not None:
+                await exchange.close()
+
+# Probe many exchanges concurrently; a failed probe keeps the previous entry
+async def refresh_registry(exchange_ids=None, concurrency=PROBE_CONCURRENCY):
+    exchange_ids = exchange_ids or ccxt.exchanges
+    semaphore = asyncio.Semaphore(concurrency)
+    results = await asyncio.gather(*(probe_exchange(exchange_id, semaphore) for exchange_id in exchange_ids))
+    failed = {exchange_id: error for exchange_id, error in results if error is not None}
+    for exchange_id, error in failed.items():
+        logging.error(f"Error probing {exchange_id}: {error}")
+    logging.info(f"Refreshed {len(results) - len(failed)}/{len(results)} exchanges in {REGISTRY_DIR}")
+    return failed
+
+# Usage: python exchange_registry.py [--loop] [exchange ...]  (all ccxt exchanges by default)
+async def main(exchange_ids=None, loop=False):
+    while True:
+        await refresh_registry(exchange_ids)
+        if not loop:
+            break
+        await asyncio.sleep(REFRESH_SECONDS)
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    asyncio.run(main([arg for arg in args if arg != '--loop'] or None, loop='--loop' in args))
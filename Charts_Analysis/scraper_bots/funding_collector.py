@@ -0,0 +1,168 @@
+import ccxt
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+import logging
+import time
+from config import *
+from exchange_registry import cached_markets
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Exchange to collect; the rows land in the same database as its 1m candles (<EXCHANGE>_DB_* in config)
+EXCHANGE_ID = 'binance'
+PRICE_TIMEFRAME = '1m'
+# History fetched for a market that has no rows yet
+INITIAL_LOOKBACK_DAYS = 90
+# Markets are reloaded every few hours instead of on every pass
+MARKETS_REFRESH_SECONDS = 6 * 60 * 60
+SLEEP_SECONDS = 15 * 60
+
+# Initialize the exchange
+exchange = getattr(ccxt, EXCHANGE_ID)({
+    'enableRateLimit': True
+})
+
+# Connect to PostgreSQL database with retries
+def connect_to_db(retries=5, delay=5):
+    prefix = EXCHANGE_ID.upper()
+    attempt = 0
+    while attempt < retries:
+        try:
+            conn = psycopg2.connect(
+                host=globals()[f"{prefix}_DB_HOST"],
+                database=globals()[f"{prefix}_DB_NAME"],
+                user=globals()[f"{prefix}_DB_USER"],
+                password=globals()[f"{prefix}_DB_PASSWORD"]
+            )
+            return conn
+        except psycopg2.Error as e:
+            attempt += 1
+            logging.error(f"Error connecting to the database: {e}. Retrying {attempt}/{retries}...")
+            time.sleep(delay)
+    raise Exception("Failed to connect to the database after multiple attempts.")
+
+# Table names next to the futures candles, e.g. binance_btc_usdt:usdt_funding / _mark1m / _index1m
+# (read back by db_processors/fundingRates.py)
+def table_prefix(symbol):
+    return f"{EXCHANGE_ID}_{symbol.replace('/', '_').lower()}"
+
+# Create the funding and mark/index price tables for a market if they don't exist
+def create_tables_for_market(cursor, prefix):
+    try:
+        cursor.execute(sql.SQL("""
+            CREATE TABLE IF NOT EXISTS {} (
+                timestamp BIGINT PRIMARY KEY,
+                funding_rate FLOAT
+            )
+        """).format(sql.Identifier(f"{prefix}_funding")))
+        for kind in ('mark', 'index'):
+            cursor.execute(sql.SQL("""
+                CREATE TABLE IF NOT EXISTS {} (
+                    timestamp BIGINT PRIMARY KEY,
+                    open FLOAT,
+                    high FLOAT,
+                    low FLOAT,
+                    close FLOAT,
+                    volume FLOAT
+                )
+            """).format(sql.Identifier(f"{prefix}_{kind}{PRICE_TIMEFRAME}")))
+    except psycopg2.Error as e:
+        logging.error(f"Error creating tables for {prefix}: {e}")
+        raise
+
+# Resume point of a table: one past its newest row, or the initial lookback for a new market
+def next_since(cursor, table_name):
+    cursor.execute(sql.SQL("SELECT MAX(timestamp) FROM {}").format(sql.Identifier(table_name)))
+    last = cursor.fetchone()[0]
+    if last is not None:
+        return int(last) + 1
+    return exchange.milliseconds() - INITIAL_LOOKBACK_DAYS * 86_400_000
+
+# Write a batch of rows in one statement; rows already stored are left untouched
+def bulk_insert(cursor, table_name, columns, rows):
+    if not rows:
+        return
+    execute_values(cursor, sql.SQL("INSERT INTO {} ({}) VALUES %s ON CONFLICT (timestamp) DO NOTHING").format(
+        sql.Identifier(table_name), sql.SQL(', ').join(map(sql.Identifier, columns))).as_string(cursor), rows, page_size=1000)
+
+# Page through the funding rate history from the last stored settlement
+def collect_funding(cursor, symbol, table_name, limit=1000):
+    since = next_since(cursor, table_name)
+    total = 0
+    while True:
+        history = exchange.fetch_funding_rate_history(symbol, since=since, limit=limit)
+        rows = [(entry['timestamp'], entry['fundingRate']) for entry in history
+                if entry.get('timestamp') is not None and entry['timestamp'] >= since]
+        bulk_insert(cursor, table_name, ('timestamp', 'funding_rate'), rows)
+        total += len(rows)
+        if not rows:
+            break
+        since = max(row[0] for row in rows) + 1
+    logging.info(f"Inserted {total} funding settlements for {symbol}.")
+
+# Page through mark or index candles from the last stored candle
+def collect_prices(cursor, symbol, table_name, kind, limit=1000):
+    since = next_since(cursor, table_name)
+    total = 0
+    while True:
+        candles = exchange.fetch_ohlcv(symbol, PRICE_TIMEFRAME, since=since, limit=limit, params={'price': kind})
+        rows = [tuple(candle[:6]) for candle in candles if candle[0] >= since]
+        bulk_insert(cursor, table_name, ('timestamp', 'open', 'high', 'low', 'close', 'volume'), rows)
+        total += len(rows)
+        if not rows:
+            break
+        since = rows[-1][0] + 1
+    logging.info(f"Inserted {total} {kind} candles for {symbol}.")
+
+# Collect one market, retrying network errors and skipping it on exchange errors
+def collect_market(cursor, symbol, max_retries=5):
+    prefix = table_prefix(symbol)
+    create_tables_for_market(cursor, prefix)
+    retries = 0
+    while retries < max_retries:
+        try:
+            if exchange.has.get('fetchFundingRateHistory'):
+                collect_funding(cursor, symbol, f"{prefix}_funding")
+            for kind, capability in (('mark', 'fetchMarkOHLCV'), ('index', 'fetchIndexOHLCV')):
+                if exchange.has.get(capability):
+                    collect_prices(cursor, symbol, f"{prefix}_{kind}{PRICE_TIMEFRAME}", kind)
+            break
+        except ccxt.NetworkError as e:
+            retries += 1
+            logging.error(f"Network error collecting {symbol}: {e}. Retrying {retries}/{max_retries}...")
+            time.sleep(5)
+        except ccxt.ExchangeError as e:
+            logging.error(f"Exchange error for {symbol}: {e}. Skipping this market.")
+            break
+        except psycopg2.Error as e:
+            logging.error(f"Database error writing {symbol}: {e}")
+            raise
+
+# Main function to continuously update the funding and mark/index tables of every perpetual
+def main():
+    while True:
+        conn = connect_to_db()
+        cursor = conn.cursor()
+
+        try:
+            markets = cached_markets(exchange, MARKETS_REFRESH_SECONDS)
+            perpetuals = [symbol for symbol, market in markets.items() if market.get('swap')]
+
+            for symbol in perpetuals:
+                collect_market(cursor, symbol)
+                conn.commit()
+
+            logging.info(f"Completed one pass over {len(perpetuals)} perpetuals. Sleeping for {SLEEP_SECONDS // 60} minutes...")
+            time.sleep(SLEEP_SECONDS)
+
+        except Exception as e:
+            conn.rollback()
+            logging.error(f"Error in main execution: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+
+if __name__ == "__main__":
+    main()
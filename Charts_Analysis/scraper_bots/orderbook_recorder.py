@@ -0,0 +1,164 @@
+import asyncio
+import os
+import struct
+import time
+import zlib
+import logging
+import numpy as np
+import ccxt.pro as ccxtpro
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# (exchange id, symbol) pairs to record; one websocket client is shared per exchange
+MARKETS = [
+    ('kraken', 'ONDO/USD'),
+    ('kraken', 'PUMP/USD'),
+    ('binance', 'ONDO/USDT'),
+]
+DEPTH = 100
+ARCHIVE_ROOT = "orderbook_archive"
+# Buffered events are compressed and appended as one block this often; a crash loses at most one block
+FLUSH_SECONDS = 5
+HOUR_MS = 3_600_000
+
+# File layout, read back by db_processors/orderBookArchive.py:
+#   <ARCHIVE_ROOT>/<exchange>_<base>_<quote>/<YYYYMMDD_HH>.obk, one file per UTC hour, append-only
+#   every block = BLOCK_HEADER + zlib(events, levels, trades), and starts with a full snapshot (a keyframe)
+#   so any block decodes on its own; the headers alone give each block's time range for random access
+BLOCK_MAGIC = b'OBK1'
+BLOCK_HEADER = struct.Struct('<4sqqIIII')  # magic, first_ts, last_ts, n_events, n_levels, n_trades, payload bytes
+EVENT_DTYPE = np.dtype([('timestamp', '<i8'), ('kind', 'u1'), ('n_levels', '<u4')])  # kind 0 = snapshot, 1 = delta
+LEVEL_DTYPE = np.dtype([('side', 'u1'), ('price', '<f8'), ('amount', '<f8')])        # side 0 = bid, 1 = ask; amount 0 = level removed
+TRADE_DTYPE = np.dtype([('timestamp', '<i8'), ('price', '<f8'), ('amount', '<f8'), ('side', 'u1')])  # side 0 = buy, 1 = sell
+
+def market_directory(exchange_id, symbol):
+    return os.path.join(ARCHIVE_ROOT, f"{exchange_id}_{symbol.replace('/', '_').replace(':', '_').lower()}")
+
+# Buffers one market's book changes and trades, and appends them as compressed blocks
+class MarketRecorder:
+    def __init__(self, exchange_id, symbol, depth=DEPTH):
+        self.exchange_id = exchange_id
+        self.symbol = symbol
+        self.depth = depth
+        self.directory = market_directory(exchange_id, symbol)
+        os.makedirs(self.directory, exist_ok=True)
+        self.book = ({}, {})  # price -> amount for bids, asks (top DEPTH levels as last seen)
+        self.events = []
+        self.levels = []
+        self.trades = []
+        self.block_hour = None
+
+    def _snapshot_levels(self):
+        return [(side, price, amount) for side in (0, 1) for price, amount in self.book[side].items()]
+
+    # Only levels that changed since the previous update are stored, except for the block's opening keyframe
+    def on_book(self, order_book):
+        timestamp = order_book.get('timestamp') or int(time.time() * 1000)
+        hour = timestamp // HOUR_MS
+        if self.block_hour is not None and hour != self.block_hour:
+            self.flush()
+
+        new_book = tuple({price: amount for price, amount, *_ in order_book[key][:self.depth]} for key in ('bids', 'asks'))
+        if not self.events:
+            self.book = new_book
+            self.block_hour = hour
+            levels = self._snapshot_levels()
+            self.events.append((timestamp, 0, len(levels)))
+            self.levels.extend(levels)
+            return
+
+        changes = []
+        for side in (0, 1):
+            old, new = self.book[side], new_book[side]
+            changes.extend((side, price, amount) for price, amount in new.items() if old.get(price) != amount)
+            changes.extend((side, price, 0.0) for price in old.keys() - new.keys())
+        self.book = new_book
+        if changes:
+            self.events.append((timestamp, 1, len(changes)))
+            self.levels.extend(changes)
+
+    def on_trades(self, trades):
+        for trade in trades:
+            self.trades.append((trade['timestamp'], trade['price'], trade['amount'], 1 if trade['side'] == 'sell' else 0))
+
+    # Detach the buffered block (called on the event loop); trades wait for the next block if no book event came yet
+    def take_block(self):
+        if not self.events:
+            return None
+        block = (self.block_hour,
+                 np.array(self.events, dtype=EVENT_DTYPE),
+                 np.array(self.levels, dtype=LEVEL_DTYPE),
+                 np.array(self.trades, dtype=TRADE_DTYPE))
+        # The next block starts from a keyframe of the current book
+        self.events, self.levels, self.trades = [], [], []
+        return block
+
+    # Compress and append one block; safe to run in a worker thread since the buffers were already detached
+    def write_block(self, block):
+        if block is None:
+            return
+        block_hour, events, levels, trades = block
+        payload = zlib.compress(events.tobytes() + levels.tobytes() + trades.tobytes(), 6)
+        last_ts = max(int(events['timestamp'][-1]), int(trades['timestamp'].max()) if len(trades) else 0)
+        header = BLOCK_HEADER.pack(BLOCK_MAGIC, int(events['timestamp'][0]), last_ts,
+                                   len(events), len(levels), len(trades), len(payload))
+        hour_name = time.strftime('%Y%m%d_%H', time.gmtime(block_hour * 3600))
+        with open(os.path.join(self.directory, f"{hour_name}.obk"), 'ab') as f:
+            f.write(header + payload)
+
+    def flush(self):
+        self.write_block(self.take_block())
+
+async def watch_books(exchange, recorder):
+    while True:
+        try:
+            order_book = await exchange.watch_order_book(recorder.symbol, limit=recorder.depth)
+            recorder.on_book(order_book)
+        except Exception as e:
+            logging.error(f"Order book stream error for {recorder.symbol} on {recorder.exchange_id}: {e}. Resubscribing...")
+            await asyncio.sleep(5)
+
+async def watch_trades(exchange, recorder):
+    while True:
+        try:
+            trades = await exchange.watch_trades(recorder.symbol)
+            recorder.on_trades(trades)
+        except Exception as e:
+            logging.error(f"Trade stream error for {recorder.symbol} on {recorder.exchange_id}: {e}. Resubscribing...")
+            await asyncio.sleep(5)
+
+# Compression and file appends run in a worker thread so the websocket loops never wait on disk
+async def flush_periodically(recorders):
+    while True:
+        await asyncio.sleep(FLUSH_SECONDS)
+        for recorder in recorders:
+            try:
+                await asyncio.to_thread(recorder.write_block, recorder.take_block())
+            except OSError as e:
+                logging.error(f"Error writing block for {recorder.symbol}: {e}")
+
+async def main():
+    exchanges = {}
+    recorders = []
+    tasks = []
+    for exchange_id, symbol in MARKETS:
+        if exchange_id not in exchanges:
+            exchanges[exchange_id] = getattr(ccxtpro, exchange_id)({'enableRateLimit': True})
+        recorder = MarketRecorder(exchange_id, symbol)
+        recorders.append(recorder)
+        tasks.append(watch_books(exchanges[exchange_id], recorder))
+        if exchanges[exchange_id].has.get('watchTrades'):
+            tasks.append(watch_trades(exchanges[exchange_id], recorder))
+
+    logging.info(f"Recording {len(recorders)} markets to {ARCHIVE_ROOT} (depth {DEPTH}, flush every {FLUSH_SECONDS}s)")
+    try:
+        await asyncio.gather(flush_periodically(recorders), *tasks)
+    finally:
+        for recorder in recorders:
+            recorder.flush()
+        for exchange in exchanges.values():
+            await exchange.close()
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,257 @@
+import asyncio
+import csv
+import heapq
+import logging
+import os
+import sys
+import time
+import ccxt.pro as ccxtpro
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Results log written by db_processors/MarketsAnalyzer.py; its best opportunity/liquid pairs are monitored live
+RESULTS_LOG = "arbitrage_analysis_results.csv"
+TOP_PAIRS = 2000
+# Liquid-side quotes tried for a USD/USDC opportunity market, in the analyzer's order; USDT markets compare to USDT
+USD_LIQUID_QUOTES = ['USDT', 'USDC', 'USD']
+# Alert when Low Difference (%) <= -THRESHOLD_PCT (buy) or High Difference (%) >= THRESHOLD_PCT (sell), the analyzer's first bin
+THRESHOLD_PCT = 0.5
+# Lows/highs are taken over live buckets of this length, the same as the 1m candles the analyzer compares
+BUCKET_SECONDS = 60
+# Symbols per watch_tickers / watch_bids_asks subscription; venues cap the topics of one subscribe message
+SYMBOL_BATCH_SIZE = 100
+REPORT_SECONDS = 30
+ALERT_LOG = "spread_alerts.csv"
+ALERT_FIELDS = ['time', 'side', 'opportunity_exchange', 'opportunity_symbol', 'liquid_exchange', 'liquid_symbol',
+                'low_diff_pct', 'high_diff_pct', 'executable_pct', 'monthly_profit_percentage']
+
+# One market on one exchange; a liquid leg is shared by every pair that compares against it
+# State is a fixed handful of numbers, whatever the number of ticks
+class Leg:
+    __slots__ = ('exchange_id', 'symbol', 'bucket', 'low', 'high', 'last', 'bid', 'ask', 'pairs')
+
+    def __init__(self, exchange_id, symbol):
+        self.exchange_id = exchange_id
+        self.symbol = symbol
+        self.bucket = None
+        self.low = self.high = self.last = self.bid = self.ask = None
+        self.pairs = []
+
+    def on_ticker(self, ticker, bucket):
+        bid, ask = ticker.get('bid'), ticker.get('ask')
+        price = ticker.get('last') or ((bid + ask) / 2 if bid and ask else None)
+        if not price:
+            return False
+        if bucket != self.bucket:
+            self.bucket, self.low, self.high = bucket, price, price
+        else:
+            self.low, self.high = min(self.low, price), max(self.high, price)
+        self.last, self.bid, self.ask = price, bid, ask
+        return True
+
+    # Low/high of a bucket; a leg that has not traded in it yet is flat at its last price, like a carried-forward candle
+    def range(self, bucket):
+        if self.bucket == bucket:
+            return self.low, self.high
+        return self.last, self.last
+
+
+class SpreadPair:
+    __slots__ = ('opportunity', 'liquid', 'monthly_profit', 'low_diff', 'high_diff', 'buy_bucket', 'sell_bucket')
+
+    def __init__(self, opportunity, liquid, monthly_profit):
+        self.opportunity = opportunity
+        self.liquid = liquid
+        self.monthly_profit = monthly_profit
+        self.low_diff = self.high_diff = None
+        self.buy_bucket = self.sell_bucket = None  # bucket of the last alert per side
+
+    # Same formulas as calculate_differences in the analyzers; returns the sides that crossed the threshold
+    def update(self, bucket):
+        if self.opportunity.last is None or self.liquid.last is None:
+            return []
+        opportunity_low, opportunity_high = self.opportunity.range(bucket)
+        liquid_low, liquid_high = self.liquid.range(bucket)
+        self.low_diff = (opportunity_low - liquid_low) / liquid_low * 100
+        self.high_diff = (opportunity_high - liquid_high) / liquid_high * 100
+        crossed = []
+        if self.low_diff <= -THRESHOLD_PCT and self.buy_bucket != bucket:
+            self.buy_bucket = bucket
+            crossed.append('buy')
+        if self.high_diff >= THRESHOLD_PCT and self.sell_bucket != bucket:
+            self.sell_bucket = bucket
+            crossed.append('sell')
+        return crossed
+
+    # Edge available right now at the touch: buy the opportunity ask and sell the liquid bid, or the reverse
+    def executable_pct(self, side):
+        opportunity, liquid = self.opportunity, self.liquid
+        if side == 'buy' and opportunity.ask and liquid.bid:
+            return (liquid.bid - opportunity.ask) / opportunity.ask * 100
+        if side == 'sell' and opportunity.bid and liquid.ask:
+            return (opportunity.bid - liquid.ask) / liquid.ask * 100
+        return None
+
+
+# Best pairs of an analyzer results log: (opportunity exchange id, base, quote, liquid exchange id, monthly profit %)
+# A pair logged more than once keeps its last row, so each pair of legs is monitored (and alerts) only once
+def load_ranked_pairs(results_log=RESULTS_LOG, top=TOP_PAIRS):
+    latest = {}
+    with open(results_log, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            key = (row['opportunity_exchange'].lower(), row['market_pair'], row['liquid_exchange'].lower())
+            latest[key] = row
+    ranked = []
+    for (opportunity_exchange, market_pair, liquid_exchange), row in latest.items():
+        profits = [float(row[key]) for key in ('monthly_buy_profit_percentage', 'monthly_sell_profit_percentage') if row.get(key)]
+        if not profits:
+            continue
+        base, quote = market_pair.split('/')
+        ranked.append((opportunity_exchange, base, quote, liquid_exchange, max(profits)))
+    return heapq.nlargest(top, ranked, key=lambda pair: pair[4])
+
+def liquid_symbol(markets, base, quote):
+    quotes = USD_LIQUID_QUOTES if quote in ('USD', 'USDC') else [quote]
+    return next((f"{base}/{liquid_quote}" for liquid_quote in quotes if f"{base}/{liquid_quote}" in markets), None)
+
+async def watch(label, subscribe, handler):
+    while True:
+        try:
+            handler(await subscribe())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"{label} stream error: {e}. Resubscribing...")
+            await asyncio.sleep(5)
+
+
+class SpreadMonitor:
+    """
+    Live Low/High Difference (%) for many opportunity/liquid pairs on one event loop.
+    Every tick updates its leg in O(1) and re-evaluates only the pairs that use that leg.
+    """
+    def __init__(self, exchanges, ranked_pairs, on_alert=None):
+        self.exchanges = exchanges
+        self.legs = {}
+        self.pairs = []
+        self.on_alert = on_alert or self.log_alert
+        self.ticks = 0
+        self.alerts = 0
+        self._alert_file = None
+        skipped = 0
+        for opportunity_id, base, quote, liquid_id, monthly_profit in ranked_pairs:
+            if opportunity_id not in exchanges or liquid_id not in exchanges:
+                skipped += 1
+                continue
+            opportunity_symbol = f"{base}/{quote}"
+            liquid = liquid_symbol(exchanges[liquid_id].markets, base, quote)
+            # Synthetic (cross-rate) comparisons have no single liquid market to subscribe to
+            if opportunity_symbol not in exchanges[opportunity_id].markets or liquid is None:
+                skipped += 1
+                continue
+            pair = SpreadPair(self.leg(opportunity_id, opportunity_symbol), self.leg(liquid_id, liquid), monthly_profit)
+            pair.opportunity.pairs.append(pair)
+            pair.liquid.pairs.append(pair)
+            self.pairs.append(pair)
+        logging.info(f"Monitoring {len(self.pairs)} pairs over {len(self.legs)} markets ({skipped} skipped)")
+
+    def leg(self, exchange_id, symbol):
+        key = (exchange_id, symbol)
+        if key not in self.legs:
+            self.legs[key] = Leg(exchange_id, symbol)
+        return self.legs[key]
+
+    def on_tickers(self, exchange_id, tickers):
+        bucket = int(time.time() // BUCKET_SECONDS)
+        for symbol, ticker in tickers.items():
+            leg = self.legs.get((exchange_id, symbol))
+            if leg is None or not leg.on_ticker(ticker, bucket):
+                continue
+            self.ticks += 1
+            for pair in leg.pairs:
+                for side in pair.update(bucket):
+                    self.alerts += 1
+                    self.on_alert(pair, side)
+
+    # watch_bids_asks (top of book only) where the venue has it, then watch_tickers, then one watch_ticker per symbol
+    def streams(self):
+        symbols_by_exchange = {}
+        for exchange_id, symbol in self.legs:
+            symbols_by_exchange.setdefault(exchange_id, []).append(symbol)
+        streams = []
+        for exchange_id, symbols in symbols_by_exchange.items():
+            exchange = self.exchanges[exchange_id]
+            handler = lambda tickers, exchange_id=exchange_id: self.on_tickers(exchange_id, tickers)
+            method = next((name for name in ('watchBidsAsks', 'watchTickers') if exchange.has.get(name)), None)
+            if method is not None:
+                subscribe = exchange.watch_bids_asks if method == 'watchBidsAsks' else exchange.watch_tickers
+                streams += [watch(f"{exchange_id} {method}", lambda batch=symbols[i:i + SYMBOL_BATCH_SIZE], subscribe=subscribe: subscribe(batch), handler)
+                            for i in range(0, len(symbols), SYMBOL_BATCH_SIZE)]
+            else:
+                streams += [watch(f"{exchange_id} {symbol}", lambda symbol=symbol, exchange=exchange: exchange.watch_ticker(symbol),
+                                  lambda ticker, handler=handler: handler({ticker['symbol']: ticker}))
+                            for symbol in symbols]
+        return streams
+
+    # Default alert sink: log line plus a flushed CSV row, so alerts survive a restart
+    def log_alert(self, pair, side):
+        executable = pair.executable_pct(side)
+        logging.warning(f"{side.upper()} {pair.opportunity.exchange_id} {pair.opportunity.symbol} vs "
+                        f"{pair.liquid.exchange_id} {pair.liquid.symbol}: low {pair.low_diff:+.2f}%, high {pair.high_diff:+.2f}%"
+                        + (f", executable {executable:+.2f}%" if executable is not None else ""))
+        if self._alert_file is None:
+            new_file = not os.path.exists(ALERT_LOG) or os.path.getsize(ALERT_LOG) == 0
+            self._alert_file = open(ALERT_LOG, 'a', newline='', encoding='utf-8')
+            self._alert_writer = csv.writer(self._alert_file)
+            if new_file:
+                self._alert_writer.writerow(ALERT_FIELDS)
+        self._alert_writer.writerow([
+            time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()), side,
+            pair.opportunity.exchange_id, pair.opportunity.symbol, pair.liquid.exchange_id, pair.liquid.symbol,
+            round(pair.low_diff, 4), round(pair.high_diff, 4),
+            round(executable, 4) if executable is not None else None, pair.monthly_profit,
+        ])
+        self._alert_file.flush()
+
+    def report(self, elapsed):
+        live = sum(1 for leg in self.legs.values() if leg.last is not None)
+        widest = heapq.nlargest(5, (pair for pair in self.pairs if pair.low_diff is not None),
+                                key=lambda pair: max(-pair.low_diff, pair.high_diff))
+        lines = [f"{live}/{len(self.legs)} markets live, {self.ticks / elapsed:.0f} ticks/s, {self.alerts} alerts"]
+        lines += [f"  {pair.opportunity.exchange_id} {pair.opportunity.symbol} vs {pair.liquid.exchange_id} {pair.liquid.symbol}: "
+                  f"low {pair.low_diff:+.2f}%, high {pair.high_diff:+.2f}%" for pair in widest]
+        return "\n".join(lines)
+
+    async def report_periodically(self):
+        while True:
+            started, self.ticks = time.monotonic(), 0
+            await asyncio.sleep(REPORT_SECONDS)
+            logging.info(self.report(time.monotonic() - started))
+
+    async def run(self):
+        try:
+            await asyncio.gather(self.report_periodically(), *self.streams())
+        finally:
+            if self._alert_file is not None:
+                self._alert_file.close()
+
+async def main(results_log=RESULTS_LOG, top=TOP_PAIRS):
+    ranked_pairs = load_ranked_pairs(results_log, top)
+    exchange_ids = sorted({pair[0] for pair in ranked_pairs} | {pair[3] for pair in ranked_pairs})
+    exchanges = {exchange_id: getattr(ccxtpro, exchange_id)({'enableRateLimit': True})
+                 for exchange_id in exchange_ids if hasattr(ccxtpro, exchange_id)}
+    try:
+        results = await asyncio.gather(*(exchange.load_markets() for exchange in exchanges.values()), return_exceptions=True)
+        for exchange_id, result in zip(list(exchanges), results):
+            if isinstance(result, Exception):
+                logging.error(f"Error loading {exchange_id} markets: {result}")
+                await exchanges.pop(exchange_id).close()
+        await SpreadMonitor(exchanges, ranked_pairs).run()
+    finally:
+        await asyncio.gather(*(exchange.close() for exchange in exchanges.values()))
+
+# Usage: python spread_monitor.py [arbitrage_analysis_results.csv] [top pairs]
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    asyncio.run(main(args[0] if args else RESULTS_LOG, int(args[1]) if len(args) > 1 else TOP_PAIRS))
@@ -1,5 +1,13 @@
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 import pandas as pd
 import numpy as np
+from csvCache import *
+
+# TradingView export columns the analysis uses; the open/high/close and the repeated MA columns are never loaded
+ANALYSIS_COLUMNS = ['time', 'low', 'Volume', 'Low Difference (%)', 'High Difference (%)']
 
 def parse_filename(filename):
     parts = filename.replace(',', '').split('_')
@@ -11,6 +19,10 @@ def parse_filename(filename):
         return opportunity_exchange.upper(), base_asset.upper(), quote_asset.upper(), timeframe
     raise ValueError("Filename format is incorrect. Expected format: 'EXCHANGE_BASEASSET_QUOTEASSET, TIMEFRAME.csv'")
 
+# Every TradingView export in a directory, in a stable order
+def discover_files(directory='.', pattern=CSV_PATTERN):
+    return sorted(glob.glob(os.path.join(directory, pattern)))
+
 def determine_timeframe(df):
     df['time_diff'] = df['time'].diff().dropna()
     if df['time_diff'].empty:
@@ -38,8 +50,8 @@ def analyze_opportunities_fixed_bins(file_path, liquid_exchange="Binance", thres
     opportunity_exchange, base_asset, quote_asset, filename_timeframe = parse_filename(filename)
 
     try:
-        df = pd.read_csv(file_path)
-        df['time'] = pd.to_datetime(df['time'], unit='s')
+        # Read-only mapped columns: the analysis only adds columns and filters rows
+        df = read_tradingview_csv(file_path, ANALYSIS_COLUMNS, mmap=True)
         
         if start_datetime and end_datetime:
             df = df[(df['time'] >= start_datetime) & (df['time'] <= end_datetime)]
@@ -171,101 +183,57 @@ def save_results_to_excel(results, filename='arbitrage_analysis.xlsx'):
         'CHF': 'CHF',
         'CAD': 'CAD'
     }
-    writer = pd.ExcelWriter(filename, engine='openpyxl')
-    
+    writer = pd.ExcelWriter(filename, engine='xlsxwriter')
+    number_format = writer.book.add_format({'num_format': '#,##0.00'})
+    currency_format = writer.book.add_format({'num_format': '$#,##0.00'})
+
+    sheets = {}
     for tab_name, quote_asset in quote_assets.items():
         if isinstance(quote_asset, list):
             filtered_df = df_results[df_results['Quote Asset'].isin(quote_asset)].sort_values(by='Median Buy Monthly Return (%)', ascending=False)
         else:
             filtered_df = df_results[df_results['Quote Asset'] == quote_asset].sort_values(by='Median Buy Monthly Return (%)', ascending=False)
         if not filtered_df.empty:
-            filtered_df.to_excel(writer, sheet_name=tab_name, index=False)
-    
-    df_results.to_excel(writer, sheet_name='Summary', index=False)
-    df_totals.to_excel(writer, sheet_name='Totals', index=False)
+            sheets[tab_name] = filtered_df
+    sheets['Summary'] = df_results
+    sheets['Totals'] = df_totals
 
-    for sheetname in writer.sheets:
+    for sheetname, sheet_df in sheets.items():
+        sheet_df.to_excel(writer, sheet_name=sheetname, index=False)
         worksheet = writer.sheets[sheetname]
-        
-        # Set width of all columns to triple the default size for better readability
-        for col in worksheet.columns:
-            max_length = max(len(str(cell.value)) for cell in col) * 1.01
-            worksheet.column_dimensions[col[0].column_letter].width = max_length
-    
-        # Apply currency format to the specified columns
-        for row in worksheet.iter_rows(min_row=2, min_col=1, max_col=worksheet.max_column):
-            for cell in row:
-                if cell.column_letter in ['F', 'G', 'H', 'I', 'J', 'K', 'L']:
-                    cell.number_format = '#,##0.00'
-                elif cell.column_letter == 'M':
-                    cell.number_format = '$#,##0.00'
+
+        # Size each column from its longest rendered value and apply the column's number format once
+        for col_idx, col in enumerate(sheet_df.columns):
+            max_length = max(len(str(col)), sheet_df[col].astype(str).str.len().fillna(0).max() if not sheet_df.empty else 0) * 1.01
+            if 5 <= col_idx <= 11:  # columns F-L
+                worksheet.set_column(col_idx, col_idx, max_length, number_format)
+            elif col_idx == 12:  # column M
+                worksheet.set_column(col_idx, col_idx, max_length, currency_format)
+            else:
+                worksheet.set_column(col_idx, col_idx, max_length)
     writer.close()
     print(f"Results saved to {filename}")
 
-def main(file_paths, liquid_exchange="Binance", start_datetime=None, end_datetime=None):
-    all_results = []
+# file_paths=None scans directory for exports; files are analysed in a process pool and results keep the file order
+def main(file_paths=None, liquid_exchange="Binance", start_datetime=None, end_datetime=None, directory='.',
+         max_workers=None, output_file='arbitrage_analysis.xlsx'):
+    if file_paths is None:
+        file_paths = discover_files(directory)
+        print(f"Found {len(file_paths)} CSV files in {directory}")
+
+    analyze = partial(analyze_opportunities_fixed_bins, liquid_exchange=liquid_exchange,
+                      start_datetime=start_datetime, end_datetime=end_datetime)
+    if max_workers == 1 or len(file_paths) <= 1:
+        results = map(analyze, file_paths)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+            results = list(executor.map(analyze, file_paths))
+    all_results = [result for result in results if result]
 
-    for file_path in file_paths:
-        result = analyze_opportunities_fixed_bins(file_path, liquid_exchange=liquid_exchange, start_datetime=start_datetime, end_datetime=end_datetime)
-        if result:
-            all_results.append(result)
-    
-    save_results_to_excel(all_results)
+    save_results_to_excel(all_results, output_file)
 
 if __name__ == "__main__":
-    file_paths = [
-      'KRAKEN_TAO_USD, 5.csv',
-        'KRAKEN_SUI_USD, 5.csv',
-        'KRAKEN_DOGE_USD, 5.csv',
-        'KRAKEN_SOL_USD, 5.csv',
-        'KRAKEN_BCH_USD, 5.csv',
-        'KRAKEN_SOL_USDT, 5.csv',
-        'KRAKEN_LDO_USD, 5.csv',
-        'KRAKEN_PEPE_USD, 5.csv',
-        'KRAKEN_TURBO_USD, 5.csv',
-        'KRAKEN_STORJ_USD, 5.csv',
-        'KRAKEN_JUP_USD, 5.csv',
-        'KRAKEN_TIA_USD, 5.csv',
-        'KRAKEN_DOT_USD, 5.csv',
-        'KRAKEN_SHIB_USD, 5.csv',
-        'KRAKEN_ARB_USD, 5.csv',
-        'KRAKEN_SEI_USD, 5.csv',
-        'KRAKEN_SGB_USD, 5.csv',
-        'KRAKEN_SOL_EUR, 5.csv',
-        'KRAKEN_ETH_USDT, 5.csv',
-        'KRAKEN_USDC_USD, 5.csv',
-        'KRAKEN_SOL_ETH, 5.csv',
-        'KRAKEN_LINK_USD, 5.csv',
-        'KRAKEN_BTC_USD, 5.csv',
-        'KRAKEN_AVAX_USD, 5.csv',
-        'KRAKEN_SOL_GBP, 5.csv',
-        'KRAKEN_SOL_AUD, 5.csv',
-        'KRAKEN_ICP_USD, 5.csv',
-        'KRAKEN_INJ_USD, 5.csv',
-        'KRAKEN_ADA_USD, 5.csv',
-        'KRAKEN_ONDO_USD, 5.csv',
-        'KRAKEN_TRX_USD, 5.csv',
-        'KRAKEN_UNI_USD, 5.csv',
-        'KRAKEN_PENDLE_USD, 5.csv',
-        'KRAKEN_AAVE_USD, 5.csv',
-        'KRAKEN_ETH_USD, 5.csv',
-        'KRAKEN_OCEAN_USD, 5.csv',
-        'KRAKEN_RUNE_USD, 5.csv',
-        'KRAKEN_POL_USD, 5.csv',
-        'KRAKEN_LTC_USD, 5.csv',
-        'KRAKEN_GALA_USD, 5.csv',
-        'KRAKEN_KSM_USD, 5.csv',
-        'KRAKEN_NEAR_USD, 5.csv',
-        'KRAKEN_SOL_BTC, 5.csv',
-        'KRAKEN_BEAM_USD, 5.csv',
-        'KRAKEN_CRV_USD, 5.csv',
-        'KRAKEN_XRP_USD, 5.csv',
-        'KRAKEN_FET_USD, 5.csv',
-        'KRAKEN_OMG_USD, 5.csv',
-        'KRAKEN_WIF_USD, 5.csv',
-        'KRAKEN_SAGA_USD, 5.csv',
-        'KRAKEN_STX_USD, 5.csv'
-    ]
+    # Pass file_paths=[...] to analyse a hand-picked list instead of every export in the directory
     start_datetime = pd.to_datetime('2023-01-01 00:00:00')
     end_datetime = pd.to_datetime('2024-09-17 23:59:59')
-    main(file_paths, start_datetime=start_datetime, end_datetime=end_datetime)
+    main(directory='.', start_datetime=start_datetime, end_datetime=end_datetime)
@@ -1,5 +1,6 @@
 import pandas as pd
 import numpy as np
+from csvCache import *
 
 def parse_filename(filename):
     parts = filename.replace(',', '').split('_')
@@ -35,8 +36,7 @@ def analyze_opportunities_fixed_bins(file_path, liquid_exchange="Binance", thres
     filename = file_path.split('/')[-1].split('.')[0]
     opportunity_exchange, base_asset, quote_asset, filename_timeframe = parse_filename(filename)
 
-    df = pd.read_csv(file_path)
-    df['time'] = pd.to_datetime(df['time'], unit='s')
+    df = read_tradingview_csv(file_path)
     csv_timeframe = determine_timeframe(df)
     
     if start_datetime is not None and end_datetime is not None:
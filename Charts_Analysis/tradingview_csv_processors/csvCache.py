@@ -0,0 +1,128 @@
+import glob
+import hashlib
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# 'EXCHANGE_BASE_QUOTE, TF.csv' as exported from TradingView
+CSV_PATTERN = '*_*_*, *.csv'
+# Converted exports live next to the CSVs: .csv_cache/<export name>/meta.json + one .npy per column
+CACHE_DIRNAME = '.csv_cache'
+
+def _cache_directory(file_path):
+    directory, filename = os.path.split(os.path.abspath(file_path))
+    return os.path.join(directory, CACHE_DIRNAME, os.path.splitext(filename)[0])
+
+def _file_sha1(file_path):
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _read_meta(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, 'meta.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_meta(cache_dir, meta):
+    tmp_path = os.path.join(cache_dir, f'meta.json.{os.getpid()}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(cache_dir, 'meta.json'))
+
+# TradingView exports are all numeric: 'time' is epoch seconds, every other column parses straight to float64
+TIME_DTYPE = 'int64'
+VALUE_DTYPE = 'float64'
+
+# Column names as read_csv reports them; repeated headers (TradingView's MA, MA, MA) become MA, MA.1, MA.2
+def _export_columns(file_path):
+    return list(pd.read_csv(file_path, nrows=0).columns)
+
+# Parse only the given columns (all when None), at fixed dtypes, with 'time' already converted from epoch seconds,
+# and store each as .npy; columns already cached for an unchanged source are kept, so a later caller can add the rest
+# meta.json is written last, so an interrupted conversion is simply redone on the next read
+def convert_export(file_path, columns=None, meta=None):
+    cache_dir = _cache_directory(file_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    fresh = meta is None
+    if fresh:
+        try:
+            os.remove(os.path.join(cache_dir, 'meta.json'))
+        except FileNotFoundError:
+            pass
+        stat = os.stat(file_path)
+        meta = {'source': os.path.basename(file_path), 'source_size': stat.st_size, 'source_mtime_ns': stat.st_mtime_ns,
+                'source_sha1': _file_sha1(file_path), 'rows': None, 'columns': []}
+
+    header = _export_columns(file_path)
+    cached = {column['name'] for column in meta['columns']}
+    wanted = header if columns is None else [name for name in header if name in set(columns)]
+    # Files go by header position, since read_csv renames repeated headers
+    positions = [position for position, name in enumerate(header) if name in wanted and name not in cached]
+    if positions:
+        df = pd.read_csv(file_path, usecols=positions,
+                         dtype={name: TIME_DTYPE if name == 'time' else VALUE_DTYPE for name in header})
+        meta['rows'] = len(df)
+        for position in positions:
+            column = header[position]
+            values = pd.to_datetime(df[column], unit='s').to_numpy() if column == 'time' else df[column].to_numpy()
+            column_file = f'col_{position:03d}.npy'
+            tmp_path = os.path.join(cache_dir, f'{column_file}.{os.getpid()}.tmp')
+            with open(tmp_path, 'wb') as f:
+                np.save(f, values)
+            os.replace(tmp_path, os.path.join(cache_dir, column_file))
+            meta['columns'].append({'name': column, 'file': column_file, 'dtype': str(values.dtype)})
+        meta['columns'].sort(key=lambda column: column['file'])
+    if positions or fresh:
+        _write_meta(cache_dir, meta)
+    return meta
+
+# Cached metadata for an export, converting it (or the requested columns still missing) if needed
+# Size and mtime decide freshness; a touched but identical file is recognised by its hash and not reconverted
+def cached_export(file_path, columns=None):
+    cache_dir = _cache_directory(file_path)
+    meta = _read_meta(cache_dir)
+    stat = os.stat(file_path)
+    if meta is None or meta['source_size'] != stat.st_size:
+        return convert_export(file_path, columns)
+    if meta['source_mtime_ns'] != stat.st_mtime_ns:
+        if meta['source_sha1'] != _file_sha1(file_path):
+            return convert_export(file_path, columns)
+        meta['source_mtime_ns'] = stat.st_mtime_ns
+        _write_meta(cache_dir, meta)
+    cached = {column['name'] for column in meta['columns']}
+    if any(name not in cached for name in (_export_columns(file_path) if columns is None else columns)):
+        return convert_export(file_path, columns, meta)
+    return meta
+
+# Drop-in for pd.read_csv(file_path) followed by pd.to_datetime(df['time'], unit='s')
+# columns limits the load (and the conversion) and silently skips names the export lacks
+# mmap=True maps the cached columns instead of reading them: faster and shared, but the frame is read-only,
+# so only callers that never assign into existing columns should use it
+def read_tradingview_csv(file_path, columns=None, mmap=False):
+    meta = cached_export(file_path, columns)
+    cache_dir = _cache_directory(file_path)
+    wanted = None if columns is None else set(columns)
+    data = {}
+    for column in meta['columns']:
+        if wanted is not None and column['name'] not in wanted:
+            continue
+        data[column['name']] = np.load(os.path.join(cache_dir, column['file']), mmap_mode='r' if mmap else None)
+    return pd.DataFrame(data, copy=False)
+
+# One-time conversion of every export in a directory: python csvCache.py [directory]
+def convert_directory(directory='.', pattern=CSV_PATTERN):
+    file_paths = sorted(glob.glob(os.path.join(directory, pattern)))
+    for file_path in file_paths:
+        meta = cached_export(file_path)
+        print(f"{meta['source']}: {meta['rows']} rows, {len(meta['columns'])} columns")
+    print(f"{len(file_paths)} exports cached under {os.path.join(os.path.abspath(directory), CACHE_DIRNAME)}")
+
+
+if __name__ == "__main__":
+    convert_directory(sys.argv[1] if len(sys.argv) > 1 else '.')
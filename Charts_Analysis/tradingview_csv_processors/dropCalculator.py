@@ -1,5 +1,6 @@
 import pandas as pd
 import numpy as np
+from csvCache import *
 
 def parse_filename(filename):
     parts = filename.replace(',', '').split('_')
@@ -43,8 +44,7 @@ def bin_results(occurrences, bin_width, threshold):
 def main(file_path, start_datetime, end_datetime, threshold, bin_width, max_diff_pct):
     opportunity_exchange, base_asset, quote_asset, filename_timeframe = parse_filename(file_path)
     
-    data = pd.read_csv(file_path)
-    data['time'] = pd.to_datetime(data['time'], unit='s')
+    data = read_tradingview_csv(file_path)
     data = data[(data['time'] >= start_datetime) & (data['time'] <= end_datetime)]
     
     data = calculate_percentage_changes(data)
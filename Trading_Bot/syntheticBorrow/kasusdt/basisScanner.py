@@ -0,0 +1,297 @@
+import asyncio
+import heapq
+import json
+import math
+import os
+import sys
+import time
+from collections import defaultdict
+import ccxt.pro as ccxtpro
+
+from syntheticBorrowAsync import DEFAULT_STOP_PCT, ticker_streams
+
+# (spot venue, perpetual venue) pairs to scan; the same id twice means one account holds both legs
+VENUE_PAIRS = [('kucoin', 'kucoinfutures'), ('binance', 'binanceusdm'), ('okx', 'okx'), ('bybit', 'bybit'), ('gate', 'gate')]
+QUOTE_CURRENCIES = {'USDT'}
+# Strategy configs are only written for the venues portfolioRunner.py trades on
+RUNNER_VENUES = ('kucoin', 'kucoinfutures')
+CONFIG_PATH = 'basis_strategies.json'
+
+# Markets under this 24h quote volume on either leg are not ranked (unknown volume is not filtered)
+MIN_QUOTE_VOLUME = 250_000
+# A pair is ranked only while both legs have ticked within this many seconds
+STALE_SECONDS = 5
+RANK_SECONDS = 0.5
+FUNDING_REFRESH_SECONDS = 60
+REPORT_SECONDS = 30
+TOP_N = 20
+# Expected return counts the funding of this many hours, the same horizon as db_processors/fundingRates.py
+FUNDING_HOLD_HOURS = 8
+DEFAULT_FUNDING_INTERVAL_HOURS = 8
+# Only pairs at least this good (score, %) become strategy configs
+MIN_SCORE_PCT = 0.1
+
+# Sizing of the emitted configs: quote notional per hedge, entered in this many steps
+NOTIONAL_PER_HEDGE = 100
+ENTRY_STEPS = 4
+LEVERAGE = 2
+
+
+def spread_pct(bid, ask):
+    return (ask - bid) / ((ask + bid) / 2) * 100
+
+def quote_volume(ticker):
+    if ticker.get('quoteVolume') is not None:
+        return float(ticker['quoteVolume'])
+    if ticker.get('baseVolume') is not None and ticker.get('last') is not None:
+        return float(ticker['baseVolume']) * float(ticker['last'])
+    return None
+
+# '8h' / 8 / None from a ccxt funding rate structure
+def funding_interval_hours(rate):
+    interval = rate.get('interval')
+    if isinstance(interval, str) and interval.endswith('h'):
+        return float(interval[:-1])
+    if isinstance(interval, (int, float)) and interval > 0:
+        return float(interval)
+    return DEFAULT_FUNDING_INTERVAL_HOURS
+
+
+class BasisRow:
+    """
+    One spot/perpetual pair: latest top of book of both legs, perpetual funding, and the derived basis.
+    Long spot at the ask, short the perpetual at the bid, so basis_pct is what the entry actually locks in.
+    """
+    __slots__ = ('spot_venue', 'perp_venue', 'spot_symbol', 'perp_symbol', 'base', 'quote', 'contract_size',
+                 'spot_bid', 'spot_ask', 'spot_volume', 'spot_at', 'perp_bid', 'perp_ask', 'perp_volume', 'perp_at',
+                 'funding_rate', 'funding_hours')
+
+    def __init__(self, spot_venue, perp_venue, spot_market, perp_market):
+        self.spot_venue = spot_venue
+        self.perp_venue = perp_venue
+        self.spot_symbol = spot_market['symbol']
+        self.perp_symbol = perp_market['symbol']
+        self.base = spot_market['base']
+        self.quote = spot_market['quote']
+        self.contract_size = float(perp_market.get('contractSize') or 1.0)
+        self.spot_bid = self.spot_ask = self.spot_volume = self.spot_at = None
+        self.perp_bid = self.perp_ask = self.perp_volume = self.perp_at = None
+        self.funding_rate = None
+        self.funding_hours = DEFAULT_FUNDING_INTERVAL_HOURS
+
+    @staticmethod
+    def top_of_book(ticker):
+        bid, ask = ticker.get('bid'), ticker.get('ask')
+        if bid is None or ask is None:
+            bid = ask = ticker.get('last')
+        return (float(bid), float(ask)) if bid and ask else (None, None)
+
+    def on_spot_ticker(self, ticker, now):
+        self.spot_bid, self.spot_ask = self.top_of_book(ticker)
+        self.spot_volume = quote_volume(ticker)
+        self.spot_at = now
+
+    def on_perp_ticker(self, ticker, now):
+        self.perp_bid, self.perp_ask = self.top_of_book(ticker)
+        self.perp_volume = quote_volume(ticker)
+        self.perp_at = now
+
+    def rankable(self, now):
+        return (self.spot_ask is not None and self.perp_bid is not None
+                and now - self.spot_at <= STALE_SECONDS and now - self.perp_at <= STALE_SECONDS
+                and (self.spot_volume is None or self.spot_volume >= MIN_QUOTE_VOLUME)
+                and (self.perp_volume is None or self.perp_volume >= MIN_QUOTE_VOLUME))
+
+    @property
+    def basis_pct(self):
+        return (self.perp_bid / self.spot_ask - 1) * 100
+
+    # Spot and perpetual spreads, paid again when the hedge is unwound
+    @property
+    def spread_pct(self):
+        return spread_pct(self.spot_bid, self.spot_ask) + spread_pct(self.perp_bid, self.perp_ask)
+
+    # Funding the short receives (pays if negative) over FUNDING_HOLD_HOURS at the current rate
+    @property
+    def funding_carry_pct(self):
+        if self.funding_rate is None:
+            return 0.0
+        return self.funding_rate * 100 * FUNDING_HOLD_HOURS / self.funding_hours
+
+    @property
+    def score_pct(self):
+        return self.basis_pct + self.funding_carry_pct - self.spread_pct
+
+    def format(self):
+        funding = f"{self.funding_rate * 100:+.4f}%/{self.funding_hours:g}h" if self.funding_rate is not None else "n/a"
+        return (f"{self.spot_venue}:{self.spot_symbol} / {self.perp_venue}:{self.perp_symbol} "
+                f"basis {self.basis_pct:+.3f}%, funding {funding}, spread {self.spread_pct:.3f}%, score {self.score_pct:+.3f}%")
+
+    # STRATEGY_CFG-style dict for the synthetic borrow tools: whole contracts, equal coins on both legs
+    def strategy_config(self, notional=NOTIONAL_PER_HEDGE):
+        contracts = math.floor(notional / self.spot_ask / self.contract_size)
+        if contracts < 1:
+            return None
+        step_contracts = max(1, math.ceil(contracts / ENTRY_STEPS))
+        coins = contracts * self.contract_size
+        return {
+            'symbol_spot': self.spot_symbol,
+            'symbol_fut': self.perp_symbol,
+            'base_coin': self.base,
+            'desired_spot': coins,
+            'desired_fut': -coins,
+            'max_trade_size': step_contracts * self.contract_size,
+            'leverage': LEVERAGE,
+            'contract_size': self.contract_size,
+            'stop_pct': DEFAULT_STOP_PCT,
+            # Scanner context, ignored by the hedge engines
+            'basis_pct': round(self.basis_pct, 4),
+            'funding_rate': self.funding_rate,
+            'score_pct': round(self.score_pct, 4),
+        }
+
+
+class BasisScanner:
+    """
+    Live basis table over every spot/perpetual pair listed on VENUE_PAIRS.
+    Ticker streams update rows in place; the ranking is redone from the table every RANK_SECONDS,
+    and the best pairs on RUNNER_VENUES are kept in CONFIG_PATH for portfolioRunner.py.
+    """
+    def __init__(self, exchanges, venue_pairs=VENUE_PAIRS, config_path=CONFIG_PATH):
+        self.exchanges = exchanges
+        self.config_path = config_path
+        self.rows = []
+        self.spot_rows = defaultdict(list)   # (venue, symbol) -> rows with that spot leg
+        self.perp_rows = defaultdict(list)   # (venue, symbol) -> rows with that perpetual leg
+        for spot_venue, perp_venue in venue_pairs:
+            self.add_venue_pair(spot_venue, perp_venue)
+        self.ranked = []
+        self.runner_symbols = None
+
+    def add_venue_pair(self, spot_venue, perp_venue):
+        perps = {}
+        for market in self.exchanges[perp_venue].markets.values():
+            if (market.get('swap') and market.get('linear') and market.get('active') is not False
+                    and market['quote'] in QUOTE_CURRENCIES and market.get('settle') == market['quote']):
+                perps[(market['base'], market['quote'])] = market
+        pairs = 0
+        for market in self.exchanges[spot_venue].markets.values():
+            perp = perps.get((market['base'], market['quote']))
+            if market.get('spot') and market.get('active') is not False and perp is not None:
+                row = BasisRow(spot_venue, perp_venue, market, perp)
+                self.rows.append(row)
+                self.spot_rows[(spot_venue, row.spot_symbol)].append(row)
+                self.perp_rows[(perp_venue, row.perp_symbol)].append(row)
+                pairs += 1
+        print(f"[INFO] {spot_venue}/{perp_venue}: {pairs} spot/perpetual pairs")
+
+    # ---- stream handlers ----
+
+    def on_spot_tickers(self, venue, tickers):
+        now = time.monotonic()
+        for symbol, ticker in tickers.items():
+            for row in self.spot_rows.get((venue, symbol), ()):
+                row.on_spot_ticker(ticker, now)
+
+    def on_perp_tickers(self, venue, tickers):
+        now = time.monotonic()
+        for symbol, ticker in tickers.items():
+            for row in self.perp_rows.get((venue, symbol), ()):
+                row.on_perp_ticker(ticker, now)
+
+    def streams(self):
+        streams = []
+        for venue in {venue for venue, _ in self.spot_rows}:
+            symbols = sorted(symbol for v, symbol in self.spot_rows if v == venue)
+            streams += ticker_streams(f"{venue} spot", self.exchanges[venue], symbols,
+                                      lambda tickers, venue=venue: self.on_spot_tickers(venue, tickers))
+        for venue in {venue for venue, _ in self.perp_rows}:
+            symbols = sorted(symbol for v, symbol in self.perp_rows if v == venue)
+            streams += ticker_streams(f"{venue} perp", self.exchanges[venue], symbols,
+                                      lambda tickers, venue=venue: self.on_perp_tickers(venue, tickers))
+        return streams
+
+    # ---- funding (changes a few times a day, one REST call per venue is enough) ----
+
+    async def refresh_funding(self, venue):
+        exchange = self.exchanges[venue]
+        symbols = sorted(symbol for v, symbol in self.perp_rows if v == venue)
+        if not exchange.has.get('fetchFundingRates'):
+            print(f"[WARN] {venue}: no fetchFundingRates, ranking without funding")
+            return
+        rates = await exchange.fetch_funding_rates(symbols)
+        for symbol, rate in rates.items():
+            for row in self.perp_rows.get((venue, symbol), ()):
+                if rate.get('fundingRate') is not None:
+                    row.funding_rate = float(rate['fundingRate'])
+                    row.funding_hours = funding_interval_hours(rate)
+
+    async def monitor_funding(self):
+        venues = sorted({venue for venue, _ in self.perp_rows})
+        while True:
+            results = await asyncio.gather(*(self.refresh_funding(venue) for venue in venues), return_exceptions=True)
+            for venue, result in zip(venues, results):
+                if isinstance(result, Exception):
+                    print(f"[ERROR] {venue} funding rates: {result}")
+            await asyncio.sleep(FUNDING_REFRESH_SECONDS)
+
+    # ---- ranking ----
+
+    def top(self, n=TOP_N, venue_pair=None):
+        now = time.monotonic()
+        rows = (row for row in self.rows if row.rankable(now)
+                and (venue_pair is None or (row.spot_venue, row.perp_venue) == venue_pair))
+        return heapq.nlargest(n, rows, key=lambda row: row.score_pct)
+
+    def report(self):
+        lines = [f"[TOP] {len(self.ranked)} of {len(self.rows)} pairs ranked"]
+        lines += [f"  {i:>2}. {row.format()}" for i, row in enumerate(self.ranked, 1)]
+        return "\n".join(lines)
+
+    # Written atomically, so the runner never reads a half-written file
+    def write_configs(self, configs):
+        tmp_path = f"{self.config_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(configs, f, indent=2)
+        os.replace(tmp_path, self.config_path)
+
+    # The config file is rewritten whenever the set of qualifying runner pairs changes, not on a timer
+    def update_configs(self):
+        rows = [row for row in self.top(TOP_N, RUNNER_VENUES) if row.score_pct >= MIN_SCORE_PCT]
+        configs = [config for config in (row.strategy_config() for row in rows) if config is not None]
+        symbols = [config['symbol_fut'] for config in configs]
+        if symbols != self.runner_symbols:
+            self.write_configs(configs)
+            self.runner_symbols = symbols
+            print(f"[CONFIG] {len(configs)} strategies written to {self.config_path}: {', '.join(symbols) or '-'}")
+
+    async def run(self):
+        tasks = [asyncio.create_task(coroutine) for coroutine in self.streams() + [self.monitor_funding()]]
+        last_report = time.monotonic()
+        try:
+            while True:
+                await asyncio.sleep(RANK_SECONDS)
+                self.ranked = self.top()
+                self.update_configs()
+                if time.monotonic() - last_report >= REPORT_SECONDS:
+                    print(self.report())
+                    last_report = time.monotonic()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+# Public market data only, so no API keys are needed
+async def main(venue_pairs=VENUE_PAIRS, config_path=CONFIG_PATH):
+    venues = sorted({venue for pair in venue_pairs for venue in pair})
+    exchanges = {venue: getattr(ccxtpro, venue)({'enableRateLimit': True}) for venue in venues}
+    try:
+        await asyncio.gather(*(exchange.load_markets() for exchange in exchanges.values()))
+        scanner = BasisScanner(exchanges, venue_pairs, config_path)
+        await scanner.run()
+    finally:
+        await asyncio.gather(*(exchange.close() for exchange in exchanges.values()))
+
+# Usage: python basisScanner.py [strategies.json]; then python portfolioRunner.py strategies.json
+if __name__ == "__main__":
+    asyncio.run(main(config_path=sys.argv[1] if len(sys.argv) > 1 else CONFIG_PATH))
@@ -0,0 +1,147 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+# Filled amount within this of the ordered amount counts as complete
+FILL_EPS = 1e-9
+# Fills of this many recent orders are kept while waiting to be claimed
+MAX_TRACKED_ORDERS = 1000
+
+
+class Leg:
+    """
+    One market order of a multi-leg entry. amount is in the exchange's order units (contracts on futures).
+    decision_price is the price the decision was taken at; slippage is reported against it.
+    """
+    def __init__(self, name, exchange, symbol, side, amount, decision_price=None, params=None):
+        self.name = name
+        self.exchange = exchange
+        self.symbol = symbol
+        self.side = side
+        self.amount = amount
+        self.decision_price = decision_price
+        self.params = params or {}
+
+
+class LegResult:
+    def __init__(self, leg):
+        self.leg = leg
+        self.order_id = None
+        self.error = None
+        self.filled = None
+        self.average = None
+        self.fill_source = None   # 'response', 'stream' or 'rest'
+        self.sent_at = None       # monotonic seconds
+        self.ack_ms = None        # send -> order acknowledged
+        self.fill_ms = None       # send -> fill price known
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    # Positive = worse than the decision price (paid more on a buy, received less on a sell)
+    @property
+    def slippage_bps(self):
+        if not self.average or not self.leg.decision_price:
+            return None
+        ratio = self.average / self.leg.decision_price
+        return (ratio - 1) * 10_000 if self.leg.side == 'buy' else (1 - ratio) * 10_000
+
+
+class OrderFills:
+    """
+    Fills from a private websocket stream, grouped by order id.
+    Trades are kept even if they arrive before create_order returns, so nothing is lost to that race.
+    """
+    def __init__(self):
+        self.orders = OrderedDict()
+        self.changed = asyncio.Event()
+
+    def on_trades(self, trades):
+        for trade in trades:
+            order_id = trade.get('order')
+            if order_id is None:
+                continue
+            fills = self.orders.setdefault(order_id, {})
+            fills[trade['id']] = (float(trade['amount']), float(trade['price']))
+            self.orders.move_to_end(order_id)
+        while len(self.orders) > MAX_TRACKED_ORDERS:
+            self.orders.popitem(last=False)
+        self.changed.set()
+
+    def summary(self, order_id):
+        fills = self.orders.get(order_id, {}).values()
+        filled = sum(amount for amount, _ in fills)
+        cost = sum(amount * price for amount, price in fills)
+        return filled, (cost / filled if filled else None)
+
+    async def wait(self, order_id, amount, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            filled, average = self.summary(order_id)
+            remaining = deadline - time.monotonic()
+            if filled >= amount - FILL_EPS or remaining <= 0:
+                self.orders.pop(order_id, None)
+                return filled, average
+            self.changed.clear()
+            try:
+                await asyncio.wait_for(self.changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def _execute_leg(leg, result, fills, fill_timeout):
+    result.sent_at = time.monotonic()
+    try:
+        order = await leg.exchange.create_order(leg.symbol, 'market', leg.side, leg.amount, params=leg.params)
+    except Exception as e:
+        result.error = e
+        return result
+    result.ack_ms = (time.monotonic() - result.sent_at) * 1000
+    result.order_id = order.get('id')
+
+    # 1) Many venues return the fill in the order response
+    if order.get('average') and order.get('filled') and order['filled'] >= leg.amount - FILL_EPS:
+        result.filled, result.average, result.fill_source = float(order['filled']), float(order['average']), 'response'
+    # 2) Otherwise the private fill stream, which usually has it within milliseconds
+    elif fills is not None and result.order_id is not None:
+        filled, average = await fills.wait(result.order_id, leg.amount, fill_timeout)
+        if average is not None:
+            result.filled, result.average, result.fill_source = filled, average, 'stream'
+    # 3) One REST lookup as the last resort, no retry loop
+    if result.average is None and result.order_id is not None:
+        try:
+            fetched = await leg.exchange.fetch_order(result.order_id, leg.symbol)
+            if fetched.get('average') or fetched.get('price'):
+                result.filled = float(fetched.get('filled') or 0.0)
+                result.average = float(fetched.get('average') or fetched['price'])
+                result.fill_source = 'rest'
+        except Exception as e:
+            print(f"[WARN] {leg.name}: fetch_order {result.order_id} failed: {e}")
+    result.fill_ms = (time.monotonic() - result.sent_at) * 1000
+    return result
+
+# Fire every leg at once and resolve each fill independently; one slow or failed leg never delays the others
+# fills: {leg name: OrderFills fed by that venue's watch_my_trades}; legs without one go straight to the REST lookup
+async def execute_legs(legs, fills=None, fill_timeout=5):
+    fills = fills or {}
+    results = [LegResult(leg) for leg in legs]
+    await asyncio.gather(*(_execute_leg(leg, result, fills.get(leg.name), fill_timeout) for leg, result in zip(legs, results)))
+    return results
+
+def format_report(results):
+    first_sent = min((result.sent_at for result in results if result.sent_at is not None), default=0)
+    lines = []
+    for result in results:
+        leg = result.leg
+        if not result.ok:
+            lines.append(f"{leg.name}: {leg.side} {leg.amount} {leg.symbol} FAILED: {result.error}")
+            continue
+        slippage = f"{result.slippage_bps:+.1f} bps" if result.slippage_bps is not None else "n/a"
+        ack = f"{result.ack_ms:.0f}" if result.ack_ms is not None else "n/a"
+        fill = f"{result.fill_ms:.0f}" if result.fill_ms is not None else "n/a"
+        lines.append(f"{leg.name}: {leg.side} {result.filled}/{leg.amount} {leg.symbol} @ {result.average} "
+                     f"(decision {leg.decision_price}, slippage {slippage}) "
+                     f"ack {ack} ms, fill {fill} ms via {result.fill_source}, "
+                     f"sent +{(result.sent_at - first_sent) * 1000:.1f} ms")
+    return "\n".join(lines)
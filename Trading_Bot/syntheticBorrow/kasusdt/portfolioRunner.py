@@ -0,0 +1,187 @@
+import asyncio
+import json
+import sys
+import time
+from collections import defaultdict
+import ccxt.pro as ccxtpro
+
+from config import KUCOIN_SPOT_CFG, KUCOIN_FUTURES_CFG, STRATEGY_CFG
+from syntheticBorrowAsync import HedgeEngine, stream, ticker_streams
+
+# PORTFOLIO_CFG in config is a list of STRATEGY_CFG-style dicts, one per hedge; a single STRATEGY_CFG still works
+try:
+    from config import PORTFOLIO_CFG
+except ImportError:
+    PORTFOLIO_CFG = [STRATEGY_CFG]
+
+# Futures collateral currency, and the share of its equity the hedges together may tie up as margin
+MARGIN_CURRENCY = 'USDT'
+MAX_MARGIN_USAGE = 0.5
+MARGIN_REPORT_SECONDS = 60
+# A hedge whose futures ticker has not arrived within this long is skipped
+PRICE_TIMEOUT_SECONDS = 60
+# Attempts to flatten a finished or failed hedge before leaving it (and its margin reservation) to the operator
+CLOSE_ATTEMPTS = 3
+CLOSE_RETRY_SECONDS = 5
+
+
+class Portfolio:
+    """
+    Many spot/futures hedges in one process: one client per venue, one account-wide fill stream,
+    one positions stream and one ticker subscription per venue, with every update routed to its hedge by symbol.
+    """
+    def __init__(self, spot_ex, fut_ex, strategies):
+        self.spot_ex = spot_ex
+        self.fut_ex = fut_ex
+        self.engines = [HedgeEngine(spot_ex, fut_ex, strategy) for strategy in strategies]
+        self.by_spot = {engine.strategy['symbol_spot']: engine for engine in self.engines}
+        self.by_fut = {engine.strategy['symbol_fut']: engine for engine in self.engines}
+        if len(self.by_spot) != len(self.engines) or len(self.by_fut) != len(self.engines):
+            raise ValueError("Each spot and futures symbol can belong to one hedge only")
+        self.margin_equity = None
+        self.margin_reserved = 0.0
+        self.margin_lock = asyncio.Lock()
+
+    # ---- routing ----
+
+    @staticmethod
+    def route(index, items, handler):
+        grouped = defaultdict(list)
+        for item in items:
+            if item.get('symbol') in index:
+                grouped[item['symbol']].append(item)
+        for symbol, symbol_items in grouped.items():
+            handler(index[symbol], symbol_items)
+
+    def on_spot_trades(self, trades):
+        self.route(self.by_spot, trades, lambda engine, items: engine.on_spot_trades(items))
+
+    def on_fut_trades(self, trades):
+        self.route(self.by_fut, trades, lambda engine, items: engine.on_fut_trades(items))
+
+    def on_fut_positions(self, positions):
+        self.route(self.by_fut, positions, lambda engine, items: [engine.on_fut_position(item) for item in items])
+
+    def on_spot_tickers(self, tickers):
+        self.route(self.by_spot, tickers.values(), lambda engine, items: engine.on_spot_ticker(items[-1]))
+
+    def on_fut_tickers(self, tickers):
+        self.route(self.by_fut, tickers.values(), lambda engine, items: engine.on_fut_ticker(items[-1]))
+
+    def streams(self):
+        streams = [
+            stream("spot fills", lambda: self.spot_ex.watch_my_trades(), self.on_spot_trades),
+            stream("futures fills", lambda: self.fut_ex.watch_my_trades(), self.on_fut_trades),
+        ]
+        if self.fut_ex.has.get('watchPositions'):
+            streams.append(stream("futures positions", lambda: self.fut_ex.watch_positions(list(self.by_fut)), self.on_fut_positions))
+        streams += ticker_streams("spot", self.spot_ex, list(self.by_spot), self.on_spot_tickers)
+        streams += ticker_streams("futures", self.fut_ex, list(self.by_fut), self.on_fut_tickers)
+        return streams
+
+    # ---- margin ----
+
+    async def refresh_margin_equity(self):
+        balance = await self.fut_ex.fetch_balance()
+        self.margin_equity = float(balance['total'].get(MARGIN_CURRENCY, 0.0))
+
+    def margin_report(self):
+        used = sum(engine.margin_used for engine in self.engines)
+        open_hedges = sum(1 for engine in self.engines if engine.monitoring and not engine.stopped.is_set())
+        utilisation = f"{used / self.margin_equity * 100:.1f}%" if self.margin_equity else "n/a"
+        return (f"[MARGIN] {open_hedges}/{len(self.engines)} hedges open, margin used {used:.2f} {MARGIN_CURRENCY} "
+                f"of {self.margin_equity} ({utilisation}), reserved {self.margin_reserved:.2f}")
+
+    async def monitor_margin(self):
+        while True:
+            await asyncio.sleep(MARGIN_REPORT_SECONDS)
+            try:
+                await self.refresh_margin_equity()
+            except Exception as e:
+                print(f"[ERROR] margin balance: {e}")
+            print(self.margin_report())
+
+    # A hedge only opens if its futures margin fits in what the others have not reserved yet
+    # Returns the reserved amount, or None if the hedge is skipped
+    async def reserve_margin(self, engine):
+        deadline = time.monotonic() + PRICE_TIMEOUT_SECONDS
+        while engine.last_fut_price is None:
+            if time.monotonic() >= deadline:
+                engine.log("SKIP", f"no futures ticker within {PRICE_TIMEOUT_SECONDS} s")
+                return None
+            await asyncio.sleep(0.1)
+        required = abs(engine.strategy['desired_fut']) * engine.last_fut_price / engine.strategy['leverage']
+        async with self.margin_lock:
+            limit = MAX_MARGIN_USAGE * (self.margin_equity or 0.0)
+            if self.margin_reserved + required > limit:
+                engine.log("SKIP", f"needs {required:.2f} {MARGIN_CURRENCY} margin, "
+                                   f"{limit - self.margin_reserved:.2f} left under the {MAX_MARGIN_USAGE * 100:.0f}% cap")
+                return None
+            self.margin_reserved += required
+            return required
+
+    # ---- lifecycle ----
+
+    # Close until a fresh REST snapshot shows the hedge flat; one that cannot be flattened keeps its margin reserved
+    async def flatten(self, engine):
+        for attempt in range(1, CLOSE_ATTEMPTS + 1):
+            try:
+                await engine.reconcile()
+                if engine.is_flat:
+                    return True
+                engine.log("CLOSE", f"position still open, closing (attempt {attempt}/{CLOSE_ATTEMPTS})")
+                await engine.close()
+            except Exception as e:
+                engine.log("ERROR", f"close failed: {e}")
+            await asyncio.sleep(CLOSE_RETRY_SECONDS)
+        engine.log("ERROR", f"still open after {CLOSE_ATTEMPTS} close attempts; margin stays reserved, close it by hand")
+        return False
+
+    # A hedge that fails half-open (e.g. spot bought, futures orders rejected) is closed rather than left without a stop
+    async def run_engine(self, engine):
+        reserved = None
+        try:
+            reserved = await self.reserve_margin(engine)
+            if reserved is None:
+                return
+            await engine.run(reconcile=False)
+        except Exception as e:
+            engine.log("ERROR", f"hedge failed: {e}")
+        if reserved is not None and await self.flatten(engine):
+            self.margin_reserved -= reserved
+
+    async def run(self):
+        # One REST snapshot seeds every hedge; after that positions follow the streams
+        balance, positions, _ = await asyncio.gather(self.spot_ex.fetch_balance(),
+                                                     self.fut_ex.fetch_positions(list(self.by_fut)),
+                                                     self.refresh_margin_equity())
+        for engine in self.engines:
+            engine.apply_snapshot(balance, positions)
+
+        tasks = [asyncio.create_task(coroutine) for coroutine in self.streams() + [self.monitor_margin()]]
+        try:
+            await asyncio.gather(*(self.run_engine(engine) for engine in self.engines))
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        print(self.margin_report())
+
+# A JSON list of strategy dicts, e.g. the file basisScanner.py keeps up to date
+def load_portfolio(path):
+    with open(path) as f:
+        return json.load(f)
+
+async def main(strategies=PORTFOLIO_CFG):
+    spot_ex = ccxtpro.kucoin(KUCOIN_SPOT_CFG)
+    fut_ex = ccxtpro.kucoinfutures(KUCOIN_FUTURES_CFG)
+    portfolio = Portfolio(spot_ex, fut_ex, strategies)
+    print(f"[INFO] running {len(portfolio.engines)} hedges")
+    try:
+        await portfolio.run()
+    finally:
+        await asyncio.gather(spot_ex.close(), fut_ex.close())
+
+# Usage: python portfolioRunner.py [strategies.json]  (PORTFOLIO_CFG from config by default)
+if __name__ == "__main__":
+    asyncio.run(main(load_portfolio(sys.argv[1]) if len(sys.argv) > 1 else PORTFOLIO_CFG))
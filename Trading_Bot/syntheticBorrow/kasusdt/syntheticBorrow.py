@@ -1,6 +1,7 @@
 import time
 import ccxt
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 from config import KUCOIN_SPOT_CFG, KUCOIN_FUTURES_CFG, STRATEGY_CFG
 
@@ -167,16 +168,19 @@ def open_position_incrementally(spot_ex, fut_ex, strategy):
             print("[OPEN] Position matched. Done.")
             break
 
-        if spot_diff>EPS:
-            step_spot = min(spot_diff, max_size)
-            print(f"[OPEN] Buying {step_spot} on spot.")
-            create_market_buy_spot(spot_ex, symbol_spot, step_spot)
-
-        if fut_diff < -EPS:
-            needed = abs(fut_diff)
-            step_fut = min(needed, max_size)
-            print(f"[OPEN] Shorting {step_fut} coins on futures.")
-            create_market_short_fut(fut_ex, symbol_fut, step_fut, lev, c_size)
+        # Both legs are sent at the same time so the fill-price lookups of one leg never delay the other
+        # (syntheticBorrowAsync.py does this over websockets with per-leg latency/slippage reporting)
+        with ThreadPoolExecutor(max_workers=2) as legs:
+            if spot_diff>EPS:
+                step_spot = min(spot_diff, max_size)
+                print(f"[OPEN] Buying {step_spot} on spot.")
+                legs.submit(create_market_buy_spot, spot_ex, symbol_spot, step_spot)
+
+            if fut_diff < -EPS:
+                needed = abs(fut_diff)
+                step_fut = min(needed, max_size)
+                print(f"[OPEN] Shorting {step_fut} coins on futures.")
+                legs.submit(create_market_short_fut, fut_ex, symbol_fut, step_fut, lev, c_size)
 
         time.sleep(2)
 
@@ -0,0 +1,347 @@
+import asyncio
+import time
+import ccxt.pro as ccxtpro
+
+from config import KUCOIN_SPOT_CFG, KUCOIN_FUTURES_CFG, STRATEGY_CFG
+from legCoordinator import Leg, OrderFills, execute_legs, format_report
+
+# Position difference (coins) treated as matched, as in syntheticBorrow.py
+EPS = 1e-3
+# Close when the short is this far under water versus its average entry (STRATEGY_CFG['stop_pct'] overrides)
+DEFAULT_STOP_PCT = 0.001
+# How long to wait for the fill stream after placing a step before reconciling over REST once
+FILL_TIMEOUT_SECONDS = 10
+# Consecutive steps with a failed order before giving up on opening
+MAX_ORDER_ERRORS = 5
+# Symbols per watch_tickers subscription; venues cap how many topics one subscribe message may carry
+TICKER_BATCH_SIZE = 100
+
+
+class FillTracker:
+    """
+    Size-weighted average entry from individual fills (trade ids are de-duplicated,
+    since a fill can arrive from both the stream and a REST reconcile).
+    """
+    def __init__(self):
+        self.amount = 0.0
+        self.cost = 0.0
+        self.trade_ids = set()
+
+    def add(self, trade_id, amount, price):
+        if trade_id in self.trade_ids:
+            return False
+        self.trade_ids.add(trade_id)
+        self.amount += amount
+        self.cost += amount * price
+        return True
+
+    @property
+    def average(self):
+        return self.cost / self.amount if self.amount else None
+
+
+class HedgeEngine:
+    """
+    One spot-long / futures-short hedge driven by pushed events.
+    Whoever owns the websocket streams calls on_spot_trades / on_fut_trades / on_fut_position / on_fut_ticker,
+    so the stop reacts on the tick that crosses it instead of on the next poll.
+    Positions are in coins: spot is the base balance, futures is negative for a short.
+    Where the venue streams positions, the futures position comes from those snapshots only and fills just feed the
+    entry average; the two streams are not ordered, so counting both would double a fill.
+    A REST snapshot also marks the fills it already includes as seen, so their late stream copy is not counted again.
+    """
+    def __init__(self, spot_ex, fut_ex, strategy, name=None):
+        self.spot_ex = spot_ex
+        self.fut_ex = fut_ex
+        self.strategy = strategy
+        self.name = name or strategy['symbol_fut']
+        self.stop_pct = strategy.get('stop_pct', DEFAULT_STOP_PCT)
+        self.position_stream = bool(fut_ex.has.get('watchPositions'))
+        self.started_ms = int(time.time() * 1000)  # fills of this run are fetched from here on when reconciling
+
+        self.spot_position = 0.0
+        self.fut_position = 0.0
+        self.spot_fills = FillTracker()
+        self.fut_fills = FillTracker()
+        self.spot_orders = OrderFills()
+        self.fut_orders = OrderFills()
+        self.last_spot_price = None
+        self.last_fut_price = None
+        self.reference_price = None  # stop reference if no futures fill was seen
+
+        self.monitoring = False
+        self.changed = asyncio.Event()
+        self.stopped = asyncio.Event()
+        self.stop_reason = None
+
+    def log(self, tag, message):
+        print(f"[{tag}] {self.name}: {message}")
+
+    # ---- event handlers (called by the stream owner) ----
+
+    # Signed position change of a spot fill (net of a fee paid in the base coin), or None if it was already seen
+    def add_spot_fill(self, trade):
+        amount = float(trade['amount'])
+        signed = amount if trade['side'] == 'buy' else -amount
+        if not self.spot_fills.add(trade['id'], signed, float(trade['price'])):
+            return None
+        fee = trade.get('fee') or {}
+        fee_in_base = float(fee.get('cost') or 0) if fee.get('currency') == self.strategy['base_coin'] else 0.0
+        return signed - fee_in_base
+
+    # Signed position change of a futures fill in coins, or None if it was already seen
+    def add_fut_fill(self, trade):
+        coins = float(trade['amount']) * self.strategy['contract_size']
+        signed = -coins if trade['side'] == 'sell' else coins
+        if not self.fut_fills.add(trade['id'], -signed, float(trade['price'])):
+            return None
+        return signed
+
+    def on_spot_trades(self, trades):
+        for trade in trades:
+            if trade.get('symbol') != self.strategy['symbol_spot']:
+                continue
+            self.spot_orders.on_trades([trade])
+            change = self.add_spot_fill(trade)
+            if change is None:
+                continue
+            self.spot_position += change
+            self.changed.set()
+
+    def on_fut_trades(self, trades):
+        for trade in trades:
+            if trade.get('symbol') != self.strategy['symbol_fut']:
+                continue
+            self.fut_orders.on_trades([trade])
+            change = self.add_fut_fill(trade)
+            if change is None:
+                continue
+            if not self.position_stream:
+                self.fut_position += change
+            self.changed.set()
+
+    # Position updates are authoritative for the futures leg and correct any fill that was missed
+    def on_fut_position(self, position):
+        if position.get('symbol') != self.strategy['symbol_fut']:
+            return
+        coins = float(position.get('contracts') or 0.0) * float(position.get('contractSize') or self.strategy['contract_size'])
+        self.fut_position = -coins if (position.get('side') or '').lower() == 'short' else coins
+        self.changed.set()
+
+    def on_spot_ticker(self, ticker):
+        if ticker.get('last') is not None:
+            self.last_spot_price = float(ticker['last'])
+
+    def on_fut_ticker(self, ticker):
+        price = ticker.get('last')
+        if price is None:
+            return
+        self.last_fut_price = float(price)
+        if not self.monitoring or self.stopped.is_set():
+            return
+        entry = self.fut_fills.average or self.reference_price
+        if entry and (self.last_fut_price - entry) / entry >= self.stop_pct:
+            lag_ms = time.time() * 1000 - ticker['timestamp'] if ticker.get('timestamp') else None
+            self.stop_reason = (f"futures {self.last_fut_price} is {self.stop_pct * 100:.2f}% above entry {entry:.6f}"
+                                + (f" (tick {lag_ms:.0f} ms old)" if lag_ms is not None else ""))
+            self.stopped.set()
+
+    # ---- REST snapshots, used once at start and as a fallback when the stream is silent ----
+
+    # Positions from a balance and a positions list (the portfolio runner fetches these once for all hedges)
+    # The fills fetched with them are already in the balance: they are recorded as seen without moving the positions
+    def apply_snapshot(self, balance, positions, spot_trades=(), fut_trades=()):
+        self.spot_position = float(balance['total'].get(self.strategy['base_coin'], 0.0))
+        self.fut_position = 0.0
+        for position in positions:
+            self.on_fut_position(position)
+        for trade in spot_trades:
+            if trade.get('symbol') == self.strategy['symbol_spot']:
+                self.add_spot_fill(trade)
+        for trade in fut_trades:
+            if trade.get('symbol') == self.strategy['symbol_fut']:
+                self.add_fut_fill(trade)
+        self.log("SYNC", f"spot={self.spot_position}, fut={self.fut_position}")
+
+    async def reconcile(self):
+        balance, positions, spot_trades, fut_trades = await asyncio.gather(
+            self.spot_ex.fetch_balance(),
+            self.fut_ex.fetch_positions([self.strategy['symbol_fut']]),
+            self.spot_ex.fetch_my_trades(self.strategy['symbol_spot'], self.started_ms),
+            self.fut_ex.fetch_my_trades(self.strategy['symbol_fut'], self.started_ms))
+        self.apply_snapshot(balance, positions, spot_trades, fut_trades)
+
+    @property
+    def is_flat(self):
+        return self.spot_position < EPS and abs(self.fut_position) < EPS
+
+    # Futures margin held by this hedge at the last price
+    @property
+    def margin_used(self):
+        if self.last_fut_price is None:
+            return 0.0
+        return abs(self.fut_position) * self.last_fut_price / self.strategy['leverage']
+
+    # Wait until the stream has delivered the fills of the orders just sent (entry-side amounts, before fees)
+    # and, with a position stream, until the position snapshot includes the futures fills seen so far
+    async def wait_for_fills(self, spot_filled, fut_filled, fut_filled_before=None, fut_position_before=None,
+                             timeout=FILL_TIMEOUT_SECONDS):
+        deadline = time.monotonic() + timeout
+        def pending():
+            if self.spot_fills.amount < spot_filled - EPS or self.fut_fills.amount < fut_filled - EPS:
+                return True
+            if self.position_stream and fut_position_before is not None:
+                expected = fut_position_before - (self.fut_fills.amount - fut_filled_before)
+                return self.fut_position > expected + EPS
+            return False
+        while pending():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.log("WARN", "fills not seen on the stream in time, reconciling over REST")
+                await self.reconcile()
+                return
+            self.changed.clear()
+            try:
+                await asyncio.wait_for(self.changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    # ---- orders ----
+
+    def spot_leg(self, side, amount):
+        return Leg('spot', self.spot_ex, self.strategy['symbol_spot'], side, amount, self.last_spot_price)
+
+    def fut_leg(self, side, coin_amount, reduce_only=False):
+        params = {'leverage': str(self.strategy['leverage'])}
+        if reduce_only:
+            params['reduceOnly'] = True
+        return Leg('fut', self.fut_ex, self.strategy['symbol_fut'], side, coin_amount / self.strategy['contract_size'],
+                   self.last_fut_price, params=params)
+
+    async def execute(self, legs):
+        results = await execute_legs(legs, {'spot': self.spot_orders, 'fut': self.fut_orders}, FILL_TIMEOUT_SECONDS)
+        self.log("LEGS", "\n" + format_report(results))
+        return {result.leg.name: result for result in results}
+
+    # Both legs of a step are sent together through the leg coordinator; when both are needed they use the same size,
+    # so the hedge is never more than one in-flight step out of balance
+    async def open(self):
+        max_size = self.strategy['max_trade_size']
+        errors = 0
+        while True:
+            spot_diff = self.strategy['desired_spot'] - self.spot_position
+            fut_diff = self.strategy['desired_fut'] - self.fut_position
+            self.log("OPEN", f"spot={self.spot_position:.6f}, fut={self.fut_position:.6f}, "
+                             f"spot_diff={spot_diff:.6f}, fut_diff={fut_diff:.6f}")
+            if abs(spot_diff) < EPS and abs(fut_diff) < EPS:
+                self.log("OPEN", "Position matched.")
+                break
+
+            need_spot, need_fut = spot_diff > EPS, fut_diff < -EPS
+            if need_spot and need_fut:
+                spot_step = fut_step = min(spot_diff, -fut_diff, max_size)
+            else:
+                spot_step = min(spot_diff, max_size) if need_spot else 0.0
+                fut_step = min(-fut_diff, max_size) if need_fut else 0.0
+            if not need_spot and not need_fut:
+                self.log("WARN", "position is past the target in the unwinding direction; leaving it as is")
+                break
+
+            legs = []
+            if spot_step:
+                legs.append(self.spot_leg('buy', spot_step))
+            if fut_step:
+                legs.append(self.fut_leg('sell', fut_step))
+            spot_filled, fut_filled, fut_position = self.spot_fills.amount, self.fut_fills.amount, self.fut_position
+            results = await self.execute(legs)
+            failed = [name for name, result in results.items() if not result.ok]
+            errors = errors + 1 if failed else 0
+            if errors >= MAX_ORDER_ERRORS:
+                raise RuntimeError(f"{errors} consecutive order errors while opening {self.name}")
+
+            # Positions follow the fill stream; this returns at once when the coordinator already saw the fills there
+            await self.wait_for_fills(spot_filled + (spot_step if 'spot' in results and 'spot' not in failed else 0.0),
+                                      fut_filled + (fut_step if 'fut' in results and 'fut' not in failed else 0.0),
+                                      fut_filled, fut_position)
+
+        if self.fut_fills.average is None:
+            self.reference_price = self.last_fut_price
+            self.log("WARN", f"no futures fill seen, stop reference = last price {self.reference_price}")
+        self.log("OPEN", f"avg spot entry={self.spot_fills.average}, avg fut entry={self.fut_fills.average}")
+
+    # Sizes come from a fresh REST snapshot, as in syntheticBorrow.py, and the cover can only reduce the short
+    async def close(self):
+        try:
+            await self.reconcile()
+        except Exception as e:
+            self.log("ERROR", f"reconcile before close failed, closing the tracked positions: {e}")
+        legs = []
+        if self.spot_position > 1e-8:
+            self.log("CLOSE", f"SELL {self.spot_position} on spot.")
+            legs.append(self.spot_leg('sell', self.spot_position))
+        if self.fut_position < -1e-8:
+            self.log("CLOSE", f"Cover short {-self.fut_position} coins.")
+            legs.append(self.fut_leg('buy', -self.fut_position, reduce_only=True))
+        if legs:
+            await self.execute(legs)
+
+    async def run(self, reconcile=True):
+        if reconcile:
+            await self.reconcile()
+        await self.open()
+        self.monitoring = True
+        self.log("INFO", f"monitoring, stop at +{self.stop_pct * 100:.2f}% on the futures leg")
+        await self.stopped.wait()
+        self.log("WARNING", f"{self.stop_reason} => forced close.")
+        await self.close()
+
+
+# Keep one ccxt.pro subscription alive and hand every update to a handler
+async def stream(label, watch, handler):
+    while True:
+        try:
+            handler(await watch())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[ERROR] {label} stream: {e}. Resubscribing...")
+            await asyncio.sleep(1)
+
+# Tickers of many symbols as {symbol: ticker} updates: batched watch_tickers where supported, else one watch_ticker each
+# (per-symbol subscriptions still share the venue's single websocket connection in ccxt.pro)
+def ticker_streams(label, exchange, symbols, handler, batch_size=TICKER_BATCH_SIZE):
+    if exchange.has.get('watchTickers'):
+        return [stream(f"{label} tickers", lambda batch=symbols[i:i + batch_size]: exchange.watch_tickers(batch), handler)
+                for i in range(0, len(symbols), batch_size)]
+    return [stream(f"{label} ticker {symbol}", lambda symbol=symbol: exchange.watch_ticker(symbol),
+                   lambda ticker: handler({ticker['symbol']: ticker}))
+            for symbol in symbols]
+
+def engine_streams(spot_ex, fut_ex, engine):
+    symbol_spot, symbol_fut = engine.strategy['symbol_spot'], engine.strategy['symbol_fut']
+    streams = [
+        stream("spot fills", lambda: spot_ex.watch_my_trades(symbol_spot), engine.on_spot_trades),
+        stream("futures fills", lambda: fut_ex.watch_my_trades(symbol_fut), engine.on_fut_trades),
+        stream("spot ticker", lambda: spot_ex.watch_ticker(symbol_spot), engine.on_spot_ticker),
+        stream("futures ticker", lambda: fut_ex.watch_ticker(symbol_fut), engine.on_fut_ticker),
+    ]
+    if fut_ex.has.get('watchPositions'):
+        streams.append(stream("futures positions", lambda: fut_ex.watch_positions([symbol_fut]),
+                              lambda positions: [engine.on_fut_position(position) for position in positions]))
+    return streams
+
+async def main():
+    spot_ex = ccxtpro.kucoin(KUCOIN_SPOT_CFG)
+    fut_ex = ccxtpro.kucoinfutures(KUCOIN_FUTURES_CFG)
+    engine = HedgeEngine(spot_ex, fut_ex, STRATEGY_CFG)
+    tasks = [asyncio.create_task(coroutine) for coroutine in engine_streams(spot_ex, fut_ex, engine)]
+    try:
+        await engine.run()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.gather(spot_ex.close(), fut_ex.close())
+
+if __name__ == "__main__":
+    asyncio.run(main())